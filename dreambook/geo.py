@@ -0,0 +1,182 @@
+import math
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+
+EARTH_RADIUS_KM = 6371.0088
+# Poziom siatki (jak zoom kafelków mapy): 2^20 x 2^20 komórek, ~38 m na równiku
+CELL_ZOOM = 20
+MAX_LATITUDE = 85.05112878  # granica rzutu Mercatora
+# Ile kafelków może mieć pokrycie prostokąta — większy obszar schodzi na grubszy poziom
+MAX_COVER_TILES = 32
+
+
+def mercator(latitude, longitude, zoom):
+    """Pozycja punktu w kafelkach poziomu zoom (ułamkowa, jak piksele / 256)."""
+    n = 1 << zoom
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    lat_rad = math.radians(latitude)
+    x = (longitude + 180.0) / 360.0 * n
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_for(latitude, longitude, zoom):
+    n = 1 << zoom
+    x, y = mercator(latitude, longitude, zoom)
+    return min(max(int(x), 0), n - 1), min(max(int(y), 0), n - 1)
+
+
+def interleave(x, y):
+    # Kod Mortona (Z-order): bity x i y na przemian, jak w quadkey
+    cell = 0
+    for bit in range(CELL_ZOOM):
+        cell |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return cell
+
+
+def deinterleave(cell):
+    """Odwrotność interleave: (x, y) kafelka."""
+    x = y = 0
+    for bit in range(CELL_ZOOM):
+        x |= ((cell >> (2 * bit)) & 1) << bit
+        y |= ((cell >> (2 * bit + 1)) & 1) << bit
+    return x, y
+
+
+def cell_for(latitude, longitude):
+    """Numer komórki siatki dla punktu albo None, gdy brak współrzędnych."""
+    if latitude is None or longitude is None:
+        return None
+    return interleave(*tile_for(float(latitude), float(longitude), CELL_ZOOM))
+
+
+def covering_ranges(south, west, north, east):
+    """
+    Przedziały [od, do) numerów komórek pokrywające prostokąt. Kafelek
+    poziomu z obejmuje ciągły przedział komórek z CELL_ZOOM (wspólny
+    prefiks kodu Mortona), więc każdy kafelek to jeden warunek BETWEEN po
+    indeksie. Poziom z jest dobierany tak, żeby kafelków było najwyżej
+    MAX_COVER_TILES; sąsiednie przedziały są sklejane.
+    """
+    for zoom in range(CELL_ZOOM, -1, -1):
+        x0, y0 = tile_for(north, west, zoom)
+        x1, y1 = tile_for(south, east, zoom)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_COVER_TILES:
+            break
+    shift = 2 * (CELL_ZOOM - zoom)
+    starts = sorted(interleave(x, y) << shift for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+
+    ranges = []
+    for start in starts:
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = start + (1 << shift)
+        else:
+            ranges.append([start, start + (1 << shift)])
+    return [tuple(r) for r in ranges]
+
+
+def split_bbox(south, west, north, east):
+    # Prostokąt przechodzący przez antypołudnik dzielimy na dwa
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def bbox_condition(south, west, north, east, cell_field='geo_cell', lat_field='latitude', lng_field='longitude'):
+    """Komórki pokrycia (zawężenie po indeksie) + dokładne granice prostokąta."""
+    condition = Q()
+    for s, w, n, e in split_bbox(south, west, north, east):
+        cells = Q()
+        for start, stop in covering_ranges(s, w, n, e):
+            cells |= Q(**{f'{cell_field}__gte': start, f'{cell_field}__lt': stop})
+        condition |= cells & Q(**{f'{lat_field}__range': (s, n), f'{lng_field}__range': (w, e)})
+    return condition
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Prostokąt (south, west, north, east) opisany na kole."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    if north >= 90.0 or south <= -90.0 or cos_lat < 1e-9:
+        return south, -180.0, north, 180.0
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    if dlng >= 180.0:
+        return south, -180.0, north, 180.0
+    west, east = longitude - dlng, longitude + dlng
+    # Wyjście poza ±180 — zawijamy, bbox_condition rozdzieli prostokąt
+    west = west + 360.0 if west < -180.0 else west
+    east = east - 360.0 if east > 180.0 else east
+    return south, west, north, east
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_expression(latitude, longitude, lat_field='latitude', lng_field='longitude'):
+    """Odległość w km od punktu jako wyrażenie SQL (dokładne sprawdzenie kandydatów)."""
+    lat = Radians(Cast(F(lat_field), FloatField()))
+    lng = Radians(Cast(F(lng_field), FloatField()))
+    lat0, lng0 = math.radians(latitude), math.radians(longitude)
+    a = (Power(Sin((lat - lat0) / 2), 2)
+         + math.cos(lat0) * Cos(lat) * Power(Sin((lng - lng0) / 2), 2))
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def near(queryset, latitude, longitude, radius_km, cell_field='geo_cell',
+         lat_field='latitude', lng_field='longitude'):
+    """Punkty w promieniu radius_km: komórki pokrycia, potem haversine tylko dla kandydatów."""
+    return queryset.filter(
+        bbox_condition(*radius_bbox(latitude, longitude, radius_km), cell_field, lat_field, lng_field)
+    ).alias(
+        geo_distance=haversine_expression(latitude, longitude, lat_field, lng_field)
+    ).filter(geo_distance__lte=radius_km)
+
+
+def _floats(raw, count, name):
+    try:
+        values = [float(part) for part in raw.split(',')]
+    except ValueError:
+        values = []
+    if len(values) != count or not all(math.isfinite(v) for v in values):
+        raise ValidationError({name: f'Expected {count} comma-separated numbers'})
+    return values
+
+
+def parse_bbox(raw):
+    """?bbox=west,south,east,north -> (south, west, north, east)."""
+    west, south, east, north = _floats(raw, 4, 'bbox')
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValidationError({'bbox': 'Expected west,south,east,north in degrees'})
+    return south, west, north, east
+
+
+class GeoFilterMixin:
+    """
+    ?bbox=west,south,east,north albo ?near=lat,lng&radius=km (domyślnie
+    default_radius_km) dla widoków z polami latitude / longitude / geo_cell.
+    Zawężenie idzie po indeksie komórek, nie przez skan całej tabeli.
+    """
+    geo_fields = ('geo_cell', 'latitude', 'longitude')
+    default_radius_km = 5.0
+    max_radius_km = 500.0
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+
+        if params.get('bbox'):
+            queryset = queryset.filter(bbox_condition(*parse_bbox(params['bbox']), *self.geo_fields))
+
+        if params.get('near'):
+            latitude, longitude = _floats(params['near'], 2, 'near')
+            radius = _floats(params.get('radius', str(self.default_radius_km)), 1, 'radius')[0]
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= self.max_radius_km):
+                raise ValidationError({'near': f'Expected lat,lng and 0 < radius <= {self.max_radius_km} km'})
+            queryset = near(queryset, latitude, longitude, radius, *self.geo_fields)
+        return queryset
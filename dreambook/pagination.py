@@ -0,0 +1,217 @@
+import base64
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+def _encode_value(value):
+    # isoformat() zamiast DjangoJSONEncoder — ten obcina mikrosekundy,
+    # a kursor musi wskazywać dokładnie na wiersz
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class AnnotationKey:
+    """
+    Adnotacja querysetu (np. search_rank) jako klucz sortowania — udaje pole
+    modelu. Z expression paginator sam dokłada adnotację (pole przez relację).
+    """
+
+    def __init__(self, name, output_field, expression=None):
+        self.name = self.attname = name
+        self.output_field = output_field
+        self.expression = expression
+
+    def to_python(self, value):
+        return self.output_field.to_python(value)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginacja "seek": zamiast OFFSET kolejna strona zaczyna się za ostatnim
+    wierszem poprzedniej, np. WHERE (created_at, id) < (:created_at, :id).
+    Koszt strony nie zależy od tego, jak daleko jesteśmy w wynikach.
+
+    Kolejność bierzemy z order_by querysetu (albo `keyset_ordering` widoku)
+    i zawsze dokładamy na końcu klucz główny, żeby była jednoznaczna.
+    Pola sortowania (także adnotacje) nie mogą przyjmować NULL.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset, view)
+        page_size = self.get_page_size(request)
+        lookups = {field.name: field.expression for field, _ in self.ordering
+                   if isinstance(field, AnnotationKey) and field.expression is not None}
+        if lookups:
+            queryset = queryset.annotate(**lookups)
+
+        position, reverse = self.decode_cursor(queryset.model, request)
+        queryset = queryset.order_by(*self.order_by_args(reverse))
+        if position is not None:
+            queryset = queryset.filter(self.seek_condition(position, reverse))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # --- Kolejność ---
+
+    def get_ordering(self, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering is None:
+            ordering = [o for o in queryset.query.order_by if isinstance(o, str)]
+        if not ordering:
+            ordering = list(queryset.model._meta.ordering) or ['pk']
+
+        pk_name = queryset.model._meta.pk.name
+        fields = []
+        for item in ordering:
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            if name in queryset.query.annotations:
+                field = AnnotationKey(name, queryset.query.annotations[name].output_field)
+            elif name == 'pk':
+                field = queryset.model._meta.pk
+            else:
+                field = self.resolve_field(queryset.model, name, len(fields))
+            fields.append((field, descending))
+            if field.name == pk_name:
+                break
+        else:
+            # Klucz główny jako ostatnie kryterium — rozstrzyga remisy
+            fields.append((queryset.model._meta.pk, fields[-1][1] if fields else False))
+        return fields
+
+    @staticmethod
+    def resolve_field(model, name, position):
+        """
+        Pole modelu albo — dla ścieżki przez relacje (np. property__price) —
+        AnnotationKey z F(ścieżka). Nieznana nazwa to 400, nie 500.
+        """
+        parts = name.split(LOOKUP_SEP)
+        try:
+            for part in parts[:-1]:
+                related_model = model._meta.get_field(part).related_model
+                if related_model is None:
+                    raise FieldDoesNotExist(part)
+                model = related_model
+            field = model._meta.get_field(parts[-1])
+        except FieldDoesNotExist:
+            raise ParseError(f'Cannot paginate by ordering "{name}"')
+        if len(parts) == 1:
+            return field
+        # Kolumna z JOIN-a jako adnotacja — wiersze (także z .values()) mają ją pod tą nazwą
+        return AnnotationKey(f'keyset_{position}', field, F(name))
+
+    def order_by_args(self, reverse):
+        return [
+            ('-' if descending != reverse else '') + field.name
+            for field, descending in self.ordering
+        ]
+
+    def seek_condition(self, position, reverse):
+        # (a, b, c) > (x, y, z)  ==  a > x  OR  (a = x AND b > y)  OR  (a = x AND b = y AND c > z)
+        clauses = []
+        for i, (field, descending) in enumerate(self.ordering):
+            equal = {f.name: position[j] for j, (f, _) in enumerate(self.ordering[:i])}
+            lookup = 'lt' if descending != reverse else 'gt'
+            clauses.append(Q(**equal, **{f'{field.name}__{lookup}': position[i]}))
+        return reduce(or_, clauses)
+
+    # --- Kursory ---
+
+    def position_of(self, obj):
+        # Wiersz może być instancją modelu albo słownikiem z .values()
+        if isinstance(obj, dict):
+            return [obj[field.attname] for field, _ in self.ordering]
+        return [getattr(obj, field.attname) for field, _ in self.ordering]
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': [_encode_value(v) for v in position]}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, model, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [field.to_python(value) for (field, _), value in zip(self.ordering, values)]
+        except (TypeError, ValueError, KeyError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get('r'))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position_of(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position_of(self.page[0]), reverse=True)
@@ -0,0 +1,83 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+_lookups_cache = {}
+
+
+def _walk(model, path, select, prefetch):
+    """
+    Dla ścieżki relacji (np. ['reservation', 'property']) dopisuje lookup do
+    select_related, dopóki relacje są "do jednego", a od pierwszej relacji
+    "do wielu" — do prefetch_related. Zwraca model na końcu ścieżki.
+    """
+    many = False
+    for i, name in enumerate(path):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None  # property / metoda modelu — nie da się dociągnąć
+        if not field.is_relation:
+            return None
+        many = many or field.many_to_many or field.one_to_many
+        lookup = '__'.join(path[:i + 1])
+        (prefetch if many else select).add(lookup)
+        model = field.related_model
+    return model
+
+
+def _collect(serializer, model, prefix, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        path = prefix + field.source.split('.')
+
+        if isinstance(field, serializers.BaseSerializer):
+            # Zagnieżdżony serializer: dociągamy relację i schodzimy do jego pól
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+            related = _walk(model, path, select, prefetch)
+            if related is not None:
+                _collect(child, related, path, select, prefetch)
+        elif isinstance(field, ManyRelatedField):
+            _walk(model, path, select, prefetch)
+        elif isinstance(field, RelatedField):
+            # PK bierzemy z kolumny *_id — obiekt potrzebny tylko bez tej optymalizacji
+            _walk(model, path if not field.use_pk_only_optimization() else path[:-1], select, prefetch)
+        elif len(path) > 1:
+            # source="owner.username" — wystarczy relacja do rodzica atrybutu
+            _walk(model, path[:-1], select, prefetch)
+
+
+def related_lookups(serializer_class):
+    """
+    (select_related, prefetch_related) potrzebne, żeby serializer nie robił
+    osobnego zapytania na każdy wiersz. Wynik jest liczony raz na klasę.
+    """
+    if serializer_class not in _lookups_cache:
+        select, prefetch = set(), set()
+        _collect(serializer_class(), serializer_class.Meta.model, [], select, prefetch)
+        # a__b w select_related obejmuje też a
+        select = {s for s in select if not any(o.startswith(s + '__') for o in select)}
+        _lookups_cache[serializer_class] = (sorted(select), sorted(prefetch))
+    return _lookups_cache[serializer_class]
+
+
+def optimize_queryset(queryset, serializer_class):
+    select, prefetch = related_lookups(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class AutoPrefetchMixin:
+    """
+    Dokłada do querysetu widoku select_related / prefetch_related wyliczone
+    z pól serializera. Działa także przy własnym get_queryset(), bo list()
+    i get_object() zawsze przechodzą przez filter_queryset().
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimize_queryset(queryset, self.get_serializer_class())
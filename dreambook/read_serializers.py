@@ -0,0 +1,142 @@
+import copy
+from datetime import timezone as dt_timezone
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+# Pola, których reprezentacja to po prostu wartość z bazy
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+    serializers.FloatField, serializers.BooleanField, serializers.JSONField,
+    serializers.ReadOnlyField, serializers.PrimaryKeyRelatedField,
+)
+# Pola, których nie da się zbudować z jednej kolumny .values()
+UNSUPPORTED_FIELDS = (
+    serializers.BaseSerializer, serializers.ManyRelatedField,
+    serializers.SerializerMethodField, serializers.HyperlinkedRelatedField,
+)
+
+
+def _decimal_converter(field):
+    if (not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            or field.localize or field.normalize_output):
+        return lambda value, tz: field.to_representation(value)
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+    return lambda value, tz: f'{value.quantize(exponent, rounding=ROUND_HALF_UP):f}'
+
+
+def _datetime_converter(field):
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() != ISO_8601:
+        return lambda value, tz: field.to_representation(value)
+
+    def convert(value, tz):
+        tz = getattr(field, 'timezone', tz)
+        if tz is not None:
+            value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, dt_timezone.utc)
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _date_converter(field):
+    if getattr(field, 'format', api_settings.DATE_FORMAT).lower() != ISO_8601:
+        return lambda value, tz: field.to_representation(value)
+    return lambda value, tz: value.isoformat()
+
+
+def _converter_for(field):
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return _date_converter(field)
+    if isinstance(field, serializers.BigIntegerField) and getattr(
+            field, 'coerce_to_string', api_settings.COERCE_BIGINT_TO_STRING):
+        return lambda value, tz: str(value)
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    return lambda value, tz: field.to_representation(value)
+
+
+class ValuesSerializer:
+    """
+    Szybka ścieżka odczytu dla ModelSerializera: wiersze pobieramy przez
+    .values() (bez budowania instancji modeli), a każde pole zamieniamy
+    konwerterem przygotowanym raz na serializer. Wynik jest taki sam jak
+    serializer_class(many=True).data. Do zapisu dalej służy ModelSerializer.
+    """
+    _cache = {}
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.columns = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, UNSUPPORTED_FIELDS) or field.source == '*':
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name} cannot be read with .values()'
+                )
+            self.columns.append((name, field.source.replace('.', '__'), _converter_for(field)))
+        self.lookups = [lookup for _, lookup, _ in self.columns]
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        if serializer_class not in cls._cache:
+            cls._cache[serializer_class] = cls(serializer_class)
+        return cls._cache[serializer_class]
+
+    def only(self, names):
+        """
+        Ten sam odczyt ograniczony do wybranych pól (np. z ?fields=) — SELECT
+        czyta tylko ich kolumny. Nieznana nazwa to ValueError.
+        """
+        names = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+        known = {name for name, _, _ in self.columns}
+        unknown = [name for name in names if name not in known]
+        if unknown or not names:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}' if unknown else 'No fields given')
+        projected = copy.copy(self)
+        projected.columns = [column for column in self.columns if column[0] in names]
+        projected.lookups = [lookup for _, lookup, _ in projected.columns]
+        return projected
+
+    def values(self, queryset):
+        """
+        queryset.values() z kolumnami serializera i polami sortowania
+        (te ostatnie są potrzebne paginacji do zbudowania kursora).
+        """
+        lookups = list(self.lookups)
+        meta = self.model._meta
+        ordering = [o.lstrip('-') for o in queryset.query.order_by if isinstance(o, str)]
+        for name in ordering + ['pk']:
+            if name in queryset.query.annotations:
+                lookups.append(name)
+                continue
+            field = meta.pk if name == 'pk' else meta.get_field(name)
+            if field.attname not in lookups:
+                lookups.append(field.attname)
+        return queryset.values(*lookups)
+
+    def to_representation(self, rows):
+        # Strefa jak w DateTimeField.default_timezone(), liczona raz na całą listę
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        return [self.row_to_dict(row, tz) for row in rows]
+
+    def row_to_dict(self, row, tz):
+        data = {}
+        for name, lookup, convert in self.columns:
+            value = row[lookup]
+            data[name] = value if convert is None or value is None else convert(value, tz)
+        return data
+
+    def serialize(self, queryset):
+        return self.to_representation(self.values(queryset))
@@ -58,8 +58,21 @@ REST_FRAMEWORK = {
     # "DEFAULT_PERMISSION_CLASSES": [
         # "rest_framework.permissions.IsAuthenticated",
     # ],
+    "DEFAULT_PAGINATION_CLASS": "dreambook.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
 }
 
+# Zapisuj kombinacje filtrów z /api/properties/ (dane dla suggest_property_indexes)
+RECORD_PROPERTY_SEARCHES = False
+
+# Indeks pełnotekstowy (filtering_sorting.search): 'auto' = FTS5 na SQLite, gdzie dostępne,
+# w przeciwnym razie przenośna tabela SearchTerm; 'fts5' / 'terms' wymusza backend
+SEARCH_BACKEND = 'auto'
+
+# Cache kafelków /api/map-tiles/{z}/{x}/{y} na dysku; nowy MapUpdate unieważnia wszystkie
+MAP_TILE_CACHE_DIR = BASE_DIR / 'tile_cache'
+MAP_TILE_MAX_AGE = 3600  # s, Cache-Control dla przeglądarek i CDN
+
 CSRF_TRUSTED_ORIGINS = ["http://127.0.0.1:8000", "http://localhost:8000"]
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -103,6 +116,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: transakcje zapisujące czekają na siebie od początku,
+            # zamiast kończyć się "database is locked" przy commicie (SQLite nie ma FOR UPDATE)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -0,0 +1,85 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def _dumps(item):
+    return json.dumps(item, cls=JSONEncoder, ensure_ascii=False)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Jeden obiekt JSON na linię (application/x-ndjson). Zwykłe odpowiedzi
+    (szczegóły, create) też da się tak wyrenderować — listy lecą wiersz po wierszu.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict) and 'results' in data:
+            data = data['results']
+        items = data if isinstance(data, list) else [data]
+        return ''.join(_dumps(item) + '\n' for item in items).encode(self.charset)
+
+
+def iter_serialized(queryset, serializer_class, context, chunk_size):
+    """
+    Serializuje queryset paczkami po chunk_size wierszy — w pamięci jest
+    naraz tylko jedna paczka, niezależnie od rozmiaru tabeli.
+    """
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield serializer_class(chunk, many=True, context=context).data
+            chunk = []
+    if chunk:
+        yield serializer_class(chunk, many=True, context=context).data
+
+
+def stream_ndjson(chunks):
+    for items in chunks:
+        yield ''.join(_dumps(item) + '\n' for item in items)
+
+
+def stream_json_array(chunks):
+    yield '['
+    first = True
+    for items in chunks:
+        if not items:
+            continue
+        yield ('' if first else ',') + ','.join(_dumps(item) for item in items)
+        first = False
+    yield ']'
+
+
+class StreamingListMixin:
+    """
+    Tryb eksportu dla widoków listujących: ?format=ndjson (albo
+    Accept: application/x-ndjson) zwraca NDJSON, a ?stream=1 tablicę JSON.
+    W obu przypadkach cała (przefiltrowana) lista idzie strumieniem, bez paginacji.
+    """
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [NDJSONRenderer]
+    stream_chunk_size = 1000
+
+    def wants_stream(self, request):
+        return (request.accepted_renderer.format == NDJSONRenderer.format
+                or request.query_params.get('stream') in ('1', 'true'))
+
+    def list(self, request, *args, **kwargs):
+        if not self.wants_stream(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = iter_serialized(queryset, self.get_serializer_class(),
+                                 self.get_serializer_context(), self.stream_chunk_size)
+
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return StreamingHttpResponse(stream_ndjson(chunks), content_type=NDJSONRenderer.media_type)
+        return StreamingHttpResponse(stream_json_array(chunks), content_type='application/json')
@@ -0,0 +1,24 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountAssertionsMixin:
+    """
+    Pomocnik do testów widoków listujących: liczba zapytań SQL nie może
+    rosnąć razem z liczbą zwracanych wierszy (czyli nie ma N+1).
+    """
+
+    def assertQueryCountConstant(self, url, make_rows, sizes=(1, 5), params=None):
+        counts = {}
+        created = 0
+        for size in sizes:
+            make_rows(size - created)
+            created = size
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            counts[size] = len(ctx.captured_queries)
+
+        if len(set(counts.values())) > 1:
+            details = ', '.join(f'{size} rows: {count} queries' for size, count in counts.items())
+            self.fail(f'Query count for {url} grows with result size ({details})')
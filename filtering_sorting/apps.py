@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class FilteringSortingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'filtering_sorting'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import create_search_tables
+        post_migrate.connect(create_search_tables, sender=self)
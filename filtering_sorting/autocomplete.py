@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from heapq import nsmallest
+
+from django.db import connection
+from django.db.models import Count
+
+from hosts.models import Host
+from listings.models import Listing
+from map.models import Location
+
+from .models import Property
+from .search import tokenize
+
+# Źródła podpowiedzi: model → pole z nazwą miejsca
+SOURCES = {Property: 'location', Listing: 'location', Host: 'location', Location: 'name'}
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+# Pełne przeładowanie co tyle sekund: zapisy z innych procesów i importy przez bulk_create
+REFRESH_INTERVAL = 10 * 60  # s
+# Prefiks pasujący do tylu kluczy ma zapamiętaną listę najlepszych (krótkie prefiksy typu 'k')
+CACHED_RANGE = 1000
+
+
+def suggestion_key(text):
+    """'Kraków, Stare  Miasto' → 'krakow stare miasto' — tak samo wpis i wpisywany tekst."""
+    return ' '.join(tokenize(text))
+
+
+def _word_starts(key):
+    """Klucz od początku każdego słowa: 'stare m' trafia też w 'krakow stare miasto'."""
+    words = key.split(' ')
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class _Snapshot:
+    """
+    Niezmienny stan podpowiedzi: posortowana tablica kluczy (od początku
+    każdego słowa) z równoległą tablicą numerów wpisów oraz etykiety i wagi
+    wpisów. Prefiks to zakres dwóch bisectów. Zmiana buduje nowy obiekt
+    z kopii list (copy-on-write), więc czytelnik nigdy nie widzi stanu
+    w połowie zapisu.
+    """
+
+    def __init__(self, keys, entries, labels, weights, index, built_at, tops=None):
+        self.keys = keys
+        self.entries = entries
+        self.labels = labels
+        self.weights = weights
+        self.index = index
+        self.built_at = built_at
+        # {prefiks: najlepsze wpisy} dla szerokich zakresów; wyścig dwóch wątków zapisze to samo
+        self.tops = tops or {}
+
+    @classmethod
+    def build(cls, counts):
+        """counts: {tekst: liczba wystąpień}. Warianty zapisu jednego klucza się sumują, etykietą jest najczęstszy."""
+        spellings = defaultdict(Counter)
+        for text, count in counts.items():
+            key = suggestion_key(text)
+            if key:
+                spellings[key][text.strip()] += count
+        labels, weights, index = [], [], {}
+        for key, variants in spellings.items():
+            index[key] = len(labels)
+            labels.append(variants.most_common(1)[0][0])
+            weights.append(sum(variants.values()))
+        pairs = sorted((start, entry) for key, entry in index.items() for start in _word_starts(key))
+        return cls([start for start, _ in pairs], [entry for _, entry in pairs], labels, weights, index,
+                   time.monotonic())
+
+    def apply(self, deltas):
+        """Nowy snapshot z naniesionymi deltami {tekst: ±n}; nowe miejsca wstawiane bisectem."""
+        keys, entries, labels = self.keys, self.entries, self.labels
+        weights, index = list(self.weights), self.index
+        changed = []
+        for text, delta in deltas.items():
+            key = suggestion_key(text)
+            if not key:
+                continue
+            changed += _word_starts(key)
+            entry = index.get(key)
+            if entry is not None:
+                # Wpis z wagą 0 zostaje do pełnego przeładowania, ale nie jest podpowiadany
+                weights[entry] = max(weights[entry] + delta, 0)
+            elif delta > 0:
+                if index is self.index:
+                    keys, entries, labels, index = list(keys), list(entries), list(labels), dict(index)
+                index[key] = len(labels)
+                labels.append(text.strip())
+                weights.append(delta)
+                for start in _word_starts(key):
+                    position = bisect_left(keys, start)
+                    keys.insert(position, start)
+                    entries.insert(position, index[key])
+        # Zapamiętane listy zostają, o ile zmiana nie dotyczy ich prefiksu. Czytelnicy
+        # dopisują do self.tops bez blokady — iterujemy po kopii (list() w C, pod GIL-em)
+        tops = {prefix: top for prefix, top in list(self.tops.items())
+                if not any(start.startswith(prefix) for start in changed)}
+        return _Snapshot(keys, entries, labels, weights, index, self.built_at, tops)
+
+    def _best(self, low, high, limit):
+        matches = {entry for entry in self.entries[low:high] if self.weights[entry] > 0}
+        return nsmallest(limit, matches, key=lambda entry: (-self.weights[entry], self.labels[entry]))
+
+    def suggest(self, query, limit):
+        prefix = suggestion_key(query)
+        if not prefix:
+            return []
+        low = bisect_left(self.keys, prefix)
+        high = bisect_left(self.keys, prefix + '\U0010ffff', low)
+        if high - low < CACHED_RANGE:
+            best = self._best(low, high, limit)
+        else:
+            best = self.tops.get(prefix)
+            if best is None:
+                best = self.tops[prefix] = self._best(low, high, MAX_SUGGESTIONS)
+            best = best[:limit]
+        return [(self.labels[entry], self.weights[entry]) for entry in best]
+
+
+class LocationAutocomplete:
+    """
+    Podpowiedzi nazw miejsc ze wszystkich SOURCES, od najpopularniejszych
+    (liczba ofert, hostów i punktów z daną nazwą). Snapshot w pamięci procesu
+    budowany leniwie przy pierwszym zapytaniu, potem co REFRESH_INTERVAL
+    w wątku w tle. Odczyt bierze referencję bez blokady; zapisy (sygnały,
+    po commicie) i podmiana po przeładowaniu idą pod krótką blokadą.
+    """
+    _snapshot = None
+    # Podmiana snapshotu i lista _pending
+    _lock = threading.Lock()
+    # Najwyżej jedno budowanie naraz
+    _build_lock = threading.Lock()
+    # Delty naniesione w trakcie budowania — dogrywane na nowy snapshot
+    _pending = None
+    # Zmieniana przez reset(); budowa rozpoczęta przed resetem jest odrzucana
+    _generation = 0
+
+    @staticmethod
+    def load():
+        """{tekst: liczba wystąpień} — jedno GROUP BY na źródło."""
+        counts = Counter()
+        for model, field in SOURCES.items():
+            for text, count in (model.objects.exclude(**{field: ''}).values(field)
+                                .annotate(count=Count('pk')).values_list(field, 'count').order_by()):
+                counts[text] += count
+        return counts
+
+    @classmethod
+    def _rebuild(cls):
+        """
+        Buduje snapshot z bazy bez blokady (apply() działa dalej), pod blokadą
+        tylko podmienia go i dogrywa delty zebrane od początku load().
+        Wołane pod _build_lock.
+        """
+        with cls._lock:
+            cls._pending, generation = [], cls._generation
+        try:
+            snapshot = _Snapshot.build(cls.load())
+        except BaseException:
+            with cls._lock:
+                cls._pending = None
+            raise
+        with cls._lock:
+            pending, cls._pending = cls._pending, None
+            if generation == cls._generation:
+                for deltas in pending:
+                    snapshot = snapshot.apply(deltas)
+                cls._snapshot = snapshot
+
+    @classmethod
+    def _refresh(cls):
+        try:
+            cls._rebuild()
+        finally:
+            # Wątek w tle ma własne połączenie z bazą
+            connection.close()
+            cls._build_lock.release()
+
+    @classmethod
+    def _current(cls):
+        snapshot = cls._snapshot
+        if snapshot is None:
+            with cls._build_lock:
+                if cls._snapshot is None:
+                    cls._rebuild()
+            return cls._snapshot
+        # Przeładowuje jeden wątek w tle; zapytania w tym czasie czytają poprzedni snapshot
+        if time.monotonic() - snapshot.built_at > REFRESH_INTERVAL and cls._build_lock.acquire(blocking=False):
+            threading.Thread(target=cls._refresh, daemon=True).start()
+        return snapshot
+
+    @classmethod
+    def suggest(cls, query, limit=DEFAULT_SUGGESTIONS):
+        """[(etykieta, waga)] miejsc, których któreś słowo zaczyna się od query."""
+        return cls._current().suggest(query, limit)
+
+    @classmethod
+    def apply(cls, deltas):
+        """
+        deltas: {tekst: ±n}. Przed pierwszym zapytaniem nie ma czego
+        aktualizować — leniwe zbudowanie i tak przeczyta stan z bazy.
+        """
+        with cls._lock:
+            if cls._snapshot is not None:
+                cls._snapshot = cls._snapshot.apply(deltas)
+            if cls._pending is not None:
+                cls._pending.append(deltas)
+
+    @classmethod
+    def reset(cls):
+        """Wymusza przeładowanie z bazy przy następnym zapytaniu (np. po imporcie)."""
+        with cls._lock:
+            cls._snapshot = None
+            cls._generation += 1
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from django.db.models import Q
 
 # Abstrakcyjna klasa kryteriów
 class Criteria(ABC):
@@ -8,9 +9,36 @@ class Criteria(ABC):
 
 # Abstrakcyjna klasa filtru
 class AbstractFilter(ABC):
+    # Szacowany odsetek wierszy, które przechodzą przez filtr (0..1)
+    selectivity = 1.0
+    # Względny koszt sprawdzenia warunku dla jednego wiersza
+    cost = 1.0
+    # Kolumna, którą może obsłużyć zwykły indeks B-tree (None = brak)
+    index_field = None
+    # Zakres (>=, <=) czy równość / IN — ważne dla kolejności kolumn w indeksie
+    is_range = True
+
     def __init__(self, filter_id=None):
         self.filter_id = filter_id
 
     @abstractmethod
-    def apply(self, queryset):
+    def condition(self, queryset):
+        """
+        Zwraca warunek (Q) dla bazy, na której działa queryset,
+        albo None, jeśli kryteria są puste.
+        """
         pass
+
+    def estimated_selectivity(self):
+        return self.selectivity
+
+    def apply(self, queryset):
+        condition = self.condition(queryset)
+        if condition is None:
+            return queryset
+        return queryset.filter(condition)
+
+
+def as_q(condition):
+    # RawSQL / Exists trzeba owinąć w Q, żeby można je było łączyć przez &
+    return condition if isinstance(condition, Q) else Q(condition)
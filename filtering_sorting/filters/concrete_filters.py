@@ -1,144 +1,163 @@
-from .abstract_filter import AbstractFilter
+from .abstract_filter import AbstractFilter, as_q
 from .criteria import (PriceCriteria, LocationCriteria, RatingCriteria,
                        AmenityCriteria, DistanceCriteria, PropertyTypeCriteria,
-                       ReviewCountCriteria)
-from django.db import connection
+                       ReviewCountCriteria, AvailabilityCriteria)
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+from ..search import SearchIndex
 
 class PriceFilter(AbstractFilter):
+    selectivity = 0.3
+    index_field = 'price_per_night'
+
     def __init__(self, criteria: PriceCriteria):
         super().__init__()
         self.criteria = criteria
 
-    def apply(self, queryset):
+    def condition(self, queryset):
         if self.criteria.min_price is not None and self.criteria.max_price is not None:
-            if isinstance(queryset, list):
-                # Filtrowanie na liście
-                return [
-                    prop for prop in queryset
-                    if self.criteria.min_price <= prop.price_per_night <= self.criteria.max_price
-                ]
-            else:
-                # Filtrowanie na QuerySecie
-                return queryset.filter(
-                    price_per_night__gte=self.criteria.min_price,
-                    price_per_night__lte=self.criteria.max_price
-                )
-        return queryset
+            return Q(
+                price_per_night__gte=self.criteria.min_price,
+                price_per_night__lte=self.criteria.max_price
+            )
+        return None
 
 
 class LocationFilter(AbstractFilter):
+    selectivity = 0.1
+    # Słowa lokalizacji jako prefiksy z indeksu pełnotekstowego — bez skanu LIKE '%x%'
+    cost = 0.5
+
     def __init__(self, criteria: LocationCriteria):
         super().__init__()
         self.criteria = criteria
 
-    def apply(self, queryset):
+    def condition(self, queryset):
         if self.criteria.location_id:
-            if isinstance(queryset, list):
-                # Filtrowanie ręczne listy
-                return [
-                    prop for prop in queryset
-                    if self.criteria.location_id.lower() in prop.location.lower()
-                ]
-            else:
-                # Filtrowanie na QuerySecie
-                return queryset.filter(location__icontains=self.criteria.location_id)
-        return queryset
+            return SearchIndex.condition('property', self.criteria.location_id, columns=['location'])
+        return None
 
 
 class RatingFilter(AbstractFilter):
+    selectivity = 0.5
+    index_field = 'rating'
+
     def __init__(self, criteria: RatingCriteria):
         super().__init__()
         self.criteria = criteria
 
-    def apply(self, queryset):
+    def condition(self, queryset):
         if self.criteria.min_rating is not None and self.criteria.max_rating is not None:
-            if isinstance(queryset, list):
-                return [
-                    prop for prop in queryset
-                    if self.criteria.min_rating <= prop.rating <= self.criteria.max_rating
-                ]
-            else:
-                return queryset.filter(
-                    rating__gte=self.criteria.min_rating,
-                    rating__lte=self.criteria.max_rating
-                )
-        return queryset
+            return Q(
+                rating__gte=self.criteria.min_rating,
+                rating__lte=self.criteria.max_rating
+            )
+        return None
+
+
+def amenity_condition(queryset, amenity):
+    """
+    Warunek SQL "nieruchomość ma dane udogodnienie" dla bazy, na której
+    działa queryset. Zwraca obiekt, który można przekazać do .filter().
+    """
+    connection = connections[queryset.db]
+
+    if connection.features.supports_json_field_contains:
+        # PostgreSQL / MySQL obsługują JSONField contains natywnie
+        return Q(amenities__contains=[amenity])
+
+    # SQLite nie wspiera contains -> sprawdzamy tablicę JSON przez json_each (JSON1)
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    column = connection.ops.quote_name(queryset.model._meta.get_field('amenities').column)
+    return RawSQL(
+        f'EXISTS (SELECT 1 FROM json_each({table}.{column}) WHERE json_each.value = %s)',
+        (amenity,),
+        output_field=BooleanField(),
+    )
+
 
 class AmenityFilter(AbstractFilter):
+    selectivity = 0.4  # na jedno udogodnienie
+    cost = 5.0  # podzapytanie po tablicy JSON
+
     def __init__(self, criteria: AmenityCriteria):
         super().__init__()
         self.criteria = criteria
 
-    def apply(self, queryset):
-        if not self.criteria.amenities:
-            return queryset
-
-        # WYKRYWAMY czy używamy PostgreSQL czy nie
-        db_vendor = connection.vendor  # 'postgresql', 'sqlite', 'mysql', itd.
+    def estimated_selectivity(self):
+        return self.selectivity ** len(self.criteria.amenities)
 
-        if db_vendor == 'postgresql':
-            # PostgreSQL obsługuje JSONField contain -> filtrujemy normalnie
-            for amenity in self.criteria.amenities:
-                queryset = queryset.filter(amenities__contains=[amenity])
-            return queryset
-        else:
-            # inne bazy (np. sqlite) -> filtrujemy ręcznie
-            if not isinstance(queryset, list):
-                queryset = list(queryset)
-
-            return [
-                prop for prop in queryset
-                if all(amenity in prop.amenities for amenity in self.criteria.amenities)
-            ]
+    def condition(self, queryset):
+        if not self.criteria.amenities:
+            return None
 
+        q = Q()
+        for amenity in self.criteria.amenities:
+            q &= as_q(amenity_condition(queryset, amenity))
+        return q
 
 
 class DistanceFilter(AbstractFilter):
+    selectivity = 0.5
+    index_field = 'distance_to_center'
+
     def __init__(self, criteria: DistanceCriteria):
         super().__init__()
         self.criteria = criteria
 
-    def apply(self, queryset):
+    def condition(self, queryset):
         if self.criteria.max_distance is not None:
-            if isinstance(queryset, list):
-                return [
-                    prop for prop in queryset
-                    if prop.distance_to_center <= self.criteria.max_distance
-                ]
-            else:
-                return queryset.filter(distance_to_center__lte=self.criteria.max_distance)
-        return queryset
+            return Q(distance_to_center__lte=self.criteria.max_distance)
+        return None
 
 
 class PropertyTypeFilter(AbstractFilter):
+    selectivity = 0.2  # na jeden typ
+    index_field = 'property_type'
+    is_range = False
+
     def __init__(self, criteria: PropertyTypeCriteria):
         super().__init__()
         self.criteria = criteria
 
-    def apply(self, queryset):
+    def estimated_selectivity(self):
+        return min(1.0, self.selectivity * len(self.criteria.property_types))
+
+    def condition(self, queryset):
         if self.criteria.property_types:
-            if isinstance(queryset, list):
-                return [
-                    prop for prop in queryset
-                    if prop.property_type in self.criteria.property_types
-                ]
-            else:
-                return queryset.filter(property_type__in=self.criteria.property_types)
-        return queryset
+            return Q(property_type__in=self.criteria.property_types)
+        return None
 
 
 class ReviewCountFilter(AbstractFilter):
+    selectivity = 0.5
+    index_field = 'review_count'
+
     def __init__(self, criteria: ReviewCountCriteria):
         super().__init__()
         self.criteria = criteria
 
-    def apply(self, queryset):
+    def condition(self, queryset):
         if self.criteria.min_reviews is not None:
-            if isinstance(queryset, list):
-                return [
-                    prop for prop in queryset
-                    if prop.review_count >= self.criteria.min_reviews
-                ]
-            else:
-                return queryset.filter(review_count__gte=self.criteria.min_reviews)
-        return queryset
+            return Q(review_count__gte=self.criteria.min_reviews)
+        return None
+
+
+class AvailabilityFilter(AbstractFilter):
+    selectivity = 0.5
+    index_field = 'available_from'
+
+    def __init__(self, criteria: AvailabilityCriteria):
+        super().__init__()
+        self.criteria = criteria
+
+    def condition(self, queryset):
+        # Cały pobyt musi mieścić się w oknie dostępności nieruchomości
+        if self.criteria.start_date is not None and self.criteria.end_date is not None:
+            return Q(
+                available_from__lte=self.criteria.start_date,
+                available_to__gte=self.criteria.end_date
+            )
+        return None
@@ -52,3 +52,12 @@ class ReviewCountCriteria(Criteria):
 
     def set_criteria(self, min_reviews):
         self.min_reviews = min_reviews
+
+class AvailabilityCriteria(Criteria):
+    def __init__(self):
+        self.start_date = None
+        self.end_date = None
+
+    def set_criteria(self, start_date, end_date):
+        self.start_date = start_date
+        self.end_date = end_date
@@ -0,0 +1,61 @@
+from django.db.models import Q
+from .abstract_filter import as_q
+from .criteria import (PriceCriteria, LocationCriteria, RatingCriteria,
+                       AmenityCriteria, DistanceCriteria, PropertyTypeCriteria,
+                       ReviewCountCriteria, AvailabilityCriteria)
+from .concrete_filters import (PriceFilter, LocationFilter, RatingFilter,
+                               AmenityFilter, DistanceFilter, PropertyTypeFilter,
+                               ReviewCountFilter, AvailabilityFilter)
+
+# Który filtr obsługuje dane kryteria
+FILTERS_BY_CRITERIA = {
+    PriceCriteria: PriceFilter,
+    LocationCriteria: LocationFilter,
+    RatingCriteria: RatingFilter,
+    AmenityCriteria: AmenityFilter,
+    DistanceCriteria: DistanceFilter,
+    PropertyTypeCriteria: PropertyTypeFilter,
+    ReviewCountCriteria: ReviewCountFilter,
+    AvailabilityCriteria: AvailabilityFilter,
+}
+
+
+class FilterPlan:
+    """
+    Kompiluje listę kryteriów do jednego wyrażenia Q.
+
+    Filtry są ustawiane od najbardziej selektywnego (a przy równej
+    selektywności od najtańszego), żeby baza odrzucała wiersze jak
+    najwcześniej, a drogie warunki (np. po JSON) liczyła na jak
+    najmniejszym zbiorze.
+    """
+
+    def __init__(self, criteria):
+        filters = [FILTERS_BY_CRITERIA[type(c)](c) for c in criteria]
+        self.filters = sorted(filters, key=lambda f: (f.estimated_selectivity(), f.cost))
+
+    def compile(self, queryset):
+        q = Q()
+        for f in self.filters:
+            condition = f.condition(queryset)
+            if condition is not None:
+                q &= as_q(condition)
+        return q
+
+    def apply(self, queryset):
+        return queryset.filter(self.compile(queryset))
+
+    def estimated_cost(self, total_rows):
+        """
+        Szacowana liczba sprawdzeń warunków: każdy filtr jest liczony
+        tylko dla wierszy, które przeszły przez poprzednie.
+        """
+        cost = 0.0
+        remaining = float(total_rows)
+        for f in self.filters:
+            cost += remaining * f.cost
+            remaining *= f.estimated_selectivity()
+        return cost
+
+    def describe(self):
+        return [type(f).__name__ for f in self.filters]
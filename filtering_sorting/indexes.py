@@ -0,0 +1,77 @@
+import hashlib
+
+from django.db import connection
+from django.db.models import F, Index
+from django.utils import timezone
+
+from .filters.plan import FILTERS_BY_CRITERIA
+from .models import Property, PropertySearchStat
+
+FILTERS_BY_NAME = {cls.__name__: cls for cls in FILTERS_BY_CRITERIA.values()}
+
+
+def record_search(filter_names):
+    """
+    Zlicza, jakiej kombinacji filtrów użyto w wyszukiwaniu
+    (na tej podstawie suggest_property_indexes proponuje indeksy).
+    """
+    key = ','.join(sorted(filter_names))
+    if not key:
+        return
+
+    stats = PropertySearchStat.objects.filter(filters=key)
+    if not stats.update(hits=F('hits') + 1, last_seen=timezone.now()):
+        _, created = PropertySearchStat.objects.get_or_create(filters=key, defaults={'hits': 1})
+        if not created:
+            stats.update(hits=F('hits') + 1, last_seen=timezone.now())
+
+
+def index_fields_for(filter_names):
+    """
+    Kolumny indeksu dla danej kombinacji filtrów: najpierw równości
+    (IN / =), potem jedna — najbardziej selektywna — kolumna zakresowa.
+    B-tree i tak nie wykorzysta więcej niż jednego zakresu.
+    """
+    filters = [FILTERS_BY_NAME[name] for name in filter_names
+               if name in FILTERS_BY_NAME and FILTERS_BY_NAME[name].index_field]
+    equality = sorted(f.index_field for f in filters if not f.is_range)
+    ranges = sorted((f for f in filters if f.is_range), key=lambda f: (f.selectivity, f.index_field))
+    if ranges:
+        return tuple(equality + [ranges[0].index_field])
+    return tuple(equality)
+
+
+def existing_index_columns(model=Property):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return [tuple(c['columns']) for c in constraints.values() if c['index'] or c['primary_key']]
+
+
+def is_covered(fields, existing, model=Property):
+    # Indeks (a, b) obsługuje też zapytania tylko po (a) — wystarczy prefiks
+    columns = tuple(model._meta.get_field(f).column for f in fields)
+    return any(cols[:len(columns)] == columns for cols in existing)
+
+
+def suggest_indexes(min_hits=1, model=Property):
+    """
+    Zwraca listę (fields, hits) z indeksami, których brakuje dla
+    zarejestrowanych wyszukiwań, od najczęściej używanych.
+    """
+    hits_by_fields = {}
+    for stat in PropertySearchStat.objects.filter(hits__gte=min_hits):
+        fields = index_fields_for(stat.filters.split(','))
+        if fields:
+            hits_by_fields[fields] = hits_by_fields.get(fields, 0) + stat.hits
+
+    existing = existing_index_columns(model)
+    suggestions = [
+        (fields, hits) for fields, hits in hits_by_fields.items()
+        if not is_covered(fields, existing, model)
+    ]
+    return sorted(suggestions, key=lambda s: (-s[1], s[0]))
+
+
+def build_index(fields):
+    digest = hashlib.md5(','.join(fields).encode()).hexdigest()[:8]
+    return Index(fields=list(fields), name=f'property_auto_{digest}_idx')
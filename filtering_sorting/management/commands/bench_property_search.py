@@ -0,0 +1,115 @@
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from filtering_sorting.filters.criteria import (PriceCriteria, RatingCriteria, DistanceCriteria,
+                                                PropertyTypeCriteria, ReviewCountCriteria)
+from filtering_sorting.filters.plan import FilterPlan
+from filtering_sorting.models import Property
+
+PROPERTY_TYPES = ['apartment', 'house', 'villa', 'studio', 'cabin']
+
+
+def _criteria(cls, *values):
+    criteria = cls()
+    criteria.set_criteria(*values)
+    return criteria
+
+
+# Kombinacje filtrów, które przyjmuje FilteredPropertyListAPIView
+SCENARIOS = {
+    'price': lambda: [_criteria(PriceCriteria, 100, 110)],
+    'type+price': lambda: [_criteria(PropertyTypeCriteria, ['villa']), _criteria(PriceCriteria, 100, 150)],
+    'type+rating': lambda: [_criteria(PropertyTypeCriteria, ['cabin']), _criteria(RatingCriteria, 4.8, 5.0)],
+    'distance': lambda: [_criteria(DistanceCriteria, 0.5)],
+    'min_reviews': lambda: [_criteria(ReviewCountCriteria, 490)],
+}
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks /api/properties/ filter queries with and without the Property indexes. '
+            'All generated rows are rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        self.stdout.write(f'{"rows":>9}  {"scenario":<12} {"no index":>10} {"indexed":>10} {"speedup":>8}')
+
+        with transaction.atomic():
+            self.drop_indexes()
+            for size in sorted(options['sizes']):
+                self.fill(size)
+                before = {name: self.time_query(plan, options['repeat']) for name, plan in SCENARIOS.items()}
+                self.create_indexes()
+                after = {name: self.time_query(plan, options['repeat']) for name, plan in SCENARIOS.items()}
+                self.drop_indexes()
+
+                for name in SCENARIOS:
+                    self.stdout.write(
+                        f'{size:>9}  {name:<12} {before[name]:>8.2f}ms {after[name]:>8.2f}ms '
+                        f'{before[name] / max(after[name], 1e-6):>7.1f}x'
+                    )
+            transaction.set_rollback(True)
+
+    def fill(self, size, batch_size=10_000):
+        missing = size - Property.objects.count()
+        while missing > 0:
+            batch = min(batch_size, missing)
+            Property.objects.bulk_create([
+                Property(
+                    title=f'Bench {i}',
+                    location=random.choice(['Warszawa', 'Kraków', 'Gdańsk', 'Wrocław']),
+                    price_per_night=random.randint(50, 1000),
+                    max_guests=random.randint(1, 8),
+                    available_from=date(2025, 1, 1),
+                    available_to=date(2025, 12, 31),
+                    rating=round(random.uniform(1, 5), 2),
+                    distance_to_center=round(random.uniform(0, 30), 2),
+                    property_type=random.choice(PROPERTY_TYPES),
+                    review_count=random.randint(0, 500),
+                )
+                for i in range(batch)
+            ], batch_size=1000)
+            missing -= batch
+
+    def time_query(self, build_criteria, repeat):
+        queryset = FilterPlan(build_criteria()).apply(Property.objects.all())
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.values_list('pk', flat=True))
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def existing_index_names(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, Property._meta.db_table))
+
+    # Surowe DDL zamiast "with schema_editor()" — SQLite nie pozwala otworzyć
+    # schema editora wewnątrz transakcji, a całość ma zostać wycofana
+    def drop_indexes(self):
+        existing = self.existing_index_names()
+        editor = connection.schema_editor()
+        table = connection.ops.quote_name(Property._meta.db_table)
+        with connection.cursor() as cursor:
+            for index in Property._meta.indexes:
+                if index.name in existing:
+                    cursor.execute(editor.sql_delete_index % {
+                        'table': table, 'name': connection.ops.quote_name(index.name),
+                    })
+
+    def create_indexes(self):
+        existing = self.existing_index_names()
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for index in Property._meta.indexes:
+                if index.name not in existing:
+                    cursor.execute(str(index.create_sql(Property, editor)))
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(Property._meta.db_table)}')
@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from filtering_sorting.search import SearchIndex, backend
+from hosts.models import Host
+
+FIRST_NAMES = ['Anna', 'Marek', 'Zofia', 'Piotr', 'Ewa', 'Jan', 'Kasia', 'Tomasz', 'Ola', 'Paweł']
+WORDS = ['apartamenty', 'domki', 'pokoje', 'wille', 'kwatery', 'lofty', 'studia', 'pensjonat', 'zajazd', 'hostel']
+CITIES = ['Warszawa', 'Kraków', 'Łódź', 'Wrocław', 'Poznań', 'Gdańsk', 'Szczecin', 'Lublin', 'Zakopane', 'Sopot']
+# Częste prefiksy (LIKE kończy po pierwszej stronie trafień) i zapytania selektywne / bez trafień,
+# przy których LIKE przegląda całą tabelę
+QUERIES = ['zakop', 'sopot pensjonat', 'anna lofty 1234', '98765', 'ewa hostel 4321', 'brak wynikow']
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks host search: icontains over name and location (what SearchFilter did) against '
+            'the full-text index, first page of results. All generated rows are rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        with transaction.atomic():
+            self.fill(options['rows'])
+            self.stdout.write(f'backend: {backend().__name__}')
+            self.stdout.write(f'{"query":<20} {"icontains":>10} {"indexed":>10} {"ranked":>10} {"speedup":>8}')
+            for query in QUERIES:
+                like = self.like(query)
+                indexed = Host.objects.filter(SearchIndex.condition('host', query)).order_by('pk')
+                ranked = SearchIndex.filter(Host.objects.all(), 'host', query).order_by('-search_rank', '-pk')
+                timings = [self.timed(qs, options) for qs in (like, indexed, ranked)]
+                self.stdout.write(f'{query:<20} {timings[0]:>8.2f}ms {timings[1]:>8.2f}ms {timings[2]:>8.2f}ms '
+                                  f'{timings[0] / max(timings[2], 1e-6):>7.1f}x')
+            transaction.set_rollback(True)
+
+    def fill(self, rows, batch_size=10_000):
+        self.stdout.write(f'Creating {rows} hosts...')
+        created = 0
+        while created < rows:
+            batch = min(batch_size, rows - created)
+            Host.objects.bulk_create([
+                Host(name=f'{random.choice(FIRST_NAMES)} {random.choice(WORDS)} {created + i}',
+                     location=random.choice(CITIES), image='https://example.com/h.jpg')
+                for i in range(batch)
+            ], batch_size=1000)
+            created += batch
+        started = time.perf_counter()
+        SearchIndex.rebuild('host', chunk_size=20_000)
+        self.stdout.write(f'index rebuilt in {time.perf_counter() - started:.1f}s')
+
+    def like(self, query):
+        # SearchFilter: każde słowo musi wystąpić w którymś z pól
+        condition = Q()
+        for word in query.split():
+            condition &= Q(name__icontains=word) | Q(location__icontains=word)
+        return Host.objects.filter(condition).order_by('pk')
+
+    def timed(self, queryset, options):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            list(queryset.values_list('pk', flat=True)[:options['page_size']])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
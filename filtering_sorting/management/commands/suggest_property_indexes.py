@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from filtering_sorting.indexes import build_index, suggest_indexes
+from filtering_sorting.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Suggests (or creates) Property indexes for recorded search filter combinations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-hits', type=int, default=1,
+                            help='Ignore filter combinations used fewer times than this')
+        parser.add_argument('--create', action='store_true',
+                            help='Create the suggested indexes instead of only printing them')
+
+    def handle(self, *args, **options):
+        suggestions = suggest_indexes(min_hits=options['min_hits'])
+
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS('All recorded searches are covered by existing indexes.'))
+            return
+
+        with connection.schema_editor(collect_sql=not options['create']) as schema_editor:
+            for fields, hits in suggestions:
+                index = build_index(fields)
+                self.stdout.write(f'-- {hits} searches on ({", ".join(fields)})')
+                self.stdout.write(f'{index.create_sql(Property, schema_editor)};')
+                if options['create']:
+                    schema_editor.add_index(Property, index)
+
+        if options['create']:
+            self.stdout.write(self.style.SUCCESS(f'Created {len(suggestions)} indexes.'))
@@ -13,5 +13,46 @@ class Property(models.Model):
     property_type = models.CharField(max_length=100, default="apartment")
     review_count = models.IntegerField(default=0)
 
+    class Meta:
+        # Indeksy pod filtry z FilteredPropertyListAPIView: równość (typ) na początku,
+        # potem jedna kolumna zakresowa
+        indexes = [
+            models.Index(fields=['price_per_night'], name='property_price_idx'),
+            models.Index(fields=['rating'], name='property_rating_idx'),
+            models.Index(fields=['distance_to_center'], name='property_distance_idx'),
+            models.Index(fields=['review_count'], name='property_reviews_idx'),
+            models.Index(fields=['property_type', 'price_per_night'], name='property_type_price_idx'),
+            models.Index(fields=['property_type', 'rating'], name='property_type_rating_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class PropertySearchStat(models.Model):
+    # Posortowane nazwy filtrów użytych w wyszukiwaniu, np. "PriceFilter,PropertyTypeFilter"
+    filters = models.CharField(max_length=255, unique=True)
+    hits = models.PositiveIntegerField(default=0)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filters} ({self.hits})"
+
+
+class SearchTerm(models.Model):
+    # Przenośny indeks odwrócony (filtering_sorting.search) dla baz bez FTS5
+    document = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    column = models.CharField(max_length=20)
+    term = models.CharField(max_length=64)
+    weight = models.FloatField(default=1.0)
+
+    class Meta:
+        indexes = [
+            # Prefiks jako zakres term >= 'war' AND term < 'war\U0010ffff'
+            models.Index(fields=['document', 'term', 'object_id'], name='search_term_idx'),
+            models.Index(fields=['document', 'object_id'], name='search_term_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.document}:{self.object_id} {self.column}={self.term}"
@@ -0,0 +1,298 @@
+import re
+import sqlite3
+import unicodedata
+from collections import defaultdict
+from functools import cache, reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from rest_framework.filters import BaseFilterBackend
+
+from hosts.models import Host, HostProfile
+from listings.models import Listing
+
+from .models import Property, SearchTerm
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+# Litery, których NFKD nie rozkłada na literę bazową + znak diakrytyczny
+_FOLD = str.maketrans({'ł': 'l', 'Ł': 'L', 'ø': 'o', 'Ø': 'O', 'đ': 'd', 'Đ': 'D', 'ß': 'ss'})
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """Małe litery bez znaków diakrytycznych — tak samo przy indeksowaniu i w zapytaniu."""
+    text = unicodedata.normalize('NFKD', (text or '').translate(_FOLD))
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in _TOKEN.findall(normalize(text))]
+
+
+class SearchDocument:
+    """
+    Model jako dokument do wyszukiwania: kolumny {nazwa: (lookup, waga)}
+    i modele zależne {model: atrybut z pk dokumentu}, których zapis
+    zmienia treść dokumentu (np. HostProfile.bio w dokumencie hosta).
+    """
+
+    def __init__(self, name, model, columns, related=None):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.related = related or {}
+
+    def rows(self, queryset, limit=None):
+        """(pk, [znormalizowany tekst kolumn]) — jedno zapytanie z JOIN-ami na lookupy."""
+        lookups = [lookup for lookup, _ in self.columns.values()]
+        rows = queryset.order_by('pk').values_list('pk', *lookups)
+        for pk, *values in rows[:limit] if limit else rows:
+            yield pk, [normalize(value) for value in values]
+
+
+DOCUMENTS = {
+    document.name: document for document in (
+        SearchDocument('host', Host, {
+            'name': ('name', 3.0), 'location': ('location', 2.0), 'bio': ('profile__bio', 1.0),
+        }, related={HostProfile: 'host_id'}),
+        SearchDocument('listing', Listing, {
+            'title': ('title', 3.0), 'description': ('description', 1.0), 'location': ('location', 2.0),
+        }),
+        SearchDocument('property', Property, {
+            'title': ('title', 3.0), 'location': ('location', 2.0),
+        }),
+    )
+}
+
+
+class Fts5Backend:
+    """
+    Tabela wirtualna FTS5 per dokument (rowid = pk), z indeksem prefiksów
+    2- i 3-znakowych. Ranking: bm25 z wagami kolumn.
+    """
+
+    @staticmethod
+    def table(document):
+        return f'search_{document.name}'
+
+    @classmethod
+    def create(cls, document, cursor):
+        columns = ', '.join(document.columns)
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {cls.table(document)} "
+                       f"USING fts5({columns}, tokenize='unicode61', prefix='2 3')")
+
+    @classmethod
+    def index(cls, document, rows):
+        table = cls.table(document)
+        columns = ', '.join(document.columns)
+        placeholders = ', '.join(['%s'] * len(document.columns))
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk, _ in rows])
+            cursor.executemany(f'INSERT INTO {table}(rowid, {columns}) VALUES (%s, {placeholders})',
+                               [(pk, *values) for pk, values in rows])
+
+    @classmethod
+    def remove(cls, document, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {cls.table(document)} WHERE rowid = %s', [(pk,) for pk in pks])
+
+    @classmethod
+    def clear(cls, document):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {cls.table(document)}')
+            cls.create(document, cursor)
+
+    @classmethod
+    def optimize(cls, document):
+        table = cls.table(document)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+
+    @staticmethod
+    def _match(terms, columns):
+        # Tokeny są już znormalizowane (same litery i cyfry), więc cudzysłów jest bezpieczny
+        prefix = f'{{{" ".join(columns)}}} : ' if columns else ''
+        return ' AND '.join(f'{prefix}"{term}"*' for term in terms)
+
+    @classmethod
+    def condition(cls, document, terms, columns):
+        table = cls.table(document)
+        return Q(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [cls._match(terms, columns)]))
+
+    @classmethod
+    def filter(cls, queryset, document, terms, columns):
+        """
+        Ranking przez JOIN z tabelą FTS: plan zaczyna od MATCH i dociąga
+        wiersze po pk. Skorelowane podzapytanie z bm25 wykonywałoby MATCH
+        osobno dla każdego trafienia (kwadratowo przy popularnym prefiksie).
+        """
+        table = cls.table(document)
+        weights = ', '.join(str(weight) for _, weight in document.columns.values())
+        meta = document.model._meta
+        outer = f'{connection.ops.quote_name(meta.db_table)}.{connection.ops.quote_name(meta.pk.column)}'
+        # bm25: im mniej, tym lepiej — odwracamy znak, żeby wszędzie "większy = trafniejszy"
+        return queryset.extra(
+            tables=[table], where=[f'{table}.rowid = {outer}', f'{table} MATCH %s'],
+            params=[cls._match(terms, columns)],
+        ).annotate(search_rank=RawSQL(f'-bm25({table}, {weights})', [], output_field=FloatField()))
+
+
+class TermsBackend:
+    """
+    Przenośny indeks odwrócony w SearchTerm: jeden wiersz na (dokument,
+    kolumna, słowo) z wagą. Prefiks to zakres po indeksie (document, term).
+    Ranking: suma wag dopasowanych słów.
+    """
+
+    @staticmethod
+    def create(document, cursor):
+        pass
+
+    @staticmethod
+    def index(document, rows):
+        SearchTerm.objects.filter(document=document.name, object_id__in=[pk for pk, _ in rows]).delete()
+        terms = []
+        for pk, values in rows:
+            weights = defaultdict(float)
+            for (column, (_, weight)), text in zip(document.columns.items(), values):
+                for term in tokenize(text):
+                    weights[column, term] += weight
+            terms += [SearchTerm(document=document.name, object_id=pk, column=column, term=term, weight=weight)
+                      for (column, term), weight in weights.items()]
+        SearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+    @staticmethod
+    def remove(document, pks):
+        SearchTerm.objects.filter(document=document.name, object_id__in=list(pks)).delete()
+
+    @staticmethod
+    def clear(document):
+        SearchTerm.objects.filter(document=document.name).delete()
+
+    @staticmethod
+    def optimize(document):
+        pass
+
+    @staticmethod
+    def _matching(document, terms, columns):
+        matching = SearchTerm.objects.filter(
+            reduce(or_, [Q(term__gte=term, term__lt=term + '\U0010ffff') for term in terms]),
+            document=document.name,
+        )
+        return matching.filter(column__in=columns) if columns else matching
+
+    @classmethod
+    def condition(cls, document, terms, columns):
+        return reduce(and_, [
+            Q(pk__in=cls._matching(document, [term], columns).values('object_id')) for term in terms
+        ])
+
+    @classmethod
+    def filter(cls, queryset, document, terms, columns):
+        # Podzapytanie per trafienie idzie po search_term_object_idx — kilka słów na obiekt
+        weights = (cls._matching(document, terms, columns).filter(object_id=OuterRef('pk'))
+                   .values('object_id').annotate(total=Sum('weight')).values('total'))
+        return queryset.filter(cls.condition(document, terms, columns)).annotate(
+            search_rank=Coalesce(Subquery(weights, output_field=FloatField()), Value(0.0)))
+
+
+BACKENDS = {'fts5': Fts5Backend, 'terms': TermsBackend}
+
+
+@cache
+def fts5_available():
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE probe USING fts5(x)')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def backend(using=None):
+    """SEARCH_BACKEND: 'fts5', 'terms' albo 'auto' (FTS5 na SQLite, gdzie jest dostępne)."""
+    name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        vendor = (using or connection).vendor
+        name = 'fts5' if vendor == 'sqlite' and fts5_available() else 'terms'
+    return BACKENDS[name]
+
+
+class SearchIndex:
+    @staticmethod
+    def update(name, pks):
+        """Przeindeksowuje podane obiekty; nieistniejące usuwa z indeksu."""
+        document = DOCUMENTS[name]
+        rows = list(document.rows(document.model.objects.filter(pk__in=pks)))
+        search_backend = backend()
+        search_backend.remove(document, set(pks) - {pk for pk, _ in rows})
+        search_backend.index(document, rows)
+
+    @staticmethod
+    def remove(name, pks):
+        backend().remove(DOCUMENTS[name], pks)
+
+    @staticmethod
+    def rebuild(name, chunk_size=5000):
+        """Indeks dokumentu od zera, paczkami po pk. Zwraca liczbę zaindeksowanych obiektów."""
+        document = DOCUMENTS[name]
+        search_backend = backend()
+        search_backend.clear(document)
+        indexed = 0
+        last = 0
+        while True:
+            rows = list(document.rows(document.model.objects.filter(pk__gt=last), chunk_size))
+            if not rows:
+                break
+            search_backend.index(document, rows)
+            indexed += len(rows)
+            last = rows[-1][0]
+        search_backend.optimize(document)
+        return indexed
+
+    @staticmethod
+    def condition(name, query, columns=None):
+        """Warunek "pasuje do zapytania" (każde słowo jako prefiks) albo None dla pustego zapytania."""
+        terms = tokenize(query)[:MAX_QUERY_TERMS]
+        if not terms:
+            return None
+        return backend().condition(DOCUMENTS[name], terms, columns)
+
+    @staticmethod
+    def filter(queryset, name, query, columns=None):
+        """Wyniki z adnotacją search_rank (większa = trafniejszy); puste zapytanie nie filtruje."""
+        terms = tokenize(query)[:MAX_QUERY_TERMS]
+        if not terms:
+            return queryset
+        return backend().filter(queryset, DOCUMENTS[name], terms, columns)
+
+
+def create_search_tables(using, **kwargs):
+    """post_migrate: tabele FTS5 (tabel wirtualnych nie da się opisać modelem)."""
+    search_backend = backend(connections[using])
+    with connections[using].cursor() as cursor:
+        for document in DOCUMENTS.values():
+            search_backend.create(document, cursor)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    ?search= po indeksie dokumentu view.search_document. Bez jawnego
+    sortowania (parametry z view.search_ordering_params) wyniki idą
+    od najtrafniejszych.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        filtered = SearchIndex.filter(queryset, view.search_document, query)
+        if filtered is queryset:
+            return queryset
+        ordering_params = getattr(view, 'search_ordering_params', ('ordering',))
+        if not any(request.query_params.get(param) for param in ordering_params):
+            filtered = filtered.order_by('-search_rank', '-pk')
+        return filtered
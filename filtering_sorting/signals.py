@@ -0,0 +1,62 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .autocomplete import SOURCES, LocationAutocomplete
+from .search import DOCUMENTS, SearchIndex
+
+
+def _connect(document):
+    def update_on_save(sender, instance, **kwargs):
+        SearchIndex.update(document.name, [instance.pk])
+
+    def remove_on_delete(sender, instance, **kwargs):
+        SearchIndex.remove(document.name, [instance.pk])
+
+    post_save.connect(update_on_save, sender=document.model, weak=False)
+    post_delete.connect(remove_on_delete, sender=document.model, weak=False)
+
+    for model, attribute in document.related.items():
+        def update_on_related_change(sender, instance, attribute=attribute, **kwargs):
+            # Po usunięciu dokumentu (kaskada) update() tylko usunie go z indeksu
+            SearchIndex.update(document.name, [getattr(instance, attribute)])
+
+        post_save.connect(update_on_related_change, sender=model, weak=False)
+        post_delete.connect(update_on_related_change, sender=model, weak=False)
+
+
+for search_document in DOCUMENTS.values():
+    _connect(search_document)
+
+
+def _apply_after_commit(deltas):
+    deltas = {text: delta for text, delta in deltas.items() if delta}
+    if deltas:
+        # Wycofana transakcja nie zmienia podpowiedzi
+        transaction.on_commit(lambda: LocationAutocomplete.apply(deltas))
+
+
+def _connect_autocomplete(model, field):
+    def remember_previous_place(sender, instance, **kwargs):
+        instance._previous_place = None
+        if instance.pk:
+            instance._previous_place = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+    def update_autocomplete_on_save(sender, instance, **kwargs):
+        deltas = Counter({getattr(instance, field): 1})
+        previous = getattr(instance, '_previous_place', None)
+        if previous is not None:
+            deltas[previous] -= 1
+        _apply_after_commit(deltas)
+
+    def update_autocomplete_on_delete(sender, instance, **kwargs):
+        _apply_after_commit({getattr(instance, field): -1})
+
+    pre_save.connect(remember_previous_place, sender=model, weak=False)
+    post_save.connect(update_autocomplete_on_save, sender=model, weak=False)
+    post_delete.connect(update_autocomplete_on_delete, sender=model, weak=False)
+
+
+for source, place_field in SOURCES.items():
+    _connect_autocomplete(source, place_field)
@@ -1,3 +1,343 @@
-from django.test import TestCase
+from datetime import date
+from io import StringIO
+import sys
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .filters.concrete_filters import AmenityFilter
+from .filters.criteria import AmenityCriteria, PriceCriteria, PropertyTypeCriteria
+from .filters.plan import FilterPlan
+from hosts.models import Host, HostProfile
+from listings.models import Listing
+from map.models import Location
+from .autocomplete import LocationAutocomplete, _Snapshot
+from .indexes import record_search, suggest_indexes
+from .models import Property, PropertySearchStat, SearchTerm
+from .search import Fts5Backend, SearchIndex, TermsBackend, backend, tokenize
+
+
+def make_property(**kwargs):
+    data = {
+        "title": "Mieszkanie",
+        "location": "Warszawa",
+        "price_per_night": "200.00",
+        "max_guests": 2,
+        "available_from": date(2025, 1, 1),
+        "available_to": date(2025, 12, 31),
+    }
+    data.update(kwargs)
+    return Property.objects.create(**data)
+
+
+class AmenityFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.both = make_property(title="Both", amenities=["wifi", "parking"])
+        self.wifi = make_property(title="Wifi", amenities=["wifi"])
+        self.none = make_property(title="None", amenities=[])
+
+    def test_amenity_filter_stays_queryset(self):
+        criteria = AmenityCriteria()
+        criteria.set_criteria(["wifi", "parking"])
+        result = AmenityFilter(criteria).apply(Property.objects.all())
+
+        self.assertIsInstance(result, QuerySet)
+        self.assertEqual(list(result), [self.both])
+
+    def test_amenity_filter_matches_whole_values_only(self):
+        make_property(title="Partial", amenities=["wifi-premium"])
+        criteria = AmenityCriteria()
+        criteria.set_criteria(["wifi"])
+        result = AmenityFilter(criteria).apply(Property.objects.all())
+
+        self.assertEqual(set(result), {self.both, self.wifi})
+
+    def test_amenities_combined_with_other_filters(self):
+        make_property(title="Far", amenities=["wifi"], distance_to_center=20)
+        response = self.client.get('/api/properties/', {
+            "amenities": "wifi",
+            "max_distance": 5,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({p["title"] for p in response.data["results"]}, {"Both", "Wifi"})
+
+
+class FilterPlanTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.match = make_property(title="Match", property_type="house", amenities=["wifi"])
+        make_property(title="Flat", property_type="apartment", amenities=["wifi"])
+        make_property(title="Pricey", property_type="house", price_per_night="900.00")
+
+    def test_most_selective_filter_goes_first(self):
+        amenities = AmenityCriteria()
+        amenities.set_criteria(["wifi"])
+        price = PriceCriteria()
+        price.set_criteria(100, 300)
+        types = PropertyTypeCriteria()
+        types.set_criteria(["house"])
+
+        plan = FilterPlan([amenities, price, types])
+        self.assertEqual(plan.describe(), ["PropertyTypeFilter", "PriceFilter", "AmenityFilter"])
+        self.assertEqual(list(plan.apply(Property.objects.all())), [self.match])
+
+    def test_filters_run_as_single_query(self):
+        params = {"price_min": 100, "price_max": 300, "property_types": "house", "amenities": "wifi"}
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/properties/', params)
+        self.assertEqual([p["title"] for p in response.data["results"]], ["Match"])
+
+    def test_available_between_criterion(self):
+        make_property(title="Summer", available_from=date(2025, 6, 1), available_to=date(2025, 8, 31))
+        response = self.client.get('/api/properties/', {
+            "start_date": "2025-01-10", "end_date": "2025-01-15", "property_types": "house",
+        })
+        self.assertEqual({p["title"] for p in response.data["results"]}, {"Match", "Pricey"})
+
+        response = self.client.get('/api/properties/', {"start_date": "2025-07-01", "end_date": "2025-07-05"})
+        self.assertEqual(len(response.data["results"]), 4)
+
+        response = self.client.get('/api/properties/', {"start_date": "2025-12-20", "end_date": "2026-01-02"})
+        self.assertEqual(response.data["results"], [])
+
+        for start, end in [("bad", "2025-01-15"), ("2025-01-10", "2025-13-01"), ("2025-01-15", "2025-01-10")]:
+            response = self.client.get('/api/properties/', {"start_date": start, "end_date": end})
+            self.assertEqual(response.status_code, 400, (start, end))
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers_expose_plan(self):
+        response = self.client.get('/api/properties/', {"property_types": "house", "min_reviews": 0})
+        self.assertEqual(response['X-Filter-Plan'], "PropertyTypeFilter, ReviewCountFilter")
+        self.assertIn("WHERE", response['X-Filter-Plan-SQL'])
+        self.assertIn('X-Filter-Plan-Cost', response)
+
+
+class IndexSuggestionTests(TestCase):
+    def test_record_search_counts_combinations(self):
+        record_search(["PriceFilter", "PropertyTypeFilter"])
+        record_search(["PropertyTypeFilter", "PriceFilter"])
+        stat = PropertySearchStat.objects.get()
+        self.assertEqual(stat.filters, "PriceFilter,PropertyTypeFilter")
+        self.assertEqual(stat.hits, 2)
+
+    def test_suggests_only_missing_indexes(self):
+        record_search(["PriceFilter", "PropertyTypeFilter"])  # property_type_price_idx
+        record_search(["DistanceFilter", "PropertyTypeFilter", "AmenityFilter"])
+        record_search(["LocationFilter"])  # brak kolumny dla B-tree
+
+        self.assertEqual(suggest_indexes(), [(("property_type", "distance_to_center"), 1)])
+
+    @override_settings(RECORD_PROPERTY_SEARCHES=True)
+    def test_view_records_searches(self):
+        self.client.get('/api/properties/', {"max_distance": 5})
+        self.assertEqual(PropertySearchStat.objects.get().filters, "DistanceFilter")
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.hosts = {}
+        for name, location, bio in [
+            ("Anna Kowalska", "Łódź", "Lofty w dawnej fabryce"),
+            ("Zielony Dom", "Kraków", "Blisko Łodzi i lasu"),
+            ("Marek Nowak", "Warszawa", "Apartamenty na Mokotowie"),
+        ]:
+            host = Host.objects.create(name=name, location=location, image="https://example.com/h.jpg")
+            HostProfile.objects.create(host=host, bio=bio)
+            self.hosts[name] = host
+
+    def search(self, query, **params):
+        response = self.client.get('/api/hosts/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [host['name'] for host in response.data['results']]
+
+    def test_backend(self):
+        self.assertIs(backend(), Fts5Backend)
+
+    def test_prefix_diacritics_and_ranking(self):
+        self.assertEqual(tokenize("Łódź, Zażółć!"), ["lodz", "zazolc"])
+        self.assertEqual(self.search("kowal"), ["Anna Kowalska"])
+        # Łódź w lokalizacji (waga 2) przed "Łodzi" w bio (waga 1)
+        self.assertEqual(self.search("lodz"), ["Anna Kowalska", "Zielony Dom"])
+        self.assertEqual(self.search("ŁÓDŹ lofty"), ["Anna Kowalska"])
+        self.assertEqual(self.search("lodz mokot"), [])
+        self.assertEqual(len(self.search("  ")), 3)
+
+    def test_index_follows_changes(self):
+        profile = HostProfile.objects.get(host=self.hosts["Marek Nowak"])
+        profile.bio = "Domki nad morzem"
+        profile.save()
+        self.assertEqual(self.search("morze"), ["Marek Nowak"])
+        self.assertEqual(self.search("mokotow"), [])
+
+        self.hosts["Anna Kowalska"].delete()
+        self.assertEqual(self.search("lodz"), ["Zielony Dom"])
+
+    def test_ranked_results_paginate(self):
+        for i in range(5):
+            Host.objects.create(name=f"Sopot {i}", location="Sopot", image="https://example.com/h.jpg")
+        seen = []
+        response = self.client.get('/api/hosts/', {'search': 'sopot', 'page_size': 2})
+        while True:
+            seen += [host['name'] for host in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(sorted(seen), [f"Sopot {i}" for i in range(5)])
+        self.assertEqual(len(self.search("sopot", ordering="-registration_date", page_size=10)), 5)
+
+    def test_rebuild_after_bulk_import(self):
+        Host.objects.bulk_create([Host(name=f"Import {i}", location="Gdynia", image="https://example.com/h.jpg")
+                                  for i in range(3)])
+        self.assertEqual(self.search("gdynia"), [])
+        call_command('rebuild_search_index', 'host', chunk_size=2, stdout=StringIO())
+        self.assertEqual(len(self.search("gdynia")), 3)
+        self.assertEqual(self.search("kowal"), ["Anna Kowalska"])
+
+    def test_listing_and_property_location(self):
+        owner = get_user_model().objects.create_user(username="owner", email="o@example.com", password="pass")
+        Listing.objects.create(title="Apartament z widokiem", description="Stare Miasto", price_per_night=200,
+                               location="Gdańsk", owner=owner)
+        Listing.objects.create(title="Pokój", description="Blisko plaży", price_per_night=90,
+                               location="Gdańsk Oliwa", owner=owner)
+        response = self.client.get('/api/listings/', {'search': 'apart gdan'})
+        self.assertEqual([listing['title'] for listing in response.data['results']], ["Apartament z widokiem"])
+        response = self.client.get('/api/listings/', {'location': 'oliwa'})
+        self.assertEqual([listing['title'] for listing in response.data['results']], ["Pokój"])
+
+        make_property(title="W centrum", location="Wrocław")
+        make_property(title="Wrocław", location="Poznań")
+        response = self.client.get('/api/properties/', {'location': 'wroc'})
+        self.assertEqual([p['title'] for p in response.data['results']], ["W centrum"])
+
+
+@override_settings(SEARCH_BACKEND='terms')
+class TermsSearchTests(FullTextSearchTests):
+    """Te same scenariusze na przenośnym indeksie SearchTerm."""
+
+    def test_backend(self):
+        self.assertIs(backend(), TermsBackend)
+        self.assertTrue(SearchTerm.objects.filter(document='host', term='lodz').exists())
+
+
+class LocationAutocompleteTests(TestCase):
+    def setUp(self):
+        LocationAutocomplete.reset()
+        self.addCleanup(LocationAutocomplete.reset)
+        self.client = APIClient()
+        for location in ["Kraków", "Kraków", "krakow ", "Kraków, Stare Miasto", "Warszawa"]:
+            make_property(location=location)
+        Host.objects.create(name="Anna", location="Kraków", image="https://example.com/h.jpg")
+        Location.objects.create(name="Krynica-Zdrój", location="x", latitude=49.4, longitude=20.9)
+
+    def test_popularity_diacritics_and_word_starts(self):
+        # Warianty zapisu sumują się pod najczęstszą etykietą
+        self.assertEqual(LocationAutocomplete.suggest("kra"),
+                         [("Kraków", 4), ("Kraków, Stare Miasto", 1)])
+        self.assertEqual(LocationAutocomplete.suggest("KR"),
+                         [("Kraków", 4), ("Kraków, Stare Miasto", 1), ("Krynica-Zdrój", 1)])
+        self.assertEqual(LocationAutocomplete.suggest("stare m"), [("Kraków, Stare Miasto", 1)])
+        self.assertEqual(LocationAutocomplete.suggest("zdroj"), [("Krynica-Zdrój", 1)])
+        self.assertEqual(LocationAutocomplete.suggest("kr", limit=1), [("Kraków", 4)])
+        self.assertEqual(LocationAutocomplete.suggest("  ,"), [])
+
+    def test_writes_update_snapshot_without_reload(self):
+        LocationAutocomplete.suggest("kr")
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = make_property(location="Krościenko")
+        with self.captureOnCommitCallbacks(execute=True):
+            Host.objects.create(name="Ewa", location="Krościenko", image="https://example.com/h.jpg")
+        with self.assertNumQueries(0):
+            self.assertEqual(LocationAutocomplete.suggest("kros"), [("Krościenko", 2)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.location = "Warszawa"
+            moved.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Location.objects.get(name="Krynica-Zdrój").delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(LocationAutocomplete.suggest("kr"),
+                             [("Kraków", 4), ("Kraków, Stare Miasto", 1), ("Krościenko", 1)])
+            self.assertEqual(LocationAutocomplete.suggest("wars"), [("Warszawa", 2)])
+
+    @mock.patch('filtering_sorting.autocomplete.CACHED_RANGE', 1)
+    def test_cached_prefixes_follow_writes(self):
+        self.assertEqual(LocationAutocomplete.suggest("kr", limit=1), [("Kraków", 4)])
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                make_property(location="Krynica-Zdrój")
+        with self.captureOnCommitCallbacks(execute=True):
+            make_property(location="Warszawa")
+        self.assertEqual(LocationAutocomplete.suggest("kr", limit=1), [("Krynica-Zdrój", 6)])
+        self.assertEqual(LocationAutocomplete.suggest("w"), [("Warszawa", 2)])
+
+    def test_apply_runs_alongside_readers(self):
+        snapshot = _Snapshot.build({f"m{i}": 1 for i in range(3000)})
+        stop = threading.Event()
+        errors = []
+
+        def read(offset):
+            i = offset
+            while not stop.is_set():
+                # Każdy nowy prefiks dopisuje listę do snapshot.tops bez blokady
+                snapshot.suggest(f"m{i % 3000}", 5)
+                i += 4
+
+        readers = [threading.Thread(target=read, args=(offset,)) for offset in range(4)]
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        with mock.patch('filtering_sorting.autocomplete.CACHED_RANGE', 1):
+            for reader in readers:
+                reader.start()
+            try:
+                for _ in range(100):
+                    try:
+                        snapshot.apply({"Wieś": 1})
+                    except RuntimeError as exc:
+                        errors.append(exc)
+            finally:
+                stop.set()
+                for reader in readers:
+                    reader.join()
+                sys.setswitchinterval(switch_interval)
+        self.assertEqual(errors, [])
+
+    def test_reload_runs_in_background_and_replays_writes(self):
+        self.assertEqual(LocationAutocomplete.suggest("kra", limit=1), [("Kraków", 4)])
+        counts = LocationAutocomplete.load()
+        loading, release = threading.Event(), threading.Event()
+
+        def slow_load():
+            loading.set()
+            release.wait(5)
+            return counts
+
+        with mock.patch.object(LocationAutocomplete, 'load', side_effect=slow_load), \
+                mock.patch('filtering_sorting.autocomplete.REFRESH_INTERVAL', -1):
+            # Przeterminowany snapshot: zapytanie odpowiada od razu, przeładowanie idzie w tle
+            self.assertEqual(LocationAutocomplete.suggest("kra", limit=1), [("Kraków", 4)])
+            self.assertTrue(loading.wait(5))
+            # Zapis w trakcie load() nie czeka na przeładowanie i nie ginie po podmianie
+            LocationAutocomplete.apply({"Kraków": 1})
+            self.assertEqual(LocationAutocomplete.suggest("kra", limit=1), [("Kraków", 5)])
+            snapshot = LocationAutocomplete._snapshot
+            release.set()
+            # Czekamy na koniec budowy w tle
+            with LocationAutocomplete._build_lock:
+                pass
+        self.assertIsNot(LocationAutocomplete._snapshot, snapshot)
+        self.assertEqual(LocationAutocomplete.suggest("kra", limit=1), [("Kraków", 5)])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/autocomplete/locations/', {'q': 'krak', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'location': 'Kraków', 'count': 4}])
+        for limit in ['0', 'x', '1000']:
+            response = self.client.get('/api/autocomplete/locations/', {'q': 'krak', 'limit': limit})
+            self.assertEqual(response.status_code, 400)
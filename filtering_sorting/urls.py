@@ -1,7 +1,8 @@
 
 from django.urls import path
-from .views import FilteredPropertyListAPIView
+from .views import FilteredPropertyListAPIView, LocationAutocompleteAPIView
 
 urlpatterns = [
     path('properties/', FilteredPropertyListAPIView.as_view(), name='filtered-properties'),
+    path('autocomplete/locations/', LocationAutocompleteAPIView.as_view(), name='location-autocomplete'),
 ]
@@ -1,13 +1,19 @@
-from rest_framework.views import APIView
+from datetime import date
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from dreambook.pagination import KeysetPagination
+from dreambook.read_serializers import ValuesSerializer
 from .models import Property
 from .serializers import PropertySerializer
 from .filters.criteria import (PriceCriteria, LocationCriteria, RatingCriteria,
                                 AmenityCriteria, DistanceCriteria, PropertyTypeCriteria,
-                                ReviewCountCriteria)
-from .filters.concrete_filters import (PriceFilter, LocationFilter, RatingFilter,
-                                       AmenityFilter, DistanceFilter, PropertyTypeFilter,
-                                       ReviewCountFilter)
+                                ReviewCountCriteria, AvailabilityCriteria)
+from .filters.plan import FilterPlan
+from .indexes import record_search
+from .autocomplete import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, LocationAutocomplete
 
 class FilteredPropertyListAPIView(APIView):
     def get(self, request):
@@ -23,55 +29,88 @@ class FilteredPropertyListAPIView(APIView):
         max_distance = request.GET.get('max_distance')
         property_types = request.GET.getlist('property_types')  # typy nieruchomości
         min_reviews = request.GET.get('min_reviews')
+        start_date = request.GET.get('start_date')  # pobyt od
+        end_date = request.GET.get('end_date')  # pobyt do
 
-        # --- Tworzymy filtry na podstawie parametrów ---
-        filters = []
+        # --- Tworzymy kryteria na podstawie parametrów ---
+        criteria = []
 
         if price_min and price_max:
             price_criteria = PriceCriteria()
             price_criteria.set_criteria(float(price_min), float(price_max))
-            filters.append(PriceFilter(price_criteria))
+            criteria.append(price_criteria)
 
         if location:
             location_criteria = LocationCriteria()
             location_criteria.set_criteria(location)
-            filters.append(LocationFilter(location_criteria))
+            criteria.append(location_criteria)
 
         if min_rating and max_rating:
             rating_criteria = RatingCriteria()
             rating_criteria.set_criteria(float(min_rating), float(max_rating))
-            filters.append(RatingFilter(rating_criteria))
+            criteria.append(rating_criteria)
 
         if amenities:
             amenity_criteria = AmenityCriteria()
             amenity_criteria.set_criteria(amenities)
-            filters.append(AmenityFilter(amenity_criteria))
+            criteria.append(amenity_criteria)
 
         if max_distance:
             distance_criteria = DistanceCriteria()
             distance_criteria.set_criteria(float(max_distance))
-            filters.append(DistanceFilter(distance_criteria))
+            criteria.append(distance_criteria)
 
         if property_types:
             property_type_criteria = PropertyTypeCriteria()
             property_type_criteria.set_criteria(property_types)
-            filters.append(PropertyTypeFilter(property_type_criteria))
+            criteria.append(property_type_criteria)
 
         if min_reviews:
             review_count_criteria = ReviewCountCriteria()
             review_count_criteria.set_criteria(int(min_reviews))
-            filters.append(ReviewCountFilter(review_count_criteria))
+            criteria.append(review_count_criteria)
 
-        # --- Aplikujemy filtry ---
-        for f in filters:
-            queryset = f.apply(queryset)
+        if start_date and end_date:
+            try:
+                stay_start, stay_end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+            except ValueError:
+                return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+            if stay_end <= stay_start:
+                return Response({'error': 'end_date must be after start_date'}, status=status.HTTP_400_BAD_REQUEST)
+            availability_criteria = AvailabilityCriteria()
+            availability_criteria.set_criteria(stay_start, stay_end)
+            criteria.append(availability_criteria)
 
-            # Sprawdzamy, czy filtr zwrócił listę — tylko wtedy kontynuujemy na liście
-            if isinstance(queryset, list):
-                # Jak już dostaliśmy listę, to wszystkie następne filtry muszą też działać na liście!
-                pass
+        # --- Kompilujemy kryteria do jednego zapytania ---
+        plan = FilterPlan(criteria)
+        queryset = plan.apply(queryset)
 
+        if getattr(settings, 'RECORD_PROPERTY_SEARCHES', False):
+            record_search(plan.describe())
 
         # --- Serializujemy i zwracamy odpowiedź ---
-        serializer = PropertySerializer(queryset, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPagination()
+        reader = ValuesSerializer.for_serializer(PropertySerializer)
+        page = paginator.paginate_queryset(reader.values(queryset), request, view=self)
+        response = paginator.get_paginated_response(reader.to_representation(page))
+
+        if settings.DEBUG:
+            # Podgląd planu filtrowania — tylko w trybie deweloperskim
+            response['X-Filter-Plan'] = ', '.join(plan.describe())
+            response['X-Filter-Plan-SQL'] = str(queryset.query)
+            response['X-Filter-Plan-Cost'] = f'{plan.estimated_cost(Property.objects.count()):.0f}'
+        return response
+
+
+class LocationAutocompleteAPIView(APIView):
+    """Podpowiedzi do pola wyszukiwania miejsca: ?q=krak&limit=10."""
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SUGGESTIONS))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_SUGGESTIONS:
+            raise ValidationError({'limit': f'Expected an integer between 1 and {MAX_SUGGESTIONS}'})
+        suggestions = LocationAutocomplete.suggest(request.query_params.get('q', ''), limit)
+        return Response([{'location': label, 'count': count} for label, count in suggestions])
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Host, HostPromotion, HostReview
+from .serializers import HostFullSerializer
+
+CACHE_TIMEOUT = 60 * 60  # s
+RECENT_REVIEWS = 10
+# Relacje jeden-do-jednego: jeden JOIN, brakujący wiersz to None bez dodatkowego zapytania
+ONE_TO_ONE = ('profile', 'individual_details', 'corporate_details', 'reservation_policy', 'statistics')
+
+
+def host_full_queryset(today):
+    """
+    Host z całą stroną profilu w trzech zapytaniach: host + JOIN-y na
+    relacje jeden-do-jednego, opinie (najwyżej RECENT_REVIEWS na hosta)
+    i aktywne promocje — niezależnie od liczby opinii i promocji.
+    """
+    return Host.objects.select_related(*ONE_TO_ONE).prefetch_related(
+        Prefetch('reviews', queryset=HostReview.objects.order_by('-id')[:RECENT_REVIEWS],
+                 to_attr='recent_reviews'),
+        Prefetch('promotions', queryset=HostPromotion.objects.filter(
+            start_date__lte=today, end_date__gte=today).order_by('end_date', 'id'),
+                 to_attr='active_promotions'),
+    )
+
+
+class HostDetailCache:
+    """
+    Odpowiedź /api/hosts/{id}/full/ w cache per host. Klucz zawiera datę,
+    bo zbiór aktywnych promocji zmienia się o północy. Zmiana hosta lub
+    któregokolwiek wiersza podrzędnego usuwa wpis (hosts.signals).
+    """
+
+    @staticmethod
+    def _key(host_id, today):
+        return f'host-full:{host_id}:{today.isoformat()}'
+
+    @classmethod
+    def get(cls, host_id):
+        """Zserializowany host albo None, gdy nie istnieje."""
+        today = timezone.localdate()
+        key = cls._key(host_id, today)
+        data = cache.get(key)
+        if data is None:
+            host = host_full_queryset(today).filter(pk=host_id).first()
+            if host is None:
+                return None
+            data = dict(HostFullSerializer(host).data)
+            cache.set(key, data, CACHE_TIMEOUT)
+        return data
+
+    @classmethod
+    def invalidate(cls, *host_ids):
+        keys = [cls._key(host_id, timezone.localdate()) for host_id in host_ids if host_id is not None]
+        if keys:
+            cache.delete_many(keys)
+            # Drugi raz po commicie: równoległy odczyt mógł zapisać dane sprzed zmiany
+            transaction.on_commit(lambda: cache.delete_many(keys))
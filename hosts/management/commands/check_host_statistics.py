@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hosts.statistics import HostStatisticsMaintainer
+
+
+class Command(BaseCommand):
+    help = ('Compares stored HostStatistics with totals computed from HostBooking and HostEarnings '
+            'and reports every host that drifted. Exits with an error when drift is found, '
+            'unless --fix rebuilds the affected hosts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--fix', action='store_true', help='Rebuild statistics of drifted hosts')
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for host_ids in HostStatisticsMaintainer.chunks(options['chunk_size']):
+            chunk_drift = HostStatisticsMaintainer.drift(host_ids)
+            for host_id, stored, actual in chunk_drift:
+                self.stdout.write(
+                    f'host {host_id}: stored {stored[0]} reservations / {stored[1]} earnings, '
+                    f'actual {actual[0]} / {actual[1]}'
+                )
+            if chunk_drift and options['fix']:
+                HostStatisticsMaintainer.rebuild([host_id for host_id, _, _ in chunk_drift])
+            drifted += len(chunk_drift)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('host statistics are consistent'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'{drifted} hosts rebuilt'))
+        else:
+            raise CommandError(f'{drifted} hosts with drifted statistics, run with --fix')
@@ -0,0 +1,52 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from hosts.statistics import HostStatisticsMaintainer
+
+
+def rebuild_chunk(host_ids, attempts=5, delay=0.5):
+    """
+    Przelicza paczkę hostów. Zablokowana baza to najwyżej attempts prób
+    z rosnącą przerwą; ostatni błąd idzie dalej.
+    """
+    try:
+        for attempt in range(attempts):
+            try:
+                return HostStatisticsMaintainer.rebuild(host_ids)
+            except OperationalError:
+                # SQLite: inny worker trzyma blokadę zapisu dłużej niż timeout
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(delay * 2 ** attempt)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Recomputes HostStatistics for all hosts from HostBooking and HostEarnings, in chunks '
+            'of hosts with one GROUP BY per source table and chunk. Chunks can be spread over '
+            'several worker processes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=1)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunks = list(HostStatisticsMaintainer.chunks(options['chunk_size']))
+        if options['processes'] > 1:
+            # Dzieci nie mogą dzielić połączenia z rodzicem — każde otwiera własne
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['processes']) as pool:
+                written = sum(pool.map(rebuild_chunk, chunks))
+        else:
+            written = sum(HostStatisticsMaintainer.rebuild(host_ids) for host_ids in chunks)
+        elapsed = time.perf_counter() - started
+        hosts = sum(len(host_ids) for host_ids in chunks)
+        self.stdout.write(self.style.SUCCESS(
+            f'host statistics rebuilt: {hosts} hosts in {len(chunks)} chunks, {written} rows written '
+            f'in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hosts.ratings import HostRatingAggregator
+
+
+class Command(BaseCommand):
+    help = ('Recomputes rating_count, rating_sum and bayesian_rating of every host from HostRating, '
+            'HostReview and HostFeedback, in chunks of hosts with one GROUP BY per source and chunk. '
+            'Run after bulk imports that skip signals.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        changed = HostRatingAggregator.recompute_all(options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'host ratings recomputed: {changed} hosts changed in {elapsed:.2f}s'))
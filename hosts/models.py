@@ -2,6 +2,10 @@ from django.db import models
 from datetime import date
 
 HOST_TYPES = [('individual', 'Individual'), ('corporate', 'Corporate')]
+# Średnia bayesowska ocen: host bez ocen ma RATING_PRIOR_MEAN, a każda ocena
+# przesuwa wynik tak, jakby do faktycznych ocen dołożyć RATING_PRIOR_WEIGHT ocen średnich
+RATING_PRIOR_MEAN = 3.5
+RATING_PRIOR_WEIGHT = 5
 
 class Host(models.Model):
     user_id = models.IntegerField(default=0)
@@ -11,6 +15,16 @@ class Host(models.Model):
     image = models.URLField()
     host_type = models.CharField(max_length=20, choices=HOST_TYPES, default='individual')
     registration_date = models.DateField(default=date.today)
+    # Agregaty HostRating / HostReview / HostFeedback (hosts.ratings)
+    rating_count = models.IntegerField(default=0, editable=False)
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    bayesian_rating = models.FloatField(default=RATING_PRIOR_MEAN, editable=False)
+
+    class Meta:
+        indexes = [
+            # ?ordering=-bayesian_rating z paginacją keyset (pk rozstrzyga remisy)
+            models.Index(fields=['bayesian_rating', 'id'], name='host_bayesian_rating_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.location})"
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum
+from django.db.models.functions import Cast
+
+from .detail import HostDetailCache
+from .models import RATING_PRIOR_MEAN, RATING_PRIOR_WEIGHT, Host, HostFeedback, HostRating, HostReview
+
+# Źródła ocen hosta i pole z oceną (wszystkie w skali 0–5)
+RATING_SOURCES = {HostRating: 'rating_score', HostReview: 'rating', HostFeedback: 'rating'}
+ZERO = Decimal('0.00')
+
+
+def bayesian_average(total, count):
+    return (RATING_PRIOR_WEIGHT * RATING_PRIOR_MEAN + float(total)) / (RATING_PRIOR_WEIGHT + count)
+
+
+class HostRatingAggregator:
+    """
+    Liczba, suma i średnia bayesowska ocen w kolumnach Host — sortowanie
+    po ?ordering=-bayesian_rating idzie po indeksie, bez AVG() w zapytaniu.
+    """
+
+    @staticmethod
+    def apply(deltas):
+        """
+        deltas: {host_id: (delta liczby ocen, delta sumy)}. Jedno UPDATE na
+        hosta; średnia liczona w tym samym UPDATE z wartości sprzed zmiany
+        (prawa strona SET widzi stary wiersz), więc równoległe oceny się
+        nie gubią.
+        """
+        for host_id, (count, total) in deltas.items():
+            if not count and not total:
+                continue
+            Host.objects.filter(pk=host_id).update(
+                rating_count=F('rating_count') + count,
+                rating_sum=F('rating_sum') + total,
+                bayesian_rating=ExpressionWrapper(
+                    (RATING_PRIOR_WEIGHT * RATING_PRIOR_MEAN + float(total)
+                     + Cast(F('rating_sum'), FloatField()))
+                    / (RATING_PRIOR_WEIGHT + count + F('rating_count')),
+                    output_field=FloatField(),
+                ),
+            )
+            HostDetailCache.invalidate(host_id)
+
+    @staticmethod
+    def actual(host_ids):
+        """{host_id: (liczba ocen, suma)} — jedno GROUP BY na źródło."""
+        totals = {host_id: [0, ZERO] for host_id in host_ids}
+        for model, field in RATING_SOURCES.items():
+            for host_id, count, total in (model.objects.filter(host_id__in=host_ids)
+                                          .values('host_id').annotate(count=Count('id'), total=Sum(field))
+                                          .values_list('host_id', 'count', 'total').order_by()):
+                totals[host_id][0] += count
+                totals[host_id][1] += Decimal(str(total)).quantize(ZERO)
+        return {host_id: tuple(total) for host_id, total in totals.items()}
+
+    @classmethod
+    def recompute(cls, host_ids):
+        """Przelicza agregaty paczki hostów od zera. Zwraca liczbę zmienionych hostów."""
+        with transaction.atomic():
+            hosts = {
+                host.pk: host
+                for host in Host.objects.select_for_update()
+                .filter(pk__in=host_ids).only('rating_count', 'rating_sum', 'bayesian_rating')
+            }
+            changed = []
+            for host_id, (count, total) in cls.actual(list(hosts)).items():
+                host = hosts[host_id]
+                average = bayesian_average(total, count)
+                if (host.rating_count, host.rating_sum) != (count, total) or abs(host.bayesian_rating - average) > 1e-9:
+                    host.rating_count, host.rating_sum, host.bayesian_rating = count, total, average
+                    changed.append(host)
+            Host.objects.bulk_update(changed, ['rating_count', 'rating_sum', 'bayesian_rating'], batch_size=1000)
+        HostDetailCache.invalidate(*(host.pk for host in changed))
+        return len(changed)
+
+    @classmethod
+    def recompute_all(cls, chunk_size=1000):
+        changed = 0
+        last = 0
+        while True:
+            ids = list(Host.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return changed
+            changed += cls.recompute(ids)
+            last = ids[-1]
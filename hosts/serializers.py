@@ -109,4 +109,15 @@ class HostRatingSerializer(serializers.ModelSerializer):
 class HostReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = HostReview
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class HostFullSerializer(HostSerializer):
+    """Host z profilem, szczegółami, polityką, statystykami, ostatnimi opiniami i aktywnymi promocjami."""
+    profile = HostProfileSerializer(read_only=True, allow_null=True)
+    individual_details = IndividualHostSerializer(read_only=True, allow_null=True)
+    corporate_details = CorporateHostSerializer(read_only=True, allow_null=True)
+    reservation_policy = HostReservationPolicySerializer(read_only=True, allow_null=True)
+    statistics = HostStatisticsSerializer(read_only=True, allow_null=True)
+    # Atrybuty z Prefetch(to_attr=...) w hosts.detail
+    recent_reviews = HostReviewSerializer(many=True, read_only=True)
+    active_promotions = HostPromotionSerializer(many=True, read_only=True)
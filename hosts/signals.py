@@ -0,0 +1,135 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .detail import HostDetailCache
+from .models import (
+    CorporateHost, Host, HostBooking, HostEarnings, HostFeedback, HostProfile, HostPromotion, HostRating,
+    HostReservationPolicy, HostReview, HostStatistics, IndividualHost,
+)
+from .ratings import RATING_SOURCES, HostRatingAggregator
+from .statistics import ZERO, HostStatisticsMaintainer
+
+
+def _amount(instance):
+    # Kwota może przyjść jako string lub float, nie tylko Decimal
+    return Decimal(str(instance.earnings_amount))
+
+
+@receiver(pre_save, sender=HostBooking)
+def remember_previous_booking_host(sender, instance, **kwargs):
+    instance._previous_host_id = None
+    if instance.pk:
+        instance._previous_host_id = (
+            HostBooking.objects.filter(pk=instance.pk).values_list('host_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=HostBooking)
+def update_statistics_on_booking_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_host_id', None)
+    if created or previous is None:
+        HostStatisticsMaintainer.apply({instance.host_id: (1, ZERO)})
+    elif previous != instance.host_id:
+        # Rezerwacja przepięta na innego hosta
+        HostStatisticsMaintainer.apply({previous: (-1, ZERO), instance.host_id: (1, ZERO)})
+
+
+@receiver(post_delete, sender=HostBooking)
+def update_statistics_on_booking_delete(sender, instance, **kwargs):
+    HostStatisticsMaintainer.apply({instance.host_id: (-1, ZERO)}, create_missing=False)
+
+
+@receiver(pre_save, sender=HostEarnings)
+def remember_previous_earnings(sender, instance, **kwargs):
+    instance._previous_earnings = None
+    if instance.pk:
+        instance._previous_earnings = (
+            HostEarnings.objects.filter(pk=instance.pk).values_list('host_id', 'earnings_amount').first()
+        )
+
+
+@receiver(post_save, sender=HostEarnings)
+def update_statistics_on_earnings_save(sender, instance, **kwargs):
+    deltas = {instance.host_id: (0, _amount(instance))}
+    previous = getattr(instance, '_previous_earnings', None)
+    if previous:
+        host_id, amount = previous
+        reservations, earnings = deltas.get(host_id, (0, ZERO))
+        deltas[host_id] = (reservations, earnings - amount)
+    HostStatisticsMaintainer.apply(deltas)
+
+
+@receiver(post_delete, sender=HostEarnings)
+def update_statistics_on_earnings_delete(sender, instance, **kwargs):
+    HostStatisticsMaintainer.apply({instance.host_id: (0, -_amount(instance))}, create_missing=False)
+
+
+def _score(instance):
+    return Decimal(str(getattr(instance, RATING_SOURCES[type(instance)])))
+
+
+@receiver(pre_save, sender=HostRating)
+@receiver(pre_save, sender=HostReview)
+@receiver(pre_save, sender=HostFeedback)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = (
+            sender.objects.filter(pk=instance.pk).values_list('host_id', RATING_SOURCES[sender]).first()
+        )
+
+
+@receiver(post_save, sender=HostRating)
+@receiver(post_save, sender=HostReview)
+@receiver(post_save, sender=HostFeedback)
+def update_rating_on_save(sender, instance, **kwargs):
+    deltas = {instance.host_id: (1, _score(instance))}
+    previous = getattr(instance, '_previous_rating', None)
+    if previous:
+        host_id, score = previous
+        count, total = deltas.get(host_id, (0, ZERO))
+        deltas[host_id] = (count - 1, total - Decimal(str(score)))
+    HostRatingAggregator.apply(deltas)
+
+
+@receiver(post_delete, sender=HostRating)
+@receiver(post_delete, sender=HostReview)
+@receiver(post_delete, sender=HostFeedback)
+def update_rating_on_delete(sender, instance, **kwargs):
+    HostRatingAggregator.apply({instance.host_id: (-1, -_score(instance))})
+
+
+# Wiersze podrzędne widoczne w /api/hosts/{id}/full/
+DETAIL_MODELS = (HostProfile, IndividualHost, CorporateHost, HostReservationPolicy, HostStatistics,
+                 HostReview, HostPromotion)
+
+
+@receiver(post_save, sender=Host)
+@receiver(post_delete, sender=Host)
+def invalidate_host_detail(sender, instance, **kwargs):
+    HostDetailCache.invalidate(instance.pk)
+
+
+def remember_previous_detail_host(sender, instance, **kwargs):
+    instance._previous_detail_host_id = None
+    if instance.pk:
+        instance._previous_detail_host_id = (
+            sender.objects.filter(pk=instance.pk).values_list('host_id', flat=True).first()
+        )
+
+
+def invalidate_host_detail_on_child_save(sender, instance, **kwargs):
+    # Wiersz przepięty na innego hosta zmienia stronę obu
+    HostDetailCache.invalidate(instance.host_id, getattr(instance, '_previous_detail_host_id', None))
+
+
+def invalidate_host_detail_on_child_delete(sender, instance, **kwargs):
+    HostDetailCache.invalidate(instance.host_id)
+
+
+for model in DETAIL_MODELS:
+    pre_save.connect(remember_previous_detail_host, sender=model)
+    post_save.connect(invalidate_host_detail_on_child_save, sender=model)
+    post_delete.connect(invalidate_host_detail_on_child_delete, sender=model)
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .detail import HostDetailCache
+from .models import Host, HostBooking, HostEarnings, HostStatistics
+
+ZERO = Decimal('0.00')
+
+
+class HostStatisticsMaintainer:
+    """
+    HostStatistics jako zdenormalizowane sumy HostBooking / HostEarnings.
+    Zmiany nanoszone są deltami (UPDATE ... SET x = x + delta), więc
+    równoległe zapisy się nie nadpisują. rebuild / drift naprawiają
+    i sprawdzają rozjazdy po zapisach z pominięciem sygnałów.
+    """
+
+    @staticmethod
+    def apply(deltas, create_missing=True):
+        """
+        deltas: {host_id: (delta liczby rezerwacji, delta zarobków)} — jedno
+        UPDATE na hosta. Brakujący wiersz jest wstawiany zerami tylko przy
+        create_missing: przy usuwaniu (też kaskadowym z Host) nie ma czego
+        zmniejszać, a wstawiony wiersz wskazywałby na usuwanego hosta.
+        """
+        deltas = {host_id: delta for host_id, delta in deltas.items() if any(delta)}
+        with transaction.atomic():
+            for host_id, (reservations, earnings) in deltas.items():
+                changes = {
+                    'total_reservations': F('total_reservations') + reservations,
+                    'total_earnings': F('total_earnings') + earnings,
+                }
+                if HostStatistics.objects.filter(host_id=host_id).update(**changes) or not create_missing:
+                    continue
+                HostStatistics.objects.bulk_create([HostStatistics(host_id=host_id)], ignore_conflicts=True)
+                HostStatistics.objects.filter(host_id=host_id).update(**changes)
+        # update() omija sygnały HostStatistics
+        HostDetailCache.invalidate(*deltas)
+
+    @staticmethod
+    def actual(host_ids):
+        """{host_id: (liczba rezerwacji, suma zarobków)} z tabel źródłowych — jedno GROUP BY na tabelę."""
+        totals = {host_id: [0, ZERO] for host_id in host_ids}
+        for host_id, count in (HostBooking.objects.filter(host_id__in=host_ids)
+                               .values('host_id').annotate(count=Count('id')).values_list('host_id', 'count')
+                               .order_by()):
+            totals[host_id][0] = count
+        for host_id, total in (HostEarnings.objects.filter(host_id__in=host_ids)
+                               .values('host_id').annotate(total=Sum('earnings_amount'))
+                               .values_list('host_id', 'total').order_by()):
+            # SQLite sumuje jako REAL — wracamy do groszy
+            totals[host_id][1] = total.quantize(ZERO)
+        return {host_id: tuple(total) for host_id, total in totals.items()}
+
+    @classmethod
+    def rebuild(cls, host_ids):
+        """
+        Przelicza statystyki paczki hostów od zera. Wiersze są blokowane przed
+        agregacją, więc delta z równoległej transakcji trafi po przeliczeniu,
+        a nie zostanie nadpisana. Zwraca liczbę zapisanych wierszy.
+        """
+        with transaction.atomic():
+            existing = {
+                stats.host_id: stats
+                for stats in HostStatistics.objects.select_for_update().filter(host_id__in=host_ids)
+            }
+            created, updated = [], []
+            for host_id, (reservations, earnings) in cls.actual(host_ids).items():
+                stats = existing.get(host_id)
+                if stats is None:
+                    created.append(HostStatistics(host_id=host_id, total_reservations=reservations,
+                                                  total_earnings=earnings))
+                elif (stats.total_reservations, stats.total_earnings) != (reservations, earnings):
+                    stats.total_reservations, stats.total_earnings = reservations, earnings
+                    updated.append(stats)
+            HostStatistics.objects.bulk_create(created, batch_size=1000, ignore_conflicts=True)
+            HostStatistics.objects.bulk_update(updated, ['total_reservations', 'total_earnings'], batch_size=1000)
+        HostDetailCache.invalidate(*(stats.host_id for stats in created + updated))
+        return len(created) + len(updated)
+
+    @classmethod
+    def drift(cls, host_ids):
+        """[(host_id, zapisane, faktyczne)] dla hostów, których statystyki się rozjechały."""
+        stored = {
+            host_id: (reservations, earnings)
+            for host_id, reservations, earnings in HostStatistics.objects.filter(host_id__in=host_ids)
+            .values_list('host_id', 'total_reservations', 'total_earnings')
+        }
+        return [
+            (host_id, stored.get(host_id, (0, ZERO)), actual)
+            for host_id, actual in cls.actual(host_ids).items()
+            if stored.get(host_id, (0, ZERO)) != actual
+        ]
+
+    @staticmethod
+    def chunks(chunk_size):
+        """Id wszystkich hostów w paczkach po chunk_size (keyset po pk)."""
+        last = 0
+        while True:
+            ids = list(Host.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return
+            yield ids
+            last = ids[-1]
@@ -1,8 +1,23 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
 from django.test import TestCase
 from rest_framework.test import APIClient
-from .models import Host
+from unittest import mock
+from dreambook.testing import QueryCountAssertionsMixin
+from .detail import RECENT_REVIEWS
+from .management.commands.rebuild_host_statistics import rebuild_chunk
+from .models import (
+    RATING_PRIOR_MEAN, CorporateHost, Host, HostBooking, HostEarnings, HostFeedback, HostManager, HostProfile,
+    HostPromotion, HostRating, HostReservationPolicy, HostReview, HostStatistics,
+)
+from .ratings import HostRatingAggregator, bayesian_average
+from .statistics import HostStatisticsMaintainer
 
-class HostModuleTests(TestCase):
+class HostModuleTests(QueryCountAssertionsMixin, TestCase):
     def setUp(self):
         self.client = APIClient()
         self.host = Host.objects.create(
@@ -25,7 +40,7 @@ class HostModuleTests(TestCase):
     def test_get_hosts(self):
         response = self.client.get('/api/hosts/')
         self.assertEqual(response.status_code, 200)
-        self.assertGreaterEqual(len(response.data), 1)
+        self.assertGreaterEqual(len(response.data["results"]), 1)
 
     def test_host_availability_post(self):
         response = self.client.post('/api/host-availability/', {
@@ -97,3 +112,226 @@ class HostModuleTests(TestCase):
             "status": "new"
         }, format='json')
         self.assertEqual(response.status_code, 201)
+
+    def test_host_managers_list_has_no_n_plus_one(self):
+        def make_managers(count):
+            for i in range(count):
+                manager = HostManager.objects.create(user_id=i)
+                manager.managed_hosts.add(self.host)
+
+        self.assertQueryCountConstant('/api/host-managers/', make_managers)
+
+
+class HostStatisticsMaintainerTest(TestCase):
+    def setUp(self):
+        self.hosts = [
+            Host.objects.create(name=f"Host {i}", location="Gdańsk", image="https://example.com/h.jpg")
+            for i in range(5)
+        ]
+
+    def stats(self, host):
+        stats = HostStatistics.objects.filter(host=host).first()
+        return (stats.total_reservations, stats.total_earnings) if stats else (0, Decimal('0'))
+
+    def test_writes_apply_deltas(self):
+        host, other = self.hosts[:2]
+        bookings = [HostBooking.objects.create(host=host, reservation_id=i, booking_date=date(2025, 7, 1))
+                    for i in range(3)]
+        earnings = HostEarnings.objects.create(host=host, earnings_amount="850.50", earnings_date=date(2025, 7, 2))
+        HostEarnings.objects.create(host=host, earnings_amount=Decimal("100.00"), earnings_date=date(2025, 7, 3))
+        self.assertEqual(self.stats(host), (3, Decimal('950.50')))
+
+        earnings.earnings_amount = Decimal("800.00")
+        earnings.save()
+        bookings[0].host = other
+        bookings[0].save()
+        bookings[1].delete()
+        self.assertEqual(self.stats(host), (1, Decimal('900.00')))
+        self.assertEqual(self.stats(other), (1, Decimal('0')))
+
+        earnings.host = other
+        earnings.save()
+        self.assertEqual(self.stats(host), (1, Decimal('100.00')))
+        self.assertEqual(self.stats(other), (1, Decimal('800.00')))
+        self.assertEqual(HostStatisticsMaintainer.drift([h.pk for h in self.hosts]), [])
+
+    def test_host_delete_cascades_cleanly(self):
+        host = self.hosts[0]
+        HostBooking.objects.create(host=host, reservation_id=1, booking_date=date(2025, 7, 1))
+        HostEarnings.objects.create(host=host, earnings_amount="10.00", earnings_date=date(2025, 7, 1))
+        host.delete()
+        self.assertFalse(HostStatistics.objects.filter(host_id=host.pk).exists())
+
+    def test_rebuild_and_drift_check(self):
+        for i, host in enumerate(self.hosts):
+            for j in range(i):
+                HostBooking.objects.create(host=host, reservation_id=j, booking_date=date(2025, 7, 1))
+                HostEarnings.objects.create(host=host, earnings_amount="25.00", earnings_date=date(2025, 7, 1))
+        expected = {host.pk: self.stats(host) for host in self.hosts}
+
+        # update() omija sygnały — statystyki się rozjeżdżają
+        HostStatistics.objects.filter(host=self.hosts[2]).update(total_reservations=99)
+        HostEarnings.objects.filter(host=self.hosts[3]).update(earnings_amount="30.00")
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_host_statistics', chunk_size=2, stdout=out)
+        self.assertIn(f'host {self.hosts[2].pk}:', out.getvalue())
+        self.assertIn(f'host {self.hosts[3].pk}:', out.getvalue())
+
+        call_command('rebuild_host_statistics', chunk_size=2, stdout=StringIO())
+        expected[self.hosts[3].pk] = (3, Decimal('90.00'))
+        self.assertEqual({host.pk: self.stats(host) for host in self.hosts}, expected)
+        out = StringIO()
+        call_command('check_host_statistics', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+    def test_drift_fix_and_chunk_queries(self):
+        HostBooking.objects.create(host=self.hosts[0], reservation_id=1, booking_date=date(2025, 7, 1))
+        HostStatistics.objects.all().delete()
+        call_command('check_host_statistics', fix=True, stdout=StringIO())
+        self.assertEqual(self.stats(self.hosts[0]), (1, Decimal('0')))
+        # Paczka: savepoint, blokada statystyk, dwa GROUP BY, INSERT, release — niezależnie od liczby hostów
+        HostStatistics.objects.exclude(host=self.hosts[0]).delete()
+        with self.assertNumQueries(6):
+            HostStatisticsMaintainer.rebuild([host.pk for host in self.hosts])
+
+    def test_rebuild_chunk_backs_off_on_locked_database(self):
+        locked = OperationalError('database is locked')
+        with mock.patch.object(HostStatisticsMaintainer, 'rebuild', side_effect=[locked, locked, 3]), \
+                mock.patch('time.sleep') as sleep:
+            self.assertEqual(rebuild_chunk([1, 2, 3], delay=0.5), 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+        with mock.patch.object(HostStatisticsMaintainer, 'rebuild', side_effect=locked) as rebuild, \
+                mock.patch('time.sleep'):
+            with self.assertRaises(OperationalError):
+                rebuild_chunk([1], attempts=3)
+        self.assertEqual(rebuild.call_count, 3)
+
+
+class HostRatingAggregatorTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.hosts = [
+            Host.objects.create(name=f"Host {i}", location="Poznań", image="https://example.com/h.jpg")
+            for i in range(4)
+        ]
+
+    def aggregates(self, host):
+        host.refresh_from_db()
+        return host.rating_count, host.rating_sum, host.bayesian_rating
+
+    def test_ratings_update_aggregates(self):
+        host, other = self.hosts[:2]
+        self.assertEqual(self.aggregates(host), (0, Decimal('0'), RATING_PRIOR_MEAN))
+        rating = HostRating.objects.create(host=host, rating_score="4.50")
+        HostReview.objects.create(host=host, user_id=1, rating=5, review_text="Super")
+        feedback = HostFeedback.objects.create(host=host, user_id=2, rating=3, comment="OK")
+        count, total, average = self.aggregates(host)
+        self.assertEqual((count, total), (3, Decimal('12.50')))
+        self.assertAlmostEqual(average, bayesian_average(Decimal('12.50'), 3))
+
+        rating.rating_score = Decimal("2.00")
+        rating.save()
+        feedback.host = other
+        feedback.save()
+        HostReview.objects.filter(host=host).get().delete()
+        count, total, average = self.aggregates(host)
+        self.assertEqual((count, total), (1, Decimal('2.00')))
+        self.assertAlmostEqual(average, bayesian_average(Decimal('2.00'), 1))
+        self.assertEqual(self.aggregates(other)[:2], (1, Decimal('3.00')))
+
+    def test_recompute_fixes_skipped_signals(self):
+        HostRating.objects.bulk_create([HostRating(host=self.hosts[0], rating_score=5) for _ in range(10)])
+        HostReview.objects.bulk_create([HostReview(host=self.hosts[1], user_id=i, rating=1, review_text="")
+                                        for i in range(3)])
+        call_command('recompute_host_ratings', chunk_size=3, stdout=StringIO())
+        self.assertEqual(self.aggregates(self.hosts[0])[:2], (10, Decimal('50.00')))
+        self.assertAlmostEqual(self.aggregates(self.hosts[1])[2], bayesian_average(3, 3))
+        self.assertEqual(HostRatingAggregator.recompute([host.pk for host in self.hosts]), 0)
+
+    def test_sort_by_bayesian_rating(self):
+        # Jedna piątka przegrywa z wieloma czwórkami — średnia bayesowska, nie arytmetyczna
+        HostRating.objects.create(host=self.hosts[0], rating_score=5)
+        for _ in range(20):
+            HostRating.objects.create(host=self.hosts[1], rating_score=4)
+        HostRating.objects.create(host=self.hosts[2], rating_score=1)
+
+        response = self.client.get('/api/hosts/', {'ordering': '-bayesian_rating', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        ids = [host['id'] for host in response.data['results']]
+        ids += [host['id'] for host in self.client.get(response.data['next']).data['results']]
+        self.assertEqual(ids, [self.hosts[1].pk, self.hosts[0].pk, self.hosts[3].pk, self.hosts[2].pk])
+
+        query = Host.objects.order_by('-bayesian_rating', '-id')
+        self.assertIn('host_bayesian_rating_idx', query.explain())
+        self.assertNotIn('AVG', str(query.query))
+
+
+class HostFullDetailTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.host = Host.objects.create(name="Firma", location="Wrocław", image="https://example.com/f.jpg",
+                                        host_type='corporate')
+        HostProfile.objects.create(host=self.host, bio="Apartamenty w centrum")
+        CorporateHost.objects.create(host=self.host, company_name="Firma sp. z o.o.", company_address="Rynek 1")
+        HostReservationPolicy.objects.create(host=self.host, cancellation_policy="Bezpłatnie do 7 dni")
+        HostBooking.objects.create(host=self.host, reservation_id=1, booking_date=date(2025, 7, 1))
+        today = date.today()
+        self.active = HostPromotion.objects.create(host=self.host, promotion_details="-10%",
+                                                   start_date=today - timedelta(days=1),
+                                                   end_date=today + timedelta(days=1))
+        HostPromotion.objects.create(host=self.host, promotion_details="Stara", start_date=date(2020, 1, 1),
+                                     end_date=date(2020, 2, 1))
+        self.url = f'/api/hosts/{self.host.pk}/full/'
+
+    def add_reviews(self, count):
+        for i in range(count):
+            HostReview.objects.create(host=self.host, user_id=i, rating=4, review_text=f"Opinia {i}")
+
+    def test_full_payload(self):
+        self.add_reviews(RECENT_REVIEWS + 5)
+        data = self.client.get(self.url).data
+        self.assertEqual(data['profile']['bio'], "Apartamenty w centrum")
+        self.assertEqual(data['corporate_details']['company_name'], "Firma sp. z o.o.")
+        self.assertIsNone(data['individual_details'])
+        self.assertEqual(data['reservation_policy']['cancellation_policy'], "Bezpłatnie do 7 dni")
+        self.assertEqual(data['statistics']['total_reservations'], 1)
+        self.assertEqual([p['id'] for p in data['active_promotions']], [self.active.pk])
+        self.assertEqual(len(data['recent_reviews']), RECENT_REVIEWS)
+        self.assertEqual(data['recent_reviews'][0]['review_text'], f"Opinia {RECENT_REVIEWS + 4}")
+        self.assertEqual(self.client.get('/api/hosts/999999/full/').status_code, 404)
+
+    def test_constant_query_count(self):
+        for reviews in (1, 20):
+            self.add_reviews(reviews)
+            cache.clear()
+            # Host z JOIN-ami jeden-do-jednego, opinie, promocje
+            with self.assertNumQueries(3):
+                self.assertEqual(self.client.get(self.url).status_code, 200)
+            with self.assertNumQueries(0):
+                self.client.get(self.url)
+
+    def test_child_changes_invalidate_cache(self):
+        self.client.get(self.url)
+        profile = HostProfile.objects.get(host=self.host)
+        profile.bio = "Nowy opis"
+        profile.save()
+        self.assertEqual(self.client.get(self.url).data['profile']['bio'], "Nowy opis")
+
+        HostBooking.objects.create(host=self.host, reservation_id=2, booking_date=date(2025, 7, 2))
+        self.assertEqual(self.client.get(self.url).data['statistics']['total_reservations'], 2)
+
+        HostRating.objects.create(host=self.host, rating_score=5)
+        self.assertEqual(self.client.get(self.url).data['rating_count'], 1)
+
+        self.active.delete()
+        self.assertEqual(self.client.get(self.url).data['active_promotions'], [])
+
+        other = Host.objects.create(name="Inny", location="Łódź", image="https://example.com/i.jpg")
+        self.client.get(f'/api/hosts/{other.pk}/full/')
+        policy = HostReservationPolicy.objects.get(host=self.host)
+        policy.host = other
+        policy.save()
+        self.assertIsNone(self.client.get(self.url).data['reservation_policy'])
+        self.assertIsNotNone(self.client.get(f'/api/hosts/{other.pk}/full/').data['reservation_policy'])
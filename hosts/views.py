@@ -1,5 +1,11 @@
 # hosts/views.py
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from dreambook.prefetch import AutoPrefetchMixin
+from dreambook.streaming import StreamingListMixin
+from filtering_sorting.search import FullTextSearchFilter
+from .detail import HostDetailCache
 from .models import Host
 from .models import HostBooking
 from .models import HostAvailability
@@ -36,73 +42,87 @@ from .serializers import CorporateHostSerializer
 from .serializers import HostRatingSerializer
 from .serializers import HostReviewSerializer
 
-class HostViewSet(viewsets.ModelViewSet):
+class HostViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Host.objects.all()
     serializer_class = HostSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['location']
-
-class HostAvailabilityViewSet(viewsets.ModelViewSet):
+    # ?search= po nazwie, lokalizacji i bio z indeksu pełnotekstowego (filtering_sorting.search)
+    filter_backends = [FullTextSearchFilter, filters.OrderingFilter]
+    search_document = 'host'
+    # bayesian_rating / rating_count utrzymywane przez hosts.ratings — sortowanie bez AVG()
+    ordering_fields = ['bayesian_rating', 'rating_count', 'registration_date']
+
+    @action(detail=True, methods=['get'])
+    def full(self, request, pk=None):
+        """Cała strona profilu hosta w jednej odpowiedzi (hosts.detail), z cache."""
+        try:
+            data = HostDetailCache.get(int(pk))
+        except ValueError:
+            data = None
+        if data is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
+
+class HostAvailabilityViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostAvailability.objects.all()
     serializer_class = HostAvailabilitySerializer
 
-class HostBookingViewSet(viewsets.ModelViewSet):
+class HostBookingViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostBooking.objects.all()
     serializer_class = HostBookingSerializer
 
-class HostMessageViewSet(viewsets.ModelViewSet):
+class HostMessageViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostMessage.objects.all()
     serializer_class = HostMessageSerializer
 
-class HostPromotionViewSet(viewsets.ModelViewSet):
+class HostPromotionViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostPromotion.objects.all()
     serializer_class = HostPromotionSerializer
 
-class HostStatisticsViewSet(viewsets.ModelViewSet):
+class HostStatisticsViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostStatistics.objects.all()
     serializer_class = HostStatisticsSerializer
 
-class HostEarningsViewSet(viewsets.ModelViewSet):
+class HostEarningsViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostEarnings.objects.all()
     serializer_class = HostEarningsSerializer
 
-class HostReservationPolicyViewSet(viewsets.ModelViewSet):
+class HostReservationPolicyViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostReservationPolicy.objects.all()
     serializer_class = HostReservationPolicySerializer
 
 
-class HostNotificationViewSet(viewsets.ModelViewSet):
+class HostNotificationViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostNotification.objects.all()
     serializer_class = HostNotificationSerializer
 
-class HostSupportViewSet(viewsets.ModelViewSet):
+class HostSupportViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostSupport.objects.all()
     serializer_class = HostSupportSerializer
 
-class HostManagerViewSet(viewsets.ModelViewSet):
+class HostManagerViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostManager.objects.all()
     serializer_class = HostManagerSerializer
 
-class HostProfileViewSet(viewsets.ModelViewSet):
+class HostProfileViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostProfile.objects.all()
     serializer_class = HostProfileSerializer
 
-class HostFeedbackViewSet(viewsets.ModelViewSet):
+class HostFeedbackViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostFeedback.objects.all()
     serializer_class = HostFeedbackSerializer
 
-class IndividualHostViewSet(viewsets.ModelViewSet):
+class IndividualHostViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = IndividualHost.objects.all()
     serializer_class = IndividualHostSerializer
 
-class CorporateHostViewSet(viewsets.ModelViewSet):
+class CorporateHostViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = CorporateHost.objects.all()
     serializer_class = CorporateHostSerializer
 
-class HostRatingViewSet(viewsets.ModelViewSet):
+class HostRatingViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostRating.objects.all()
     serializer_class = HostRatingSerializer
 
-class HostReviewViewSet(viewsets.ModelViewSet):
+class HostReviewViewSet(AutoPrefetchMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = HostReview.objects.all()
     serializer_class = HostReviewSerializer
\ No newline at end of file
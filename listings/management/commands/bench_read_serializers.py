@@ -0,0 +1,78 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dreambook.read_serializers import ValuesSerializer
+from filtering_sorting.models import Property as SearchProperty
+from filtering_sorting.serializers import PropertySerializer
+from listings.models import Listing
+from listings.serializers import ListingSerializer
+from reservations.models import Property, Reservation
+from reservations.serializers import ReservationSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Compares ModelSerializer(many=True) with the .values() read path for the hot list '
+            'endpoints. Generated rows are rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        rows = options['rows']
+
+        with transaction.atomic():
+            self.stdout.write(f'Creating {rows} rows per model...')
+            self.create_rows(rows)
+
+            self.stdout.write(f'{"serializer":<22} {"ModelSerializer":>16} {"values()":>10} {"speedup":>8}')
+            for serializer_class, queryset in [
+                (ListingSerializer, Listing.objects.select_related('owner').order_by('-created_at')),
+                (PropertySerializer, SearchProperty.objects.order_by('pk')),
+                (ReservationSerializer, Reservation.objects.order_by('-created_at')),
+            ]:
+                reader = ValuesSerializer.for_serializer(serializer_class)
+                slow = self.best_of(lambda: serializer_class(queryset.all(), many=True).data, options['repeat'])
+                fast = self.best_of(lambda: reader.serialize(queryset.all()), options['repeat'])
+                self.stdout.write(
+                    f'{serializer_class.__name__:<22} {slow:>14.1f}ms {fast:>8.1f}ms {slow / fast:>7.1f}x'
+                )
+            transaction.set_rollback(True)
+
+    def best_of(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    def create_rows(self, rows):
+        owner = User.objects.create_user(username='bench-owner', email='bench-owner@example.com')
+        prop = Property.objects.create(title='Bench', address='Warszawa', price=100)
+
+        Listing.objects.bulk_create([
+            Listing(title=f'Listing {i}', description='Opis', price_per_night=random.randint(50, 900),
+                    location='Kraków', latitude=50.06, longitude=19.94, owner=owner)
+            for i in range(rows)
+        ], batch_size=1000)
+        SearchProperty.objects.bulk_create([
+            SearchProperty(title=f'Property {i}', location='Gdańsk', price_per_night=random.randint(50, 900),
+                           max_guests=4, available_from=date(2025, 1, 1), available_to=date(2025, 12, 31),
+                           amenities=['wifi'], rating=4.5)
+            for i in range(rows)
+        ], batch_size=1000)
+        start = date(2025, 1, 1)
+        Reservation.objects.bulk_create([
+            Reservation(user=owner, property=prop, start_date=start + timedelta(days=i % 300),
+                        end_date=start + timedelta(days=i % 300 + 3), status='confirmed')
+            for i in range(rows)
+        ], batch_size=1000)
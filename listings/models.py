@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from dreambook.geo import cell_for
 
 
 class Listing(models.Model):
@@ -17,10 +18,28 @@ class Listing(models.Model):
         max_digits=9, decimal_places=6, null=True, blank=True
     )
     image_url = models.URLField(max_length=500, null=True, blank=True)
+    # Komórka siatki (dreambook.geo) liczona przy zapisie — zapytania ?bbox= / ?near=
+    geo_cell = models.BigIntegerField(null=True, blank=True, editable=False)
 
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="listings"
     )
 
+    class Meta:
+        # Klucze paginacji keyset dla sortowań z ListingViewSet
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="listing_created_id_idx"),
+            models.Index(fields=["price_per_night", "id"], name="listing_price_id_idx"),
+            # ?bbox= / ?near=: zakres komórek + granice sprawdzane w indeksie
+            models.Index(fields=["geo_cell", "latitude", "longitude"], name="listing_geo_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.geo_cell = cell_for(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"geo_cell"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.title
@@ -1,3 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-# Create your tests here.
+from dreambook.pagination import KeysetPagination
+from dreambook.read_serializers import ValuesSerializer
+from dreambook.testing import QueryCountAssertionsMixin
+
+from .models import Listing
+from .serializers import ListingSerializer
+
+User = get_user_model()
+
+
+class ListingPaginationTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username="host", email="host@example.com", password="pass")
+        # Powtarzające się ceny — klucz (price_per_night, id) musi rozstrzygać remisy
+        for i, price in enumerate(["100.00", "100.00", "150.00", "100.00", "90.00", "150.00", "200.00"]):
+            Listing.objects.create(
+                title=f"Listing {i}", description="Opis", price_per_night=price,
+                location="Kraków", owner=self.owner,
+            )
+
+    def walk(self, url, params):
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item["id"] for item in response.data["results"])
+            if not response.data["next"]:
+                return seen, response
+            response = self.client.get(response.data["next"])
+
+    def test_price_sort_pages_follow_keyset(self):
+        seen, _ = self.walk("/api/listings/", {"sort": "price_asc", "page_size": 2})
+
+        expected = list(Listing.objects.order_by("price_per_night", "id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_newest_first_and_previous_link(self):
+        seen, last = self.walk("/api/listings/", {"page_size": 3})
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+        previous = self.client.get(last.data["previous"])
+        self.assertEqual([item["id"] for item in previous.data["results"]], seen[3:6])
+
+    def test_page_query_does_not_use_offset(self):
+        first = self.client.get("/api/listings/", {"page_size": 2})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first.data["next"])
+        self.assertFalse(any("OFFSET" in q["sql"] for q in ctx.captured_queries))
+
+    def test_owner_username_has_no_n_plus_one(self):
+        def make_listings(count):
+            for _ in range(count):
+                n = User.objects.count()
+                owner = User.objects.create_user(username=f"owner{n}", email=f"owner{n}@example.com")
+                Listing.objects.create(title="Nowy", description="", price_per_night=10,
+                                       location="Poznań", owner=owner)
+
+        self.assertQueryCountConstant("/api/listings/", make_listings, params={"page_size": 100})
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/listings/", {"cursor": "nonsense"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_related_field_ordering(self):
+        # Właściciele w kolejności odwrotnej do id ogłoszeń, dwa ogłoszenia na właściciela
+        for i, listing in enumerate(Listing.objects.order_by("-id")):
+            listing.owner = User.objects.get_or_create(username=f"o{i // 2}", email=f"o{i // 2}@example.com")[0]
+            listing.save()
+        factory = APIRequestFactory()
+        queryset = Listing.objects.order_by("-owner__username")
+
+        seen, url = [], "/api/listings/?page_size=3"
+        while url:
+            paginator = KeysetPagination()
+            seen += [listing.pk for listing in paginator.paginate_queryset(queryset, Request(factory.get(url)))]
+            url = paginator.get_next_link()
+        self.assertEqual(seen, list(queryset.order_by("-owner__username", "-id").values_list("id", flat=True)))
+
+        with self.assertRaises(ParseError):
+            KeysetPagination().paginate_queryset(Listing.objects.order_by("owner__nonexistent"),
+                                                 Request(factory.get("/api/listings/")))
+
+
+class ListingReadSerializerTests(TestCase):
+    def test_values_serializer_matches_model_serializer(self):
+        owner = User.objects.create_user(username="host", email="host@example.com", password="pass")
+        Listing.objects.create(
+            title="Apartament", description="Opis", price_per_night="123.40", location="Gdańsk",
+            latitude="54.352025", longitude="18.646638", owner=owner,
+        )
+        Listing.objects.create(title="Bez mapy", description="", price_per_night=99, location="Łódź", owner=owner)
+
+        queryset = Listing.objects.order_by("id")
+        expected = ListingSerializer(queryset, many=True).data
+        self.assertEqual(ValuesSerializer.for_serializer(ListingSerializer).serialize(queryset), expected)
+
+
+class ListingGeoTests(TestCase):
+    def test_near_and_bbox_filter_listings(self):
+        owner = User.objects.create_user(username="host", email="host@example.com", password="pass")
+        for title, lat, lng in [("Rynek", "50.061700", "19.937400"), ("Nowa Huta", "50.072000", "20.037800"),
+                                ("Gdańsk", "54.352025", "18.646638")]:
+            Listing.objects.create(title=title, description="", price_per_night=100, location="-",
+                                   latitude=lat, longitude=lng, owner=owner)
+        Listing.objects.create(title="Bez mapy", description="", price_per_night=99, location="-", owner=owner)
+
+        client = APIClient()
+        response = client.get("/api/listings/", {"near": "50.0614,19.9366", "radius": "2"})
+        self.assertEqual([item["title"] for item in response.data["results"]], ["Rynek"])
+        response = client.get("/api/listings/", {"bbox": "19.5,49.9,20.5,50.2"})
+        self.assertEqual({item["title"] for item in response.data["results"]}, {"Rynek", "Nowa Huta"})
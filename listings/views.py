@@ -3,17 +3,36 @@ from rest_framework import viewsets
 from .serializers import ListingSerializer
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from rest_framework.response import Response
+from dreambook.geo import GeoFilterMixin
+from dreambook.prefetch import AutoPrefetchMixin
+from dreambook.read_serializers import ValuesSerializer
+from filtering_sorting.search import FullTextSearchFilter, SearchIndex
 
 
 # API ViewSet
 @method_decorator(csrf_exempt, name="dispatch")
-class ListingViewSet(viewsets.ModelViewSet):
+class ListingViewSet(GeoFilterMixin, AutoPrefetchMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows listings to be viewed or edited.
     """
 
     queryset = Listing.objects.all().order_by("-created_at")
     serializer_class = ListingSerializer
+    # ?search= po tytule, opisie i lokalizacji; bez ?sort= wyniki wg trafności
+    filter_backends = [FullTextSearchFilter]
+    search_document = "listing"
+    search_ordering_params = ("sort",)
+
+    def list(self, request, *args, **kwargs):
+        # Odczyt listy przez .values() — ListingSerializer zostaje do zapisu i szczegółów
+        reader = ValuesSerializer.for_serializer(ListingSerializer)
+        rows = reader.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.to_representation(page))
+        return Response(reader.to_representation(rows))
 
     def perform_create(self, serializer):
         # This will automatically set the owner when creating
@@ -38,6 +57,9 @@ class ListingViewSet(viewsets.ModelViewSet):
             queryset = queryset.order_by("-created_at")
 
         if location:
-            queryset = queryset.filter(location__icontains=location)
+            # Słowa lokalizacji jako prefiksy z indeksu zamiast LIKE '%x%'
+            condition = SearchIndex.condition("listing", location, columns=["location"])
+            if condition is not None:
+                queryset = queryset.filter(condition)
 
         return queryset
@@ -0,0 +1,143 @@
+import uuid
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from dreambook.geo import CELL_ZOOM, bbox_condition, deinterleave, interleave, split_bbox, tile_for
+
+from .models import MapMarker
+
+CACHE_TIMEOUT = 60 * 60  # s
+# Od tego zoomu zwracamy pojedyncze znaczniki zamiast klastrów
+MARKER_ZOOM = 15
+# Klaster = kafelek poziomu zoom + 3, czyli ~32 px na kafelku mapy 256 px
+CLUSTER_LEVEL_OFFSET = 3
+# Blok w cache to 2^BLOCK_BITS x 2^BLOCK_BITS komórek jednego poziomu piramidy
+BLOCK_BITS = 4
+MAX_BLOCKS = 256
+# Od MARKER_ZOOM najwyżej tyle znaczników w odpowiedzi (reszta obcięta, truncated=True)
+MAX_MARKERS = 1000
+
+
+def cluster_level(zoom):
+    return min(zoom + CLUSTER_LEVEL_OFFSET, CELL_ZOOM)
+
+
+def _block_shift(level):
+    return 2 * min(BLOCK_BITS, level)
+
+
+def _version_key(level, block):
+    return f'clusters:{level}:{block}:version'
+
+
+def _block_key(level, block, version):
+    return f'clusters:{level}:{block}:{version}'
+
+
+def _versions(level, blocks):
+    """{blok: wersja}; brakujące wersje zakładane przez add (wygrywa pierwszy proces)."""
+    keys = {_version_key(level, block): block for block in blocks}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, uuid.uuid4().hex, None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _build_block(level, block):
+    """
+    Klastry jednego bloku: GROUP BY (komórka poziomu, typ znacznika) po
+    zakresie geo_cell — agregacja w bazie, jedno zapytanie na blok.
+    """
+    cell_shift = 2 * (CELL_ZOOM - level)
+    first = block << (_block_shift(level) + cell_shift)
+    last = (block + 1) << (_block_shift(level) + cell_shift)
+    rows = (
+        MapMarker.objects
+        .filter(location__geo_cell__gte=first, location__geo_cell__lt=last)
+        .values(cell=F('location__geo_cell') / (1 << cell_shift), type=F('marker_type'))
+        .annotate(count=Count('id'), lat=Sum('location__latitude'), lng=Sum('location__longitude'))
+        .order_by()
+    )
+    clusters = {}
+    for row in rows:
+        count, lat, lng, types = clusters.get(row['cell'], (0, 0.0, 0.0, Counter()))
+        types[row['type']] += row['count']
+        clusters[row['cell']] = (count + row['count'], lat + row['lat'], lng + row['lng'], types)
+    return {cell: (count, lat / count, lng / count, dict(types))
+            for cell, (count, lat, lng, types) in clusters.items()}
+
+
+class ClusterPyramid:
+    """
+    Piramida klastrów: dla każdego poziomu siatki liczba znaczników,
+    środek ciężkości i rozbicie na typy per komórka. Trzymana w cache
+    blokami, więc zmiana znacznika unieważnia tylko jeden blok na poziom.
+    Klucz bloku zawiera wersję (jak AvailabilityIndex) — unieważnienie
+    podmienia wersję, więc blok zbudowany równolegle ze starych danych
+    nigdy nie zostanie już odczytany.
+    """
+
+    @staticmethod
+    def clusters(level, south, west, north, east):
+        tiles = []
+        for s, w, n, e in split_bbox(south, west, north, east):
+            x0, y0 = tile_for(n, w, level)
+            x1, y1 = tile_for(s, e, level)
+            tiles.append((x0, y0, x1, y1))
+
+        shift = min(BLOCK_BITS, level)
+        ranges = [(range(x0 >> shift, (x1 >> shift) + 1), range(y0 >> shift, (y1 >> shift) + 1))
+                  for x0, y0, x1, y1 in tiles]
+        # Limit sprawdzany przed wyliczeniem bloków — cały świat na wysokim zoomie to miliony
+        if sum(len(xs) * len(ys) for xs, ys in ranges) > MAX_BLOCKS:
+            return None
+        blocks = {interleave(x, y) for xs, ys in ranges for x in xs for y in ys}
+
+        versions = _versions(level, blocks)
+        keys = {_block_key(level, block, versions[block]): block for block in blocks}
+        found = cache.get_many(keys)
+        missing = {key: _build_block(level, keys[key]) for key in keys.keys() - found.keys()}
+        if missing:
+            cache.set_many(missing, CACHE_TIMEOUT)
+        found.update(missing)
+
+        result = []
+        for content in found.values():
+            for cell, (count, lat, lng, types) in content.items():
+                x, y = deinterleave(cell)
+                if any(x0 <= x <= x1 and y0 <= y <= y1 for x0, y0, x1, y1 in tiles):
+                    result.append({'cell': cell, 'count': count, 'latitude': lat, 'longitude': lng,
+                                   'types': types})
+        result.sort(key=lambda c: c['cell'])
+        return result
+
+    @staticmethod
+    def invalidate(*geo_cells):
+        """Nowa wersja bloków zawierających podane komórki — po jednym na poziom."""
+        keys = {
+            _version_key(level, geo_cell >> (2 * (CELL_ZOOM - level) + _block_shift(level)))
+            for geo_cell in geo_cells if geo_cell is not None
+            for level in range(cluster_level(MARKER_ZOOM - 1) + 1)
+        }
+        if keys:
+            cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+            # Drugi raz po commicie: odczyt, który wpadł między zapisem a commitem,
+            # mógł zbudować blok ze starych danych
+            transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+
+def markers_in_bbox(south, west, north, east):
+    """([znacznik], truncated) — najwyżej MAX_MARKERS pierwszych po id."""
+    markers = list(
+        MapMarker.objects
+        .filter(bbox_condition(south, west, north, east, 'location__geo_cell',
+                               'location__latitude', 'location__longitude'))
+        .values('id', 'label', 'marker_type', 'location_id',
+                latitude=F('location__latitude'), longitude=F('location__longitude'))
+        .order_by('id')[:MAX_MARKERS + 1]
+    )
+    return markers[:MAX_MARKERS], len(markers) > MAX_MARKERS
@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from dreambook.geo import bbox_condition, cell_for, haversine_expression, near
+from map.models import Location
+
+# Kraków, Warszawa, Gdańsk — skupiska jak w prawdziwych danych
+CENTRES = [(50.06, 19.94), (52.23, 21.01), (54.35, 18.65)]
+
+
+class Command(BaseCommand):
+    help = ('Compares ?bbox= / ?near= queries served through the geo_cell index with a naive '
+            'scan over latitude/longitude. All generated rows are rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        with transaction.atomic():
+            self.fill(options['points'])
+            self.stdout.write(f'{"query":<26} {"rows":>7} {"naive scan":>11} {"geo_cell":>10} {"speedup":>8}')
+            for name, naive, indexed in self.scenarios():
+                naive_ms, naive_rows = self.timed(naive, options['repeat'])
+                indexed_ms, indexed_rows = self.timed(indexed, options['repeat'])
+                assert naive_rows == indexed_rows, (name, naive_rows, indexed_rows)
+                self.stdout.write(f'{name:<26} {indexed_rows:>7} {naive_ms:>9.2f}ms {indexed_ms:>8.2f}ms '
+                                  f'{naive_ms / max(indexed_ms, 1e-6):>7.1f}x')
+            transaction.set_rollback(True)
+
+    def fill(self, points, batch_size=10_000):
+        self.stdout.write(f'Creating {points} locations...')
+        created = 0
+        while created < points:
+            batch = []
+            for i in range(min(batch_size, points - created)):
+                if random.random() < 0.7:
+                    lat, lng = random.choice(CENTRES)
+                    lat, lng = random.gauss(lat, 0.3), random.gauss(lng, 0.3)
+                else:
+                    lat, lng = random.uniform(-60, 70), random.uniform(-180, 180)
+                # bulk_create omija save(), więc komórkę liczymy sami
+                batch.append(Location(name=f'P{created + i}', location='bench', latitude=lat, longitude=lng,
+                                      geo_cell=cell_for(lat, lng)))
+            Location.objects.bulk_create(batch, batch_size=1000)
+            created += len(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(Location._meta.db_table)}')
+
+    def scenarios(self):
+        locations = Location.objects.all()
+        for name, (south, west, north, east) in [
+            ('bbox Kraków centre', (50.04, 19.90, 50.08, 19.98)),
+            ('bbox Kraków region', (49.8, 19.5, 50.3, 20.4)),
+            ('bbox southern Poland', (49.0, 14.0, 51.0, 24.0)),
+        ]:
+            def naive(s=south, w=west, n=north, e=east):
+                return locations.filter(latitude__range=(s, n), longitude__range=(w, e))
+
+            def indexed(s=south, w=west, n=north, e=east):
+                return locations.filter(bbox_condition(s, w, n, e))
+            yield name, naive, indexed
+
+        for name, (lat, lng, radius) in [
+            ('near Warszawa 1 km', (52.23, 21.01, 1)),
+            ('near Warszawa 10 km', (52.23, 21.01, 10)),
+            ('near Gdańsk 50 km', (54.35, 18.65, 50)),
+        ]:
+            def naive(lat=lat, lng=lng, radius=radius):
+                return locations.alias(d=haversine_expression(lat, lng)).filter(d__lte=radius)
+
+            def indexed(lat=lat, lng=lng, radius=radius):
+                return near(locations, lat, lng, radius)
+            yield name, naive, indexed
+
+    def timed(self, build, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(build().values_list('pk', flat=True))
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), rows
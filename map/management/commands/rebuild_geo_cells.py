@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dreambook.geo import cell_for
+from listings.models import Listing
+from map.models import Location
+
+
+class Command(BaseCommand):
+    help = ('Recomputes geo_cell for every Location and Listing, e.g. for rows created before the '
+            'column existed or written with bulk_create / update().')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for model in (Location, Listing):
+            updated = self.rebuild(model, options['batch_size'])
+            self.stdout.write(f'{model.__name__}: {updated} cells updated')
+
+    def rebuild(self, model, batch_size):
+        updated = 0
+        last_pk = 0
+        while True:
+            rows = list(model.objects.filter(pk__gt=last_pk).order_by('pk')
+                        .values_list('pk', 'latitude', 'longitude', 'geo_cell')[:batch_size])
+            if not rows:
+                return updated
+            last_pk = rows[-1][0]
+            changed = []
+            for pk, latitude, longitude, cell in rows:
+                expected = cell_for(latitude, longitude)
+                if cell != expected:
+                    changed.append(model(pk=pk, geo_cell=expected))
+            with transaction.atomic():
+                model.objects.bulk_update(changed, ['geo_cell'], batch_size=1000)
+            updated += len(changed)
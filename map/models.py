@@ -1,10 +1,27 @@
 from django.db import models
+from dreambook.geo import cell_for
 
 class Location(models.Model):
     name = models.CharField(max_length=100)
     location = models.CharField(max_length=100)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Komórka siatki (dreambook.geo) liczona przy zapisie — zapytania ?bbox= / ?near=
+    geo_cell = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Zakres komórek + dokładne granice sprawdzane w samym indeksie,
+            # do tabeli sięgamy tylko po trafienia
+            models.Index(fields=['geo_cell', 'latitude', 'longitude'], name='location_geo_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.geo_cell = cell_for(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geo_cell'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} ({self.location})"
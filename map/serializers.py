@@ -15,7 +15,7 @@ from .models import (
 class LocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Location
-        fields = '__all__'
+        exclude = ['geo_cell']
 
 class MapMarkerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,57 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .clustering import ClusterPyramid
+from .models import Location, MapMarker, MapUpdate
+from .tiles import TileCache
+
+
+def _cells(location_ids):
+    return Location.objects.filter(pk__in=location_ids).values_list('geo_cell', flat=True)
+
+
+@receiver(pre_save, sender=MapMarker)
+def remember_previous_marker_location(sender, instance, **kwargs):
+    instance._previous_location_id = None
+    if instance.pk:
+        instance._previous_location_id = (
+            MapMarker.objects.filter(pk=instance.pk).values_list('location_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=MapMarker)
+def invalidate_clusters_on_marker_save(sender, instance, **kwargs):
+    # Przeniesiony znacznik zmienia klastry w starym i nowym miejscu
+    ClusterPyramid.invalidate(*_cells({instance.location_id, getattr(instance, '_previous_location_id', None)}))
+
+
+@receiver(pre_delete, sender=MapMarker)
+def invalidate_clusters_on_marker_delete(sender, instance, **kwargs):
+    # pre_delete: przy kaskadzie z Location wiersz lokalizacji jeszcze istnieje
+    ClusterPyramid.invalidate(*_cells([instance.location_id]))
+
+
+@receiver(pre_save, sender=Location)
+def remember_previous_cell(sender, instance, **kwargs):
+    instance._previous_geo_cell = None
+    if instance.pk:
+        instance._previous_geo_cell = (
+            Location.objects.filter(pk=instance.pk).values_list('geo_cell', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Location)
+def invalidate_clusters_on_location_save(sender, instance, created, **kwargs):
+    # Nowa lokalizacja nie ma jeszcze znaczników
+    if not created:
+        ClusterPyramid.invalidate(instance.geo_cell, getattr(instance, '_previous_geo_cell', None))
+
+
+@receiver(post_delete, sender=Location)
+def invalidate_clusters_on_location_delete(sender, instance, **kwargs):
+    ClusterPyramid.invalidate(instance.geo_cell)
+
+
+@receiver([post_save, post_delete], sender=MapUpdate)
+def invalidate_tiles(sender, **kwargs):
+    TileCache.invalidate()
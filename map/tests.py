@@ -1,6 +1,19 @@
-from django.test import TestCase
+import json
+import random
+import sys
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
-from .models import Location
+from dreambook.geo import covering_ranges, haversine_expression, haversine_km, interleave, near, tile_for
+from .clustering import _build_block, cluster_level
+from .models import POI, Location, MapMarker, MapUpdate
+from .tiles import (LAYER_LOCATION, LAYER_MARKER, LAYER_POI, MARKER_TYPE_CODES, MAX_DISK_ZOOM, TileCache,
+                    read_tile)
 
 class MapModuleTests(TestCase):
     def setUp(self):
@@ -49,4 +62,276 @@ class MapModuleTests(TestCase):
             "user_id": 123,
             "location": self.location.id
         }, format='json')
-        self.assertEqual(response.status_code, 201)
\ No newline at end of file
+        self.assertEqual(response.status_code, 201)
+
+    def test_locations_ndjson_stream(self):
+        Location.objects.create(name="Drugi", location="Gdańsk", latitude=54.35, longitude=18.64)
+        response = self.client.get('/api/locations/?format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Test Hotel", "Drugi"])
+
+    def test_locations_json_array_stream(self):
+        response = self.client.get('/api/locations/?stream=1')
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([item["name"] for item in data], ["Test Hotel"])
+
+
+class GeoQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        random.seed(7)
+        self.points = [(random.uniform(49.0, 55.0), random.uniform(14.0, 24.5)) for _ in range(300)]
+        # Punkty po obu stronach antypołudnika
+        self.points += [(-17.7, 179.9), (-17.8, -179.9), (-17.7, 170.0)]
+        for i, (lat, lng) in enumerate(self.points):
+            Location.objects.create(name=f"P{i}", location="x", latitude=lat, longitude=lng)
+
+    def names(self, params):
+        response = self.client.get('/api/locations/', {**params, 'page_size': 500})
+        self.assertEqual(response.status_code, 200)
+        return {item["name"] for item in response.data["results"]}
+
+    def test_bbox_matches_brute_force(self):
+        for south, west, north, east in [(50.0, 19.0, 50.5, 20.5), (49.0, 14.0, 55.0, 24.5), (52.1, 20.9, 52.2, 21.0)]:
+            expected = {f"P{i}" for i, (lat, lng) in enumerate(self.points)
+                        if south <= lat <= north and west <= lng <= east}
+            self.assertEqual(self.names({'bbox': f'{west},{south},{east},{north}'}), expected)
+
+    def test_bbox_across_antimeridian(self):
+        self.assertEqual(self.names({'bbox': '179,-18,-179,-17'}), {"P300", "P301"})
+
+    def test_near_matches_haversine(self):
+        for lat, lng, radius in [(52.23, 21.01, 50), (50.06, 19.94, 120), (-17.75, 180.0, 20)]:
+            expected = {f"P{i}" for i, (plat, plng) in enumerate(self.points)
+                        if haversine_km(lat, lng, plat, plng) <= radius}
+            self.assertEqual(self.names({'near': f'{lat},{lng}', 'radius': radius}), expected)
+
+    def test_near_scans_only_covering_cells(self):
+        # Ten sam wynik co pełny skan, ale haversine liczony tylko dla kandydatów z komórek
+        indexed = near(Location.objects.all(), 52.23, 21.01, 30)
+        naive = Location.objects.alias(d=haversine_expression(52.23, 21.01)).filter(d__lte=30)
+        self.assertEqual(set(indexed), set(naive))
+        self.assertIn('geo_cell', str(indexed.query))
+        self.assertIn('location_geo_idx', indexed.explain())
+        self.assertLessEqual(len(covering_ranges(49.0, 14.0, 55.0, 24.5)), 32)
+
+    def test_invalid_geo_params(self):
+        for params in [{'bbox': '1,2,3'}, {'bbox': '20,55,14,49x'}, {'near': '52.2'},
+                       {'near': '52.2,21.0', 'radius': '-1'}, {'bbox': '0,80,10,70'}]:
+            self.assertEqual(self.client.get('/api/locations/', params).status_code, 400, params)
+
+    def test_cell_follows_coordinates(self):
+        location = Location.objects.get(name="P0")
+        location.latitude, location.longitude = -33.87, 151.21
+        location.save(update_fields=['latitude', 'longitude'])
+        self.assertIn("P0", self.names({'near': '-33.87,151.21', 'radius': 1}))
+
+
+class MarkerClusterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        random.seed(11)
+        self.markers = []
+        for i in range(200):
+            lat, lng = random.uniform(49.0, 55.0), random.uniform(14.0, 24.5)
+            location = Location.objects.create(name=f"C{i}", location="x", latitude=lat, longitude=lng)
+            marker_type = random.choice(['property', 'poi', 'custom'])
+            MapMarker.objects.create(location=location, marker_type=marker_type, label=f"M{i}")
+            self.markers.append((lat, lng, marker_type))
+
+    def clusters(self, bbox, zoom):
+        response = self.client.get('/api/map-markers/clusters/', {'bbox': bbox, 'zoom': zoom})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def brute_force(self, south, west, north, east, zoom):
+        level = cluster_level(zoom)
+        x0, y0 = tile_for(north, west, level)
+        x1, y1 = tile_for(south, east, level)
+        expected = {}
+        for lat, lng, marker_type in self.markers:
+            x, y = tile_for(lat, lng, level)
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                expected.setdefault(interleave(x, y), Counter())[marker_type] += 1
+        return expected
+
+    def test_clusters_match_brute_force(self):
+        for south, west, north, east, zoom in [(49.0, 14.0, 55.0, 24.5, 5), (50.0, 19.0, 52.5, 21.5, 8)]:
+            data = self.clusters(f'{west},{south},{east},{north}', zoom)
+            got = {c['cell']: Counter(c['types']) for c in data['clusters']}
+            self.assertEqual(got, self.brute_force(south, west, north, east, zoom))
+            for cluster in data['clusters']:
+                self.assertEqual(cluster['count'], sum(cluster['types'].values()))
+        # Środek ciężkości pojedynczego klastra = średnia współrzędnych jego znaczników
+        data = self.clusters('14,49,24.5,55', 0)
+        self.assertEqual(len(data['clusters']), 1)
+        self.assertEqual(data['clusters'][0]['count'], 200)
+        self.assertAlmostEqual(data['clusters'][0]['latitude'], sum(m[0] for m in self.markers) / 200, places=6)
+
+    def test_high_zoom_returns_markers(self):
+        lat, lng, _ = self.markers[0]
+        data = self.clusters(f'{lng - 0.001},{lat - 0.001},{lng + 0.001},{lat + 0.001}', 16)
+        self.assertIn("M0", {m['label'] for m in data['markers']})
+        self.assertFalse(data['truncated'])
+
+    def test_marker_list_is_capped(self):
+        with mock.patch('map.clustering.MAX_MARKERS', 50):
+            data = self.clusters('-180,-85,180,85', 22)
+        self.assertEqual(len(data['markers']), 50)
+        self.assertTrue(data['truncated'])
+        self.assertEqual([m['label'] for m in data['markers']], [f"M{i}" for i in range(50)])
+
+    def test_block_built_across_commit_is_not_served(self):
+        def build_then_delete(level, block):
+            content = _build_block(level, block)
+            # Znacznik usunięty i zatwierdzony w trakcie budowy — zbudowany blok jest już nieaktualny
+            with self.captureOnCommitCallbacks(execute=True):
+                MapMarker.objects.filter(label="M1").delete()
+            return content
+
+        # Zoom 0 = poziom 3 = jeden blok na cały świat
+        with mock.patch('map.clustering._build_block', side_effect=build_then_delete):
+            self.assertEqual(self.clusters('14,49,24.5,55', 0)['clusters'][0]['count'], 200)
+        self.assertEqual(self.clusters('14,49,24.5,55', 0)['clusters'][0]['count'], 199)
+
+    def test_cached_blocks_skip_database(self):
+        self.clusters('14,49,24.5,55', 6)
+        with self.assertNumQueries(0):
+            self.clusters('14,49,24.5,55', 6)
+
+    def test_changes_invalidate_clusters(self):
+        bbox = '14,49,24.5,55'
+        before = sum(c['count'] for c in self.clusters(bbox, 6)['clusters'])
+        MapMarker.objects.filter(label="M1").get().delete()
+        self.assertEqual(sum(c['count'] for c in self.clusters(bbox, 6)['clusters']), before - 1)
+
+        location = Location.objects.get(name="C2")
+        location.latitude, location.longitude = -33.87, 151.21
+        location.save()
+        self.assertEqual(sum(c['count'] for c in self.clusters(bbox, 6)['clusters']), before - 2)
+
+        location = Location.objects.create(name="new", location="x", latitude=52.23, longitude=21.01)
+        MapMarker.objects.create(location=location, marker_type='poi', label="new")
+        self.assertEqual(sum(c['count'] for c in self.clusters(bbox, 6)['clusters']), before - 1)
+
+    def test_invalid_cluster_params(self):
+        for params in [{'zoom': 5}, {'bbox': '14,49,24.5,55'}, {'bbox': '14,49,24.5,55', 'zoom': 'x'},
+                       {'bbox': '14,49,24.5,55', 'zoom': 30}, {'bbox': '-180,-85,180,85', 'zoom': 12}]:
+            response = self.client.get('/api/map-markers/clusters/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class MapTileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.tile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tile_dir.cleanup)
+        tile_settings = override_settings(MAP_TILE_CACHE_DIR=self.tile_dir.name)
+        tile_settings.enable()
+        self.addCleanup(tile_settings.disable)
+
+        self.warsaw = Location.objects.create(name="Warszawa", location="x", latitude=52.2297, longitude=21.0122)
+        self.krakow = Location.objects.create(name="Kraków", location="x", latitude=50.0647, longitude=19.9450)
+        self.marker = MapMarker.objects.create(location=self.warsaw, marker_type='poi', label="Centrum")
+        self.poi = POI.objects.create(name="Zamek", description="", location=self.warsaw)
+        # Kafelek z Warszawą na zoomie 10, bez Krakowa
+        self.z, self.x, self.y = 10, 571, 337
+
+    def tile(self, **headers):
+        return self.client.get(f'/api/map-tiles/{self.z}/{self.x}/{self.y}', **headers)
+
+    def test_tile_contains_objects_in_bounds(self):
+        response = self.tile()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        z, x, y, records = read_tile(response.content)
+        self.assertEqual((z, x, y), (self.z, self.x, self.y))
+        self.assertEqual({(pk, layer, type_code) for pk, layer, type_code, _, _ in records}, {
+            (self.warsaw.pk, LAYER_LOCATION, 0),
+            (self.marker.pk, LAYER_MARKER, MARKER_TYPE_CODES['poi']),
+            (self.poi.pk, LAYER_POI, 0),
+        })
+        # Pozycja w kafelku: 571.77 / 337.18 kafelka przy 4096 jednostkach na kafelek
+        _, _, _, px, py = records[0]
+        self.assertAlmostEqual(px / 4096, 0.77, delta=0.01)
+        self.assertAlmostEqual(py / 4096, 0.18, delta=0.01)
+
+    def test_etag_and_disk_cache(self):
+        first = self.tile()
+        self.assertEqual(self.tile(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertTrue(TileCache.path(TileCache.generation(), self.z, self.x, self.y).exists())
+        # Kafelek z dysku, generacja z cache — bez zapytań do bazy
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tile().content, first.content)
+
+    def test_map_update_invalidates_tiles(self):
+        first = self.tile()
+        MapMarker.objects.create(location=self.warsaw, marker_type='custom', label="Nowy")
+        # Bez publikacji (MapUpdate) kafelek się nie zmienia
+        self.assertEqual(self.tile().content, first.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MapUpdate.objects.create(description="Nowe znaczniki")
+        second = self.tile()
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.tile(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        self.assertEqual(len(read_tile(second.content)[3]), 4)
+        self.assertFalse(TileCache.path(0, self.z, self.x, self.y).exists())
+
+    def test_dense_layers_are_thinned(self):
+        for i in range(6):
+            Location.objects.create(name=f"Mazowsze {i}", location="x", latitude=52.0 + i / 10, longitude=21.0)
+        brazil = Location.objects.create(name="Brasília", location="x", latitude=-15.79, longitude=-47.88)
+        # Limit 4 = siatka 2 x 2 na kafelku 0/0/0, czyli półkule
+        with mock.patch('map.tiles.MAX_TILE_FEATURES', 4):
+            _, _, _, records = read_tile(TileCache.get(0, 0, 0))
+        locations = [record for record in records if record[1] == LAYER_LOCATION]
+        self.assertEqual({pk for pk, *_ in locations}, {self.warsaw.pk, brazil.pk})
+        # Małe warstwy bez zmian
+        self.assertEqual([(pk, layer) for pk, layer, *_ in records if layer != LAYER_LOCATION],
+                         [(self.marker.pk, LAYER_MARKER), (self.poi.pk, LAYER_POI)])
+
+    def test_concurrent_reads_with_eviction(self):
+        errors = []
+
+        def read(offset):
+            for i in range(300):
+                try:
+                    TileCache.get(3, (offset + i) % 8, 0, generation=0)
+                except Exception as exc:
+                    errors.append(exc)
+
+        # Tylko dwa kafelki w pamięci — wątki ciągle wyrzucają sobie nawzajem kafelki
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+        with mock.patch('map.tiles.MAX_MEMORY_TILES', 2), mock.patch('map.tiles.build_tile', return_value=b'x' * 64):
+            threads = [threading.Thread(target=read, args=(offset,)) for offset in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+
+    def test_only_non_empty_low_zoom_tiles_are_written(self):
+        # Pusty kafelek (środek Pacyfiku) i kafelek ponad MAX_DISK_ZOOM nie trafiają na dysk
+        empty = TileCache.get(10, 0, 512, generation=0)
+        self.assertEqual(read_tile(empty)[3], [])
+        self.assertFalse(TileCache.path(0, 10, 0, 512).exists())
+
+        z = MAX_DISK_ZOOM + 1
+        x, y = tile_for(self.warsaw.latitude, self.warsaw.longitude, z)
+        self.assertEqual(len(read_tile(TileCache.get(z, x, y, generation=0))[3]), 3)
+        self.assertFalse(TileCache.path(0, z, x, y).exists())
+        self.assertFalse(any(path.is_file() for path in Path(self.tile_dir.name).rglob('*')))
+
+    def test_tile_out_of_range(self):
+        for url in ['/api/map-tiles/21/0/0', '/api/map-tiles/2/4/0', '/api/map-tiles/2/0/4']:
+            self.assertEqual(self.client.get(url).status_code, 404, url)
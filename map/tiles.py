@@ -0,0 +1,186 @@
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, CharField, F, Max, Min, Value
+
+from dreambook.geo import CELL_ZOOM, interleave, mercator
+
+from .models import POI, Location, MapMarker, MapUpdate
+
+TILE_CONTENT_TYPE = 'application/vnd.dreambook.tile'
+TILE_MAGIC = b'DBT1'
+# Nagłówek: magic, z, x, y, liczba rekordów
+HEADER = struct.Struct('<4sBIII')
+# Rekord: id obiektu, warstwa, typ znacznika, pozycja w kafelku (0..EXTENT-1)
+RECORD = struct.Struct('<QBBHH')
+EXTENT = 4096
+LAYER_LOCATION, LAYER_MARKER, LAYER_POI = 0, 1, 2
+# 0 = brak typu (lokalizacje, POI)
+MARKER_TYPE_CODES = {code: i + 1 for i, (code, _) in enumerate(MapMarker.MARKER_TYPES)}
+# Kafelek z <= CELL_ZOOM to ciągły przedział geo_cell, więc wyżej nie schodzimy
+MAX_TILE_ZOOM = CELL_ZOOM
+GENERATION_KEY = 'tiles:generation'
+# Krótko, bo cache może być lokalny dla procesu: inne workery widzą nową generację najpóźniej po tym czasie
+GENERATION_TTL = 5  # s
+# Kafelki trzymane w pamięci procesu (LRU)
+MAX_MEMORY_TILES = 256
+# Na dysk trafiają tylko niepuste kafelki do tego zoomu — plików jest najwyżej tyle, ile
+# obiektów razy zoomów, niezależnie od zapytań. Wyższe zoomy to tanie przedziały geo_cell
+# budowane z bazy przy każdym zapytaniu; powtórki odcina cache HTTP (ETag, Cache-Control)
+MAX_DISK_ZOOM = 12
+# Najwyżej tyle obiektów jednej warstwy w kafelku; gęstsza warstwa (małe zoomy) jest przerzedzana
+MAX_TILE_FEATURES = 4096
+
+
+def _position(latitude, longitude, z, x, y):
+    fx, fy = mercator(latitude, longitude, z)
+    return (min(max(int((fx - x) * EXTENT), 0), EXTENT - 1),
+            min(max(int((fy - y) * EXTENT), 0), EXTENT - 1))
+
+
+def _layer(model, prefix, cells, z, type_field=None):
+    """
+    [(id, typ, lat, lng)] jednej warstwy. Ponad MAX_TILE_FEATURES obiektów
+    kafelek dzielony jest na siatkę MAX_TILE_FEATURES komórek i z każdej
+    zostaje jeden punkt (najmniejsze id, środek komórki) — GROUP BY w bazie.
+    """
+    geo, lat, lng = f'{prefix}geo_cell', f'{prefix}latitude', f'{prefix}longitude'
+    queryset = model.objects.filter(**{f'{geo}__range': cells})
+    no_type = Value(None, output_field=CharField())
+    rows = list(queryset.values_list('id', F(type_field) if type_field else no_type, lat, lng)
+                .order_by('id')[:MAX_TILE_FEATURES + 1])
+    if len(rows) > MAX_TILE_FEATURES:
+        grid_bits = (MAX_TILE_FEATURES.bit_length() - 1) // 2
+        shift = 2 * (CELL_ZOOM - min(z + grid_bits, CELL_ZOOM))
+        rows = list(
+            queryset.values(cell=F(geo) / (1 << shift))
+            .annotate(pk=Min('id'), kind=Min(type_field) if type_field else no_type,
+                      avg_lat=Avg(lat), avg_lng=Avg(lng))
+            .values_list('pk', 'kind', 'avg_lat', 'avg_lng').order_by('pk')
+        )
+    return rows
+
+
+def build_tile(z, x, y):
+    """
+    Kafelek binarny: nagłówek + tablica rekordów RECORD posortowana po
+    (warstwa, id). Obiekty wybierane po przedziale geo_cell — po zapytaniu
+    na warstwę (dwa, gdy warstwę trzeba przerzedzić).
+    """
+    shift = 2 * (CELL_ZOOM - z)
+    first = interleave(x, y) << shift
+    cells = (first, first + (1 << shift) - 1)
+
+    rows = [(pk, LAYER_LOCATION, 0, lat, lng) for pk, _, lat, lng in _layer(Location, '', cells, z)]
+    rows += [
+        (pk, LAYER_MARKER, MARKER_TYPE_CODES.get(marker_type, 0), lat, lng)
+        for pk, marker_type, lat, lng in _layer(MapMarker, 'location__', cells, z, 'marker_type')
+    ]
+    rows += [(pk, LAYER_POI, 0, lat, lng) for pk, _, lat, lng in _layer(POI, 'location__', cells, z)]
+    return HEADER.pack(TILE_MAGIC, z, x, y, len(rows)) + b''.join(
+        RECORD.pack(pk, layer, type_code, *_position(lat, lng, z, x, y))
+        for pk, layer, type_code, lat, lng in rows
+    )
+
+
+def read_tile(data):
+    """Odwrotność build_tile: (z, x, y, [(id, warstwa, typ, px, py)])."""
+    magic, z, x, y, count = HEADER.unpack_from(data)
+    if magic != TILE_MAGIC:
+        raise ValueError('Not a map tile')
+    return z, x, y, list(RECORD.iter_unpack(data[HEADER.size:HEADER.size + count * RECORD.size]))
+
+
+class TileCache:
+    """
+    Kafelki na dysku: MAP_TILE_CACHE_DIR/<generacja>/z/x/y.bin (niepuste,
+    z <= MAX_DISK_ZOOM), ostatnio czytane także w pamięci procesu.
+    Generacja to id ostatniego MapUpdate — nowy wpis zmienia ETag
+    wszystkich kafelków, a stare katalogi są usuwane po commicie. Inne
+    procesy widzą nową generację po GENERATION_TTL; katalog starej
+    generacji odtworzony w tym czasie usunie następne unieważnienie.
+    """
+    # {ścieżka: bajty} tego procesu, LRU; wspólne dla wątków, więc pod blokadą
+    _memory = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def generation():
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            generation = MapUpdate.objects.aggregate(last=Max('pk'))['last'] or 0
+            cache.set(GENERATION_KEY, generation, GENERATION_TTL)
+        return generation
+
+    @staticmethod
+    def etag(generation, z, x, y):
+        return f'"{generation}-{z}-{x}-{y}"'
+
+    @staticmethod
+    def path(generation, z, x, y):
+        return Path(settings.MAP_TILE_CACHE_DIR) / str(generation) / str(z) / str(x) / f'{y}.bin'
+
+    @classmethod
+    def get(cls, z, x, y, generation=None):
+        """Zawartość kafelka: z pamięci, z dysku albo zbudowana z bazy."""
+        generation = cls.generation() if generation is None else generation
+        path = cls.path(generation, z, x, y)
+        with cls._lock:
+            data = cls._memory.get(path)
+            if data is not None:
+                cls._memory.move_to_end(path)
+                return data
+
+        # Odczyt, budowa i zapis bez blokady — nie wstrzymują odczytu innych kafelków
+        data = None
+        if z <= MAX_DISK_ZOOM:
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                pass
+        if data is None:
+            data = build_tile(z, x, y)
+            if z <= MAX_DISK_ZOOM and len(data) > HEADER.size:
+                cls._write(path, data)
+        with cls._lock:
+            cls._memory[path] = data
+            cls._memory.move_to_end(path)
+            while len(cls._memory) > MAX_MEMORY_TILES:
+                cls._memory.popitem(last=False)
+        return data
+
+    @staticmethod
+    def _write(path, data):
+        # Plik tymczasowy + os.replace: równoległy odczyt widzi cały kafelek albo żaden
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def invalidate(cls):
+        cache.delete(GENERATION_KEY)
+        transaction.on_commit(cls._purge)
+
+    @classmethod
+    def _purge(cls):
+        cache.delete(GENERATION_KEY)
+        current = str(cls.generation())
+        root = Path(settings.MAP_TILE_CACHE_DIR)
+        if root.is_dir():
+            for entry in root.iterdir():
+                if entry.name != current:
+                    shutil.rmtree(entry, ignore_errors=True)
@@ -11,6 +11,7 @@ from .views import (
     MapDownloadViewSet,
     UserInteractionViewSet,
     MapTooltipViewSet,
+    MapTileAPIView,
 )
 
 router = DefaultRouter()
@@ -26,5 +27,6 @@ router.register(r'user-interactions', UserInteractionViewSet)
 router.register(r'map-tooltips', MapTooltipViewSet)
 
 urlpatterns = [
+    path('map-tiles/<int:z>/<int:x>/<int:y>', MapTileAPIView.as_view(), name='map-tile'),
     path('', include(router.urls)),
 ]
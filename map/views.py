@@ -1,4 +1,14 @@
-from rest_framework import viewsets
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from dreambook.geo import GeoFilterMixin, parse_bbox
+from dreambook.streaming import StreamingListMixin
+from .clustering import MARKER_ZOOM, ClusterPyramid, cluster_level, markers_in_bbox
 from .models import (
     Location,
     MapMarker,
@@ -23,43 +33,87 @@ from .serializers import (
     UserInteractionSerializer,
     MapTooltipSerializer,
 )
+from .tiles import MAX_TILE_ZOOM, TILE_CONTENT_TYPE, TileCache
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(GeoFilterMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
 
-class MapMarkerViewSet(viewsets.ModelViewSet):
+class MapMarkerViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = MapMarker.objects.all()
     serializer_class = MapMarkerSerializer
 
-class POIViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """
+        ?bbox=west,south,east,north&zoom=z — klastry znaczników w widoku mapy
+        (liczba, środek ciężkości, typy). Od zoomu MARKER_ZOOM pojedyncze znaczniki,
+        najwyżej MAX_MARKERS (truncated=True, gdy w widoku jest ich więcej).
+        """
+        if not request.query_params.get('bbox'):
+            raise ValidationError({'bbox': 'This parameter is required'})
+        south, west, north, east = parse_bbox(request.query_params['bbox'])
+        try:
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            zoom = -1
+        if not 0 <= zoom <= 22:
+            raise ValidationError({'zoom': 'Expected an integer between 0 and 22'})
+
+        if zoom >= MARKER_ZOOM:
+            markers, truncated = markers_in_bbox(south, west, north, east)
+            return Response({'zoom': zoom, 'markers': markers, 'truncated': truncated})
+        clusters = ClusterPyramid.clusters(cluster_level(zoom), south, west, north, east)
+        if clusters is None:
+            raise ValidationError({'bbox': 'Bounding box too large for this zoom level'})
+        return Response({'zoom': zoom, 'clusters': clusters})
+
+class POIViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = POI.objects.all()
     serializer_class = POISerializer
 
-class MapAnnotationViewSet(viewsets.ModelViewSet):
+class MapAnnotationViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = MapAnnotation.objects.all()
     serializer_class = MapAnnotationSerializer
 
-class MapBookmarkViewSet(viewsets.ModelViewSet):
+class MapBookmarkViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = MapBookmark.objects.all()
     serializer_class = MapBookmarkSerializer
 
-class MapLegendViewSet(viewsets.ModelViewSet):
+class MapLegendViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = MapLegend.objects.all()
     serializer_class = MapLegendSerializer
 
-class MapUpdateViewSet(viewsets.ModelViewSet):
+class MapUpdateViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = MapUpdate.objects.all()
     serializer_class = MapUpdateSerializer
 
-class MapDownloadViewSet(viewsets.ModelViewSet):
+class MapDownloadViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = MapDownload.objects.all()
     serializer_class = MapDownloadSerializer
 
-class UserInteractionViewSet(viewsets.ModelViewSet):
+class UserInteractionViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = UserInteraction.objects.all()
     serializer_class = UserInteractionSerializer
 
-class MapTooltipViewSet(viewsets.ModelViewSet):
+class MapTooltipViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = MapTooltip.objects.all()
     serializer_class = MapTooltipSerializer
+
+class MapTileAPIView(APIView):
+    """
+    GET /api/map-tiles/{z}/{x}/{y} — binarny kafelek (map.tiles.build_tile)
+    z ETag; przy zgodnym If-None-Match 304 bez sięgania do dysku i bazy.
+    """
+
+    def get(self, request, z, x, y):
+        if z > MAX_TILE_ZOOM or x >= 1 << z or y >= 1 << z:
+            return Response({'error': 'Tile out of range'}, status=status.HTTP_404_NOT_FOUND)
+        generation = TileCache.generation()
+        etag = TileCache.etag(generation, z, x, y)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(TileCache.get(z, x, y, generation), content_type=TILE_CONTENT_TYPE)
+            response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.MAP_TILE_MAX_AGE)
+        return response
@@ -0,0 +1,85 @@
+import uuid
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import transaction
+
+CACHE_TIMEOUT = 60 * 60  # s
+
+
+class IntervalSet:
+    """
+    Potwierdzone pobyty jednej nieruchomości jako posortowane początki
+    (ordinale dat) i bieżące maksimum końców. Pytanie "czy [start, end)
+    na coś nachodzi" to jedno wyszukiwanie binarne — O(log n).
+    """
+    __slots__ = ('starts', 'max_ends')
+
+    def __init__(self, intervals):
+        self.starts = []
+        self.max_ends = []
+        running = None
+        for start, end in sorted(intervals):
+            running = end if running is None else max(running, end)
+            self.starts.append(start)
+            self.max_ends.append(running)
+
+    def overlaps(self, start, end):
+        # Kandydaci: pobyty zaczynające się przed `end`. Wśród nich wystarczy
+        # największy koniec — jeśli wypada po `start`, jest kolizja.
+        idx = bisect_left(self.starts, end)
+        return idx > 0 and self.max_ends[idx - 1] > start
+
+    def __getstate__(self):
+        return self.starts, self.max_ends
+
+    def __setstate__(self, state):
+        self.starts, self.max_ends = state
+
+
+class AvailabilityIndex:
+    """
+    Cache IntervalSet per nieruchomość. Klucz danych zawiera losową
+    "wersję"; unieważnienie podmienia wersję, więc wpis zbudowany przez
+    równoległe zapytanie z danych sprzed zmiany nigdy nie zostanie już
+    odczytany. W środowisku wieloprocesowym CACHES musi wskazywać na
+    wspólny backend (np. Redis / Memcached).
+    """
+
+    @staticmethod
+    def _version_key(property_id):
+        return f'availability:{property_id}:version'
+
+    @classmethod
+    def _current_version(cls, property_id):
+        key = cls._version_key(property_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        return version
+
+    @classmethod
+    def intervals(cls, property_id):
+        from .models import Reservation
+
+        data_key = f'availability:{property_id}:{cls._current_version(property_id)}'
+        interval_set = cache.get(data_key)
+        if interval_set is None:
+            rows = Reservation.objects.filter(
+                property_id=property_id, status='confirmed'
+            ).values_list('start_date', 'end_date')
+            interval_set = IntervalSet((s.toordinal(), e.toordinal()) for s, e in rows)
+            cache.set(data_key, interval_set, CACHE_TIMEOUT)
+        return interval_set
+
+    @classmethod
+    def is_available(cls, property_id, start_date, end_date):
+        return not cls.intervals(property_id).overlaps(start_date.toordinal(), end_date.toordinal())
+
+    @classmethod
+    def invalidate(cls, property_id):
+        cache.set(cls._version_key(property_id), uuid.uuid4().hex, None)
+        # Drugi raz po commicie: odczyt, który wpadł między zapisem a commitem,
+        # mógł zbudować wpis ze starych danych
+        transaction.on_commit(lambda: cache.set(cls._version_key(property_id), uuid.uuid4().hex, None))
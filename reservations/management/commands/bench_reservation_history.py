@@ -0,0 +1,139 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from dreambook.read_serializers import ValuesSerializer
+from reservations.models import Property, Reservation
+from reservations.serializers import ReservationSerializer
+from reservations.services import ReservationHistoryService
+
+User = get_user_model()
+HISTORY_INDEXES = ('reservation_user_history_idx', 'reservation_prop_history_idx')
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the reservation history of a busy property with and without the '
+            '(property, created_at, id) index: first page, a deep keyset page and the same '
+            'depth with OFFSET. All generated rows are rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--properties', type=int, default=1000)
+        parser.add_argument('--busy-share', type=float, default=0.05,
+                            help='Fraction of all reservations that belong to the busy property')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--depth', type=int, default=10_000, help='Row offset of the deep page')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        with transaction.atomic():
+            busy = self.fill(options)
+            self.stdout.write(f'{"query":<28} {"no index":>10} {"indexed":>10} {"speedup":>8}')
+
+            self.drop_indexes()
+            before = self.measure(busy, options)
+            self.create_indexes()
+            after = self.measure(busy, options)
+            for name in before:
+                self.stdout.write(f'{name:<28} {before[name]:>8.2f}ms {after[name]:>8.2f}ms '
+                                  f'{before[name] / max(after[name], 1e-6):>7.1f}x')
+            transaction.set_rollback(True)
+
+    def fill(self, options, batch_size=10_000):
+        rows = options['rows']
+        self.stdout.write(f'Creating {rows} reservations...')
+        users = User.objects.bulk_create([
+            User(username=f'bench-history-{i}', email=f'bench-history-{i}@example.com') for i in range(1000)
+        ])
+        properties = Property.objects.bulk_create([
+            Property(title=f'Bench {i}', address='Warszawa', price=100) for i in range(options['properties'])
+        ])
+        busy = properties[0]
+
+        # auto_now_add nadpisałby rozrzucone w czasie created_at
+        created_at = Reservation._meta.get_field('created_at')
+        created_at.auto_now_add = False
+        try:
+            self.insert_reservations(rows, users, properties, busy, options['busy_share'], batch_size)
+        finally:
+            created_at.auto_now_add = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(Reservation._meta.db_table)}')
+        return busy
+
+    def insert_reservations(self, rows, users, properties, busy, busy_share, batch_size):
+        now = timezone.now()
+        start = date(2024, 1, 1)
+        created = 0
+        while created < rows:
+            batch = min(batch_size, rows - created)
+            Reservation.objects.bulk_create([
+                Reservation(
+                    user=random.choice(users),
+                    property=busy if random.random() < busy_share else random.choice(properties),
+                    start_date=start + timedelta(days=random.randrange(700)),
+                    end_date=start + timedelta(days=random.randrange(700) + 3),
+                    status=random.choice(['pending', 'confirmed', 'completed', 'cancelled']),
+                    created_at=now - timedelta(seconds=random.randrange(2 * 365 * 24 * 3600)),
+                )
+                for _ in range(batch)
+            ], batch_size=1000)
+            created += batch
+
+    def measure(self, busy, options):
+        page_size, depth = options['page_size'], options['depth']
+        reader = ValuesSerializer.for_serializer(ReservationSerializer)
+        history = ReservationHistoryService.get_property_reservation_history(busy.pk)
+        anchor = history.values('created_at', 'id')[depth:depth + 1].first()
+        seek = history.filter(Q(created_at__lt=anchor['created_at'])
+                              | Q(created_at=anchor['created_at'], id__lt=anchor['id']))
+        projected = reader.only(['id', 'status', 'start_date', 'end_date'])
+        return {
+            'first page': self.timed(lambda: reader.serialize(history[:page_size + 1]), options['repeat']),
+            f'keyset page @{depth}': self.timed(lambda: reader.serialize(seek[:page_size + 1]), options['repeat']),
+            f'offset page @{depth}': self.timed(
+                lambda: reader.serialize(history[depth:depth + page_size + 1]), options['repeat']),
+            'first page, ?fields=4': self.timed(
+                lambda: projected.serialize(history[:page_size + 1]), options['repeat']),
+        }
+
+    def timed(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def existing_index_names(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, Reservation._meta.db_table))
+
+    # Surowe DDL — SQLite nie otworzy schema editora wewnątrz transakcji
+    def drop_indexes(self):
+        existing = self.existing_index_names()
+        editor = connection.schema_editor()
+        table = connection.ops.quote_name(Reservation._meta.db_table)
+        with connection.cursor() as cursor:
+            for name in HISTORY_INDEXES:
+                if name in existing:
+                    cursor.execute(editor.sql_delete_index % {
+                        'table': table, 'name': connection.ops.quote_name(name),
+                    })
+
+    def create_indexes(self):
+        existing = self.existing_index_names()
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for index in Reservation._meta.indexes:
+                if index.name in HISTORY_INDEXES and index.name not in existing:
+                    cursor.execute(str(index.create_sql(Reservation, editor)))
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(Reservation._meta.db_table)}')
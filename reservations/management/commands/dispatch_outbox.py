@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservations.models import EmailOutbox
+from reservations.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = ('Sends queued emails from the outbox over a pool of SMTP connections, with '
+            'exponential backoff on failure and a per-domain concurrency limit.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4, help='Parallel SMTP connections')
+        parser.add_argument('--per-domain', type=int, default=2,
+                            help='Max concurrent deliveries to one recipient domain')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(workers=options['workers'], per_domain=options['per_domain'])
+        while True:
+            started = time.perf_counter()
+            sent = dispatcher.drain(options['batch_size'])
+            elapsed = time.perf_counter() - started
+            if sent:
+                self.stdout.write(f'emails sent: {sent} in {elapsed:.2f}s ({sent / elapsed:.0f}/s)')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        pending = EmailOutbox.objects.filter(status='pending').count()
+        failed = EmailOutbox.objects.filter(status='failed').count()
+        self.stdout.write(f'pending: {pending}, failed: {failed}')
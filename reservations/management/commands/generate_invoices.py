@@ -0,0 +1,28 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from reservations.services import InvoiceService
+
+
+class Command(BaseCommand):
+    help = ('Creates invoices for all completed reservations that do not have one yet, in chunks. '
+            'Safe to re-run after a crash: it picks up where it stopped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--until', type=date.fromisoformat, default=None,
+                            help='Only stays that ended on or before this day (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        for created in InvoiceService.generate_invoices(options['chunk_size'], options['until']):
+            total += created
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'invoiced: {total} ({total / elapsed:.0f} rows/s)')
+
+        elapsed = time.perf_counter() - started
+        rate = f' ({total / elapsed:.0f} rows/s)' if total else ''
+        self.stdout.write(self.style.SUCCESS(f'invoices created: {total} in {elapsed:.2f}s{rate}'))
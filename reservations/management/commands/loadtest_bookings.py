@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from reservations.models import Property, Reservation
+from reservations.serializers import ReservationSerializer
+from reservations.services import BookingConflictError, BookingService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Fires concurrent confirmed bookings at a single property through BookingService, '
+            'then checks that no two confirmed stays overlap and reports latency percentiles.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--days', type=int, default=60, help='Width of the contested date window')
+        parser.add_argument('--keep', action='store_true', help='Do not delete the generated data')
+
+    def handle(self, *args, **options):
+        random.seed(7)
+        user = User.objects.create_user(username=f'loadtest-{time.time_ns()}', email=f'{time.time_ns()}@loadtest')
+        prop = Property.objects.create(title='Load test', address='-', price=100)
+        base = date(2030, 1, 1)
+        requests = []
+        for _ in range(options['bookings']):
+            start = base + timedelta(days=random.randrange(options['days']))
+            requests.append((start, start + timedelta(days=random.randint(1, 5))))
+
+        def book(stay):
+            start_date, end_date = stay
+            serializer = ReservationSerializer(data={
+                'user': user.pk, 'property': prop.pk, 'status': 'confirmed',
+                'start_date': start_date, 'end_date': end_date,
+            })
+            serializer.is_valid(raise_exception=True)
+            began = time.perf_counter()
+            try:
+                BookingService.save(serializer)
+                outcome = 'created'
+            except BookingConflictError:
+                outcome = 'conflict'
+            except OperationalError:
+                outcome = 'error'
+            finally:
+                connection.close()
+            return outcome, (time.perf_counter() - began) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(book, requests))
+        elapsed = time.perf_counter() - started
+
+        try:
+            overlaps = self.count_overlaps(prop)
+            self.report(results, elapsed, overlaps)
+        finally:
+            if not options['keep']:
+                prop.delete()
+                user.delete()
+
+        if overlaps:
+            raise CommandError(f'{overlaps} overlapping confirmed reservations found')
+
+    def count_overlaps(self, prop):
+        stays = Reservation.objects.filter(property=prop, status='confirmed').order_by('start_date')
+        overlaps = 0
+        latest_end = None
+        for start_date, end_date in stays.values_list('start_date', 'end_date'):
+            if latest_end is not None and start_date < latest_end:
+                overlaps += 1
+            latest_end = end_date if latest_end is None else max(latest_end, end_date)
+        return overlaps
+
+    def report(self, results, elapsed, overlaps):
+        latencies = sorted(latency for _, latency in results)
+        outcomes = [outcome for outcome, _ in results]
+        percentiles = statistics.quantiles(latencies, n=100)
+
+        self.stdout.write(f'bookings: {len(results)} in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s)')
+        self.stdout.write(f'created: {outcomes.count("created")}, conflicts: {outcomes.count("conflict")}, '
+                          f'errors: {outcomes.count("error")}')
+        self.stdout.write(f'latency p50: {percentiles[49]:.1f}ms, p95: {percentiles[94]:.1f}ms, '
+                          f'p99: {percentiles[98]:.1f}ms, max: {latencies[-1]:.1f}ms')
+        style = self.style.SUCCESS if not overlaps else self.style.ERROR
+        self.stdout.write(style(f'overlapping confirmed stays: {overlaps}'))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservations.revenue import RevenueRollup
+
+
+class Command(BaseCommand):
+    help = ('Adds invoices not yet counted, including late-committed ones, to the daily RevenueReport '
+            'buckets and recomputes the affected week, month and quarter rollups.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop all buckets and recompute from scratch')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days = RevenueRollup.rebuild() if options['rebuild'] else RevenueRollup.refresh()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'revenue rollups: {days} property-days updated in {elapsed:.2f}s'))
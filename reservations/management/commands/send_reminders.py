@@ -0,0 +1,67 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from reservations.services import ReminderScheduler
+
+
+def drain(batch_size, attempts=5, delay=0.5):
+    """
+    Wysyła paczki, dopóki są zaległe przypomnienia. Zwraca liczbę wysłanych.
+    Zablokowana baza to najwyżej attempts prób paczki z rosnącą przerwą;
+    ostatni błąd idzie dalej, zamiast kręcić się w pętli.
+    """
+    total = 0
+    try:
+        while True:
+            for attempt in range(attempts):
+                try:
+                    claimed, sent = ReminderScheduler.send_batch(batch_size)
+                    break
+                except OperationalError:
+                    # SQLite: inny worker trzyma blokadę zapisu dłużej niż timeout
+                    if attempt == attempts - 1:
+                        raise
+                    time.sleep(delay * 2 ** attempt)
+            total += sent
+            if claimed < batch_size or sent == 0:
+                return total
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Sends due reservation reminders in batches. Several worker processes can run side by '
+            'side: each batch is leased in a short SELECT ... FOR UPDATE SKIP LOCKED transaction '
+            'and sent outside of it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new due reminders')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_once(options['batch_size'], options['processes'])
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def run_once(self, batch_size, processes):
+        started = time.perf_counter()
+        if processes > 1:
+            # Dzieci nie mogą dzielić połączenia z rodzicem — każde otwiera własne
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                sent = sum(pool.map(drain, [batch_size] * processes))
+        else:
+            sent = drain(batch_size)
+        elapsed = time.perf_counter() - started
+
+        if sent:
+            self.stdout.write(f'reminders sent: {sent} in {elapsed:.2f}s ({sent / elapsed:.0f}/s)')
+        else:
+            self.stdout.write('no due reminders')
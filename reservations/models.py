@@ -39,6 +39,16 @@ class Reservation(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # AvailabilityChecker: property_id = ? AND status = ? AND start_date < ? AND end_date > ?
+            models.Index(fields=['property', 'status', 'start_date', 'end_date'],
+                         name='reservation_availability_idx'),
+            # Historia: user_id / property_id = ? ORDER BY created_at DESC, id DESC (+ kursor)
+            models.Index(fields=['user', 'created_at', 'id'], name='reservation_user_history_idx'),
+            models.Index(fields=['property', 'created_at', 'id'], name='reservation_prop_history_idx'),
+        ]
+
 class ReservationDiscount(models.Model):
     reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE)
     offer = models.ForeignKey(SpecialOffer, on_delete=models.CASCADE)
@@ -48,6 +58,13 @@ class ReservationInvoice(models.Model):
     reservation = models.OneToOneField(Reservation, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=8, decimal_places=2)
     issued_at = models.DateTimeField(auto_now_add=True)
+    # Kiedy faktura została wliczona w RevenueReport (revenue.RevenueRollup); NULL = jeszcze nie
+    rolled_up_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rolled_up_at', 'issued_at'], name='invoice_rollup_idx'),
+        ]
 
 class ReservationPayment(models.Model):
     reservation = models.OneToOneField(Reservation, on_delete=models.CASCADE)
@@ -64,6 +81,40 @@ class ReservationReminder(models.Model):
     reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE)
     remind_at = models.DateTimeField()
     sent = models.BooleanField(default=False)
+    # Nieudane wysyłki; po ReminderScheduler.MAX_ATTEMPTS przypomnienie jest pomijane
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # ReminderScheduler: sent = false AND remind_at <= now ORDER BY remind_at
+            models.Index(fields=['sent', 'remind_at'], name='reminder_due_idx'),
+        ]
+
+class EmailOutbox(models.Model):
+    """Mail zapisany w tej samej transakcji co zmiana; wysyła go dispatch_outbox."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, null=True, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to_email = models.EmailField()
+    domain = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # OutboxDispatcher: status = 'pending' AND next_attempt_at <= now ORDER BY next_attempt_at
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
 
 class ReservationExtension(models.Model):
     reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE)
@@ -89,12 +140,39 @@ class ReservationOccupancy(models.Model):
     date = models.DateField()
     occupancy_count = models.PositiveIntegerField()
 
+    class Meta:
+        constraints = [
+            # OccupancyMaintainer wstawia wiersze z ON CONFLICT DO NOTHING
+            models.UniqueConstraint(fields=['property', 'date'], name='occupancy_property_date_uniq'),
+        ]
+
 class RevenueReport(models.Model):
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+        ('quarter', 'Quarter'),
+    ]
     property = models.ForeignKey(Property, on_delete=models.CASCADE)
+    period = models.CharField(max_length=7, choices=PERIOD_CHOICES, default='day')
     period_start = models.DateField()
-    period_end = models.DateField()
+    period_end = models.DateField()  # włącznie
     total_revenue = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'period', 'period_start'], name='revenue_bucket_uniq'),
+        ]
+        indexes = [
+            # revenue_summary dla całego portfela: period = ? AND period_start IN (...)
+            models.Index(fields=['period', 'period_start'], name='revenue_period_idx'),
+        ]
+
+class RollupWatermark(models.Model):
+    """Wiersz blokady odświeżania rollupu i moment ostatniego odświeżenia."""
+    name = models.CharField(max_length=50, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+
 class UserActivity(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     activity = models.CharField(max_length=200)
@@ -0,0 +1,130 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Reservation, ReservationOccupancy
+
+logger = logging.getLogger(__name__)
+
+# Statusy, które zajmują noce w kalendarzu
+OCCUPYING_STATUSES = ('confirmed', 'completed')
+
+
+def nights(start_date, end_date):
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days)]
+
+
+def stay_deltas(before, after):
+    """
+    Zmiana obłożenia między dwoma stanami rezerwacji. Stan to krotka
+    (property_id, status, start_date, end_date) albo None (brak rezerwacji).
+    Zwraca {(property_id, date): delta} bez zerowych wpisów.
+    """
+    deltas = defaultdict(int)
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        property_id, status, start_date, end_date = state
+        if status in OCCUPYING_STATUSES:
+            for night in nights(start_date, end_date):
+                deltas[property_id, night] += sign
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+class OccupancyMaintainer:
+    @staticmethod
+    def apply(deltas):
+        """
+        Nanosi delty na ReservationOccupancy: brakujące wiersze są wstawiane
+        z zerem (INSERT ... ON CONFLICT DO NOTHING), a potem licznik zmieniany
+        atomowym UPDATE — jedno zapytanie na (nieruchomość, wartość delty).
+        Zmniejszenie poniżej zera (dzień, którego nikt nie policzył — np.
+        rezerwacja sprzed wdrożenia) to rozjazd z danymi: licznik zostaje na
+        zero, a takie dni są logowane i zwracane (liczba), żeby nie zginęły;
+        drift() je wykaże, rebuild() naprawi.
+        """
+        if not deltas:
+            return 0
+        grouped = defaultdict(list)
+        for (property_id, night), delta in deltas.items():
+            grouped[property_id, delta].append(night)
+
+        with transaction.atomic():
+            ReservationOccupancy.objects.bulk_create([
+                ReservationOccupancy(property_id=property_id, date=night, occupancy_count=0)
+                for (property_id, delta), dates in grouped.items() if delta > 0
+                for night in dates
+            ], ignore_conflicts=True)
+            clamped = 0
+            for (property_id, delta), dates in grouped.items():
+                rows = ReservationOccupancy.objects.filter(property_id=property_id, date__in=dates)
+                updated = rows.filter(occupancy_count__gte=-delta).update(
+                    occupancy_count=F('occupancy_count') + delta)
+                if updated < len(dates):
+                    # Dodatkowe zapytania tylko przy rozjeździe
+                    rows.filter(occupancy_count__lt=-delta).update(occupancy_count=0)
+                    clamped += len(dates) - updated
+                    logger.warning('occupancy drift: property %s, %d of %d days would drop below zero '
+                                   '(delta %d), run rebuild_occupancy', property_id, len(dates) - updated,
+                                   len(dates), delta)
+        return clamped
+
+    @staticmethod
+    def counts(start_date, days=365):
+        """
+        Obłożenie w [start_date, start_date + days) policzone od zera: jedno
+        zapytanie o rezerwacje, tablica różnic per nieruchomość (+1 w dniu
+        przyjazdu, -1 w dniu wyjazdu) i suma prefiksowa. {(property_id, date): liczba}
+        bez zer.
+        """
+        end_date = start_date + timedelta(days=days)
+        stays = Reservation.objects.filter(
+            status__in=OCCUPYING_STATUSES, start_date__lt=end_date, end_date__gt=start_date,
+        ).values_list('property_id', 'start_date', 'end_date')
+
+        diffs = defaultdict(lambda: [0] * (days + 1))
+        for property_id, arrive, leave in stays.iterator(chunk_size=5000):
+            diff = diffs[property_id]
+            diff[max((arrive - start_date).days, 0)] += 1
+            diff[min((leave - start_date).days, days)] -= 1
+
+        return {
+            (property_id, start_date + timedelta(days=i)): count
+            for property_id, diff in diffs.items()
+            for i, count in enumerate(accumulate(diff[:days]))
+            if count
+        }
+
+    @classmethod
+    def drift(cls, start_date, days=365):
+        """[(property_id, date, zapisane, faktyczne)] dla dni, których licznik się rozjechał."""
+        end_date = start_date + timedelta(days=days)
+        stored = {
+            (property_id, night): count
+            for property_id, night, count in ReservationOccupancy.objects.filter(
+                date__gte=start_date, date__lt=end_date).values_list('property_id', 'date', 'occupancy_count')
+            if count
+        }
+        actual = cls.counts(start_date, days)
+        return sorted(
+            (property_id, night, stored.get((property_id, night), 0), actual.get((property_id, night), 0))
+            for property_id, night in stored.keys() | actual.keys()
+            if stored.get((property_id, night), 0) != actual.get((property_id, night), 0)
+        )
+
+    @classmethod
+    def rebuild(cls, start_date, days=365):
+        """Zastępuje obłożenie w [start_date, start_date + days) wynikiem counts(). Zwraca liczbę wierszy."""
+        end_date = start_date + timedelta(days=days)
+        rows = [
+            ReservationOccupancy(property_id=property_id, date=night, occupancy_count=count)
+            for (property_id, night), count in cls.counts(start_date, days).items()
+        ]
+        with transaction.atomic():
+            ReservationOccupancy.objects.filter(date__gte=start_date, date__lt=end_date).delete()
+            ReservationOccupancy.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
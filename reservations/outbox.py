@@ -0,0 +1,154 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from queue import LifoQueue
+from smtplib import SMTPException
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox, ReservationNotification
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 30  # s; kolejne próby po 30 s, 1 min, 2 min, ...
+BACKOFF_MAX = 60 * 60  # s
+LEASE = 5 * 60  # s; po tym czasie wiersz zajęty przez martwy dispatcher wraca do kolejki
+
+
+def enqueue(to_email, subject, body, from_email='no-reply@example.com', reservation=None):
+    """Dopisuje mail do outboxa. Wołane w transakcji zapytania — nic nie wysyła."""
+    return EmailOutbox.objects.create(
+        reservation=reservation, subject=subject, body=body, from_email=from_email,
+        to_email=to_email, domain=to_email.rpartition('@')[2].lower(),
+    )
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX))
+
+
+class ConnectionPool:
+    """
+    Otwarte połączenia SMTP współdzielone przez wątki dispatchera — jedno
+    logowanie na połączenie zamiast na każdy mail.
+    """
+
+    def __init__(self, size):
+        self.idle = LifoQueue()
+        self.connections = [get_connection() for _ in range(size)]
+        for connection in self.connections:
+            self.idle.put(connection)
+
+    def acquire(self):
+        connection = self.idle.get()
+        try:
+            connection.open()  # no-op, jeśli już otwarte
+        except Exception:
+            self.idle.put(connection)
+            raise
+        return connection
+
+    def release(self, connection, broken=False):
+        if broken:
+            # Po błędzie SMTP połączenie może być w nieznanym stanie — acquire() otworzy je od nowa
+            connection.close()
+        self.idle.put(connection)
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+
+
+class OutboxDispatcher:
+    """
+    Wysyła maile z outboxa. Paczka jest zajmowana krótką transakcją
+    (przesunięcie next_attempt_at o LEASE), więc wysyłka nie trzyma blokady
+    bazy, a kilka dispatcherów nie weźmie tych samych wierszy.
+    """
+
+    def __init__(self, workers=4, per_domain=2):
+        self.workers = workers
+        self.per_domain = per_domain
+        self.domain_slots = {}
+
+    def _slot(self, domain):
+        if domain not in self.domain_slots:
+            self.domain_slots[domain] = threading.BoundedSemaphore(self.per_domain)
+        return self.domain_slots[domain]
+
+    def claim(self, batch_size):
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                EmailOutbox.objects
+                .select_for_update(skip_locked=True)
+                .filter(status='pending', next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:batch_size]
+            )
+            EmailOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                next_attempt_at=now + timedelta(seconds=LEASE))
+        return rows
+
+    def _send(self, pool, row):
+        with self._slot(row.domain):
+            try:
+                connection = pool.acquire()
+            except (SMTPException, OSError) as exc:
+                return row, str(exc) or type(exc).__name__
+            try:
+                EmailMessage(row.subject, row.body, row.from_email, [row.to_email],
+                             connection=connection).send()
+            except (SMTPException, OSError) as exc:
+                pool.release(connection, broken=True)
+                return row, str(exc) or type(exc).__name__
+            pool.release(connection)
+            return row, None
+
+    def dispatch_batch(self, batch_size=100):
+        """Wysyła jedną paczkę. Zwraca (zajęte, wysłane)."""
+        rows = self.claim(batch_size)
+        if not rows:
+            return 0, 0
+
+        # Dla każdej domeny osobny semafor — najwyżej per_domain równoległych wysyłek
+        for row in rows:
+            self._slot(row.domain)
+        pool = ConnectionPool(self.workers)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(lambda row: self._send(pool, row), rows))
+        finally:
+            pool.close()
+
+        now = timezone.now()
+        sent = []
+        for row, error in results:
+            row.attempts += 1
+            if error is None:
+                row.status, row.sent_at, row.last_error = 'sent', now, ''
+                sent.append(row)
+            else:
+                row.last_error = error
+                if row.attempts >= MAX_ATTEMPTS:
+                    row.status = 'failed'
+                else:
+                    row.next_attempt_at = now + backoff(row.attempts)
+
+        with transaction.atomic():
+            EmailOutbox.objects.bulk_update(
+                rows, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+            ReservationNotification.objects.bulk_create([
+                ReservationNotification(reservation_id=row.reservation_id, message=row.body)
+                for row in sent if row.reservation_id
+            ])
+        return len(rows), len(sent)
+
+    def drain(self, batch_size=100):
+        """Wysyła, dopóki są wiadomości do wysłania teraz. Zwraca liczbę wysłanych."""
+        total = 0
+        while True:
+            claimed, sent = self.dispatch_batch(batch_size)
+            total += sent
+            if claimed < batch_size or sent == 0:
+                return total
@@ -0,0 +1,123 @@
+import uuid
+from array import array
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Property, SpecialOffer
+
+CACHE_TIMEOUT = 24 * 60 * 60  # s
+# Najdłuższy wyceniany pobyt — ogranicza liczbę budowanych rocznych cenników
+MAX_NIGHTS = 366
+
+
+def _year_days(year):
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def build_calendar(year, price, offers):
+    """
+    Ceny nocy w danym roku, w groszach, jako array('q') — 8 bajtów na noc.
+    offers: [(start_date, end_date, discount_percent)], end_date włącznie;
+    nakładające się oferty są składane jedna po drugiej.
+    """
+    year_start = date(year, 1, 1)
+    days = _year_days(year)
+    factors = [Decimal(1)] * days
+    for start_date, end_date, percent in offers:
+        factor = 1 - Decimal(percent) / 100
+        for i in range(max((start_date - year_start).days, 0), min((end_date - year_start).days + 1, days)):
+            factors[i] *= factor
+    base = Decimal(price) * 100
+    return array('q', (int((base * f).quantize(Decimal(1), rounding=ROUND_HALF_UP)) for f in factors))
+
+
+class PricingEngine:
+    """
+    Cennik nocy per nieruchomość i rok trzymany w cache. Wycena pobytu to
+    suma wycinka tablicy — O(liczba nocy), bez zapytań do bazy, gdy cennik
+    jest w cache. Wersjonowanie kluczy jak w AvailabilityIndex.
+    """
+
+    @staticmethod
+    def _version_key(property_id):
+        return f'prices:{property_id}:version'
+
+    @classmethod
+    def _versions(cls, property_ids):
+        keys = {cls._version_key(pid): pid for pid in property_ids}
+        found = cache.get_many(keys)
+        for key in keys.keys() - found.keys():
+            cache.add(key, uuid.uuid4().hex, None)
+            found[key] = cache.get(key)
+        return {keys[key]: version for key, version in found.items()}
+
+    @classmethod
+    def calendars(cls, property_ids, years):
+        """{(property_id, year): array cen w groszach}; brakujące budowane dwoma zapytaniami."""
+        versions = cls._versions(property_ids)
+        keys = {f'prices:{pid}:{year}:{versions[pid]}': (pid, year) for pid in property_ids for year in years}
+        found = cache.get_many(keys)
+        result = {keys[key]: calendar for key, calendar in found.items()}
+
+        missing = [keys[key] for key in keys.keys() - found.keys()]
+        if missing:
+            missing_ids = {pid for pid, _ in missing}
+            prices = dict(Property.objects.filter(pk__in=missing_ids).values_list('pk', 'price'))
+            offers = defaultdict(list)
+            for pid, *offer in SpecialOffer.objects.filter(
+                property_id__in=missing_ids,
+                start_date__lte=date(max(years), 12, 31), end_date__gte=date(min(years), 1, 1),
+            ).values_list('property_id', 'start_date', 'end_date', 'discount_percent'):
+                offers[pid].append(offer)
+
+            built = {}
+            for pid, year in missing:
+                if pid in prices:
+                    result[pid, year] = built[f'prices:{pid}:{year}:{versions[pid]}'] = build_calendar(
+                        year, prices[pid], offers[pid])
+            cache.set_many(built, CACHE_TIMEOUT)
+        return result
+
+    @classmethod
+    def quote_many(cls, property_ids, start_date, end_date):
+        """
+        Cena pobytu [start_date, end_date) dla wielu nieruchomości naraz.
+        Nieistniejące nieruchomości są pomijane. Zwraca {property_id: Decimal}.
+        Pobyt dłuższy niż MAX_NIGHTS albo sięgający roku date.max to ValueError.
+        """
+        property_ids = list(dict.fromkeys(property_ids))
+        if end_date <= start_date or not property_ids:
+            return {}
+        if (end_date - start_date).days > MAX_NIGHTS:
+            raise ValueError(f'Stays are limited to {MAX_NIGHTS} nights')
+        if end_date.year >= date.max.year:
+            raise ValueError(f'Dates must be before {date.max.year}-01-01')
+        # Pobyt może przechodzić przez sylwestra — dzielimy go na lata
+        segments = []
+        day = start_date
+        while day < end_date:
+            segment_end = min(date(day.year + 1, 1, 1), end_date)
+            offset = (day - date(day.year, 1, 1)).days
+            segments.append((day.year, offset, offset + (segment_end - day).days))
+            day = segment_end
+
+        calendars = cls.calendars(property_ids, sorted({year for year, _, _ in segments}))
+        quotes = {}
+        for pid in property_ids:
+            if (pid, segments[0][0]) in calendars:
+                cents = sum(sum(calendars[pid, year][i:j]) for year, i, j in segments)
+                quotes[pid] = Decimal(cents) / 100
+        return quotes
+
+    @classmethod
+    def quote(cls, property_id, start_date, end_date):
+        return cls.quote_many([property_id], start_date, end_date).get(property_id)
+
+    @classmethod
+    def invalidate(cls, property_id):
+        cache.set(cls._version_key(property_id), uuid.uuid4().hex, None)
+        transaction.on_commit(lambda: cache.set(cls._version_key(property_id), uuid.uuid4().hex, None))
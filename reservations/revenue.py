@@ -0,0 +1,186 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ReservationInvoice, RevenueReport, RollupWatermark
+
+WATERMARK = 'revenue'
+ROLLUP_PERIODS = ('week', 'month', 'quarter')
+
+
+def period_bounds(period, day):
+    """(pierwszy, ostatni) dzień okresu zawierającego `day`."""
+    if period == 'day':
+        return day, day
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == 'month':
+        start = day.replace(day=1)
+    elif period == 'quarter':
+        start = day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+    else:
+        raise ValueError(f'Unknown period: {period}')
+    months = 1 if period == 'month' else 3
+    year, month = divmod(start.month - 1 + months, 12)
+    return start, start.replace(year=start.year + year, month=month + 1) - timedelta(days=1)
+
+
+def cover(start_date, end_date, periods=('quarter', 'month', 'week')):
+    """
+    Rozkłada [start_date, end_date] (włącznie) na gotowe kubełki: najpierw
+    pełne kwartały, a brzegi po lewej i prawej rekurencyjnie miesiącami,
+    tygodniami i dniami. Zwraca listę (period, period_start).
+    """
+    if start_date > end_date:
+        return []
+    if not periods:
+        return [('day', start_date + timedelta(days=i)) for i in range((end_date - start_date).days + 1)]
+
+    period, smaller = periods[0], periods[1:]
+    first, last = period_bounds(period, start_date)
+    day = start_date if first == start_date else last + timedelta(days=1)
+    aligned = day
+    buckets = []
+    while True:
+        first, last = period_bounds(period, day)
+        if last > end_date:
+            break
+        buckets.append((period, first))
+        day = last + timedelta(days=1)
+
+    if not buckets:
+        return cover(start_date, end_date, smaller)
+    return (cover(start_date, aligned - timedelta(days=1), smaller) + buckets
+            + cover(day, end_date, smaller))
+
+
+class RevenueRollup:
+    """
+    Kubełki RevenueReport: dzienne sumy ReservationInvoice.amount per
+    nieruchomość, a z nich tygodnie, miesiące i kwartały.
+    """
+
+    @classmethod
+    def refresh(cls, upto=None):
+        """
+        Dolicza faktury, które nie są jeszcze wliczone (rolled_up_at IS NULL),
+        i przelicza tylko te tygodnie / miesiące / kwartały, których dotyczyły.
+        Faktury są najpierw oznaczane jednym UPDATE, a sumowane są dokładnie
+        oznaczone — faktura z transakcji, która zrobi commit później niż
+        wskazuje jej issued_at, trafi do następnego odświeżenia, a nie zginie.
+        Zwraca liczbę zmienionych dni.
+        """
+        upto = upto or timezone.now()
+        with transaction.atomic():
+            # Blokada wiersza znacznika — dwa równoległe odświeżenia nie doliczą faktur dwa razy
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+            stamp = timezone.now()
+            ReservationInvoice.objects.filter(rolled_up_at__isnull=True, issued_at__lte=upto).update(
+                rolled_up_at=stamp)
+            daily = {
+                (row['reservation__property_id'], row['day']): row['total']
+                for row in ReservationInvoice.objects.filter(rolled_up_at=stamp)
+                .values('reservation__property_id', day=TruncDate('issued_at'))
+                .annotate(total=Sum('amount')).order_by()
+            }
+            cls._add_daily(daily)
+            cls._recompute_rollups(daily.keys())
+            watermark.high_water_mark = stamp
+            watermark.save(update_fields=['high_water_mark'])
+        return len(daily)
+
+    @classmethod
+    def rebuild(cls):
+        """Liczy wszystko od zera (np. po korekcie lub usunięciu faktur)."""
+        with transaction.atomic():
+            RollupWatermark.objects.filter(name=WATERMARK).delete()
+            RevenueReport.objects.all().delete()
+            ReservationInvoice.objects.exclude(rolled_up_at=None).update(rolled_up_at=None)
+            return cls.refresh()
+
+    @staticmethod
+    def _add_daily(daily):
+        if not daily:
+            return
+        existing = {
+            (report.property_id, report.period_start): report
+            for report in RevenueReport.objects.filter(
+                period='day',
+                property_id__in={property_id for property_id, _ in daily},
+                period_start__in={day for _, day in daily},
+            )
+        }
+        created, updated = [], []
+        for (property_id, day), amount in daily.items():
+            report = existing.get((property_id, day))
+            if report is None:
+                created.append(RevenueReport(property_id=property_id, period='day', period_start=day,
+                                             period_end=day, total_revenue=amount))
+            else:
+                report.total_revenue += amount
+                updated.append(report)
+        RevenueReport.objects.bulk_create(created, batch_size=1000)
+        RevenueReport.objects.bulk_update(updated, ['total_revenue'], batch_size=1000)
+
+    @staticmethod
+    def _recompute_rollups(touched_days):
+        touched = {(period, property_id, period_bounds(period, day))
+                   for property_id, day in touched_days for period in ROLLUP_PERIODS}
+        if not touched:
+            return
+        property_ids = {property_id for _, property_id, _ in touched}
+        first = min(bounds[0] for _, _, bounds in touched)
+        last = max(bounds[1] for _, _, bounds in touched)
+        days = RevenueReport.objects.filter(
+            period='day', property_id__in=property_ids, period_start__range=(first, last)
+        ).values_list('property_id', 'period_start', 'total_revenue')
+
+        totals = defaultdict(Decimal)
+        for property_id, day, amount in days:
+            for period in ROLLUP_PERIODS:
+                key = (period, property_id, period_bounds(period, day))
+                if key in touched:
+                    totals[key] += amount
+
+        existing = {
+            (report.period, report.property_id, (report.period_start, report.period_end)): report
+            for report in RevenueReport.objects.filter(
+                period__in=ROLLUP_PERIODS, property_id__in=property_ids,
+                period_start__gte=first, period_end__lte=last,
+            )
+        }
+        created, updated = [], []
+        for key in touched:
+            period, property_id, (start, end) = key
+            report = existing.get(key)
+            if report is None:
+                created.append(RevenueReport(property_id=property_id, period=period, period_start=start,
+                                             period_end=end, total_revenue=totals[key]))
+            else:
+                report.total_revenue = totals[key]
+                updated.append(report)
+        RevenueReport.objects.bulk_create(created, batch_size=1000)
+        RevenueReport.objects.bulk_update(updated, ['total_revenue'], batch_size=1000)
+
+    @staticmethod
+    def total(start_date, end_date, property_id=None):
+        """Przychód w [start_date, end_date] (włącznie) z gotowych kubełków — jedno zapytanie."""
+        by_period = defaultdict(list)
+        for period, period_start in cover(start_date, end_date):
+            by_period[period].append(period_start)
+        if not by_period:
+            return Decimal('0')
+
+        condition = Q()
+        for period, starts in by_period.items():
+            condition |= Q(period=period, period_start__in=starts)
+        reports = RevenueReport.objects.filter(condition)
+        if property_id is not None:
+            reports = reports.filter(property_id=property_id)
+        return reports.aggregate(total=Sum('total_revenue'))['total'] or Decimal('0')
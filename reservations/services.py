@@ -1,11 +1,30 @@
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from .availability import AvailabilityIndex
 from .models import Reservation, Property, ReservationReminder, SpecialOffer
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Q
+from rest_framework.exceptions import APIException
 from django.utils import timezone
-from django.core.mail import send_mail
+from smtplib import SMTPException
+from django.core.mail import EmailMessage, get_connection
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
 
 class AvailabilityChecker:
     @staticmethod
-    def is_available(property_id, start_date, end_date):
+    def is_available(property_id, start_date, end_date, use_cache=True):
+        """
+        Czy w [start_date, end_date) nie ma potwierdzonej rezerwacji.
+        use_cache=False czyta prosto z bazy (np. wewnątrz transakcji rezerwacji).
+        """
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+
+        if use_cache:
+            return AvailabilityIndex.is_available(property_id, start_date, end_date)
+
         overlaps = Reservation.objects.filter(
             property_id=property_id,
             status='confirmed',
@@ -14,13 +33,107 @@ class AvailabilityChecker:
         )
         return not overlaps.exists()
 
+    @staticmethod
+    def availability_for(property_ids, start_date, end_date):
+        """
+        Dostępność wielu nieruchomości naraz — jedno zapytanie o te,
+        które mają kolizję, zamiast osobnego zapytania na każdą.
+        """
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        booked = set(
+            Reservation.objects.filter(
+                property_id__in=property_ids,
+                status='confirmed',
+                start_date__lt=end_date,
+                end_date__gt=start_date
+            ).values_list('property_id', flat=True).distinct()
+        )
+        return {property_id: property_id not in booked for property_id in property_ids}
+
+class BookingConflictError(APIException):
+    status_code = 409
+    default_detail = 'The property is already booked for these dates.'
+    default_code = 'booking_conflict'
+
+
+class BookingService:
+    """
+    Sprawdzenie dostępności i zapis rezerwacji w jednej transakcji.
+    Wiersz Property służy jako blokada (SELECT ... FOR UPDATE), więc
+    równoległe rezerwacje tej samej nieruchomości wykonują się po kolei,
+    a różnych nieruchomości — równolegle. SQLite nie ma FOR UPDATE;
+    tam serializację daje transaction_mode=IMMEDIATE w ustawieniach bazy.
+    """
+    ACTIVE_STATUSES = ('pending', 'confirmed')
+
+    @staticmethod
+    def _lock_property(property_id):
+        list(Property.objects.select_for_update().filter(pk=property_id).values_list('pk', flat=True))
+
+    @staticmethod
+    def _has_conflict(property_id, start_date, end_date, exclude_pk=None):
+        return Reservation.objects.filter(
+            property_id=property_id,
+            status='confirmed',
+            start_date__lt=end_date,
+            end_date__gt=start_date
+        ).exclude(pk=exclude_pk).exists()
+
+    @classmethod
+    def save(cls, serializer, **extra):
+        """
+        Zapis rezerwacji z ReservationSerializer (create i update)
+        z odrzuceniem kolizji z potwierdzonymi pobytami.
+        """
+        data = {**serializer.validated_data, **extra}
+        instance = serializer.instance
+
+        def current(name, default=None):
+            return data[name] if name in data else getattr(instance, name, default)
+
+        property_id = current('property').pk
+        status = current('status', 'pending')
+
+        with transaction.atomic():
+            cls._lock_property(property_id)
+            if status in cls.ACTIVE_STATUSES and cls._has_conflict(
+                    property_id, current('start_date'), current('end_date'),
+                    exclude_pk=instance.pk if instance else None):
+                raise BookingConflictError()
+            return serializer.save(**extra)
+
+    @classmethod
+    def confirm(cls, reservation_id, user_id=None):
+        with transaction.atomic():
+            property_id = Reservation.objects.values_list('property_id', flat=True).get(pk=reservation_id)
+            cls._lock_property(property_id)
+            reservation = Reservation.objects.get(pk=reservation_id)
+
+            if user_id is not None and reservation.user_id != int(user_id):
+                return False
+            if reservation.status == 'confirmed':
+                return True
+            if reservation.status != 'pending':
+                return False
+            if cls._has_conflict(property_id, reservation.start_date, reservation.end_date,
+                                 exclude_pk=reservation.pk):
+                raise BookingConflictError()
+
+            reservation.status = 'confirmed'
+            reservation.save(update_fields=['status'])
+            return True
+
+
 class NotificationService:
     @staticmethod
     def send_reservation_email(reservation, subject, message):
-        send_mail(subject, message, 'no-reply@example.com', [reservation.user.email])
-        # record
-        from .models import ReservationNotification
-        ReservationNotification.objects.create(reservation=reservation, message=message)
+        """
+        Tylko kolejkuje mail — wysyła go dispatch_outbox. Wpis w outboxie
+        powstaje w transakcji wołającego, więc wycofana zmiana nie wyśle maila.
+        ReservationNotification zapisuje dispatcher po udanej wysyłce.
+        """
+        from .outbox import enqueue
+        return enqueue(reservation.user.email, subject, message, reservation=reservation)
 
 class ReservationHistoryService:
     @staticmethod
@@ -30,7 +143,7 @@ class ReservationHistoryService:
         """
         return Reservation.objects.filter(
             user_id=user_id
-        ).order_by('-created_at')
+        ).order_by('-created_at', '-id')
         
     @staticmethod
     def get_property_reservation_history(property_id):
@@ -39,9 +152,13 @@ class ReservationHistoryService:
         """
         return Reservation.objects.filter(
             property_id=property_id
-        ).order_by('-created_at')
+        ).order_by('-created_at', '-id')
 
 class ReservationConfirmationService:
+    @staticmethod
+    def confirm(reservation_id, user_id):
+        return BookingService.confirm(reservation_id, user_id)
+
     @staticmethod
     def process_payment(reservation, payment_data):
         # Integracja z Stripe / BLIK etc.
@@ -55,36 +172,181 @@ class ReservationConfirmationService:
         )
 
 class InvoiceService:
+    @staticmethod
+    def invoice_amount(price, nights, discount_percents=()):
+        """Cena za noc x noce, kolejne rabaty (w %) nakładane jeden po drugim."""
+        amount = Decimal(price) * nights
+        for percent in discount_percents:
+            amount *= 1 - Decimal(percent) / 100
+        return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
     @staticmethod
     def generate_invoice(reservation):
         # TODO: wygeneruj PDF, zapisz ścieżkę
-        from .models import ReservationInvoice
-        amount = reservation.property.price * (reservation.end_date - reservation.start_date).days
+        from .models import ReservationDiscount, ReservationInvoice
+        percents = ReservationDiscount.objects.filter(reservation=reservation).values_list(
+            'offer__discount_percent', flat=True)
+        amount = InvoiceService.invoice_amount(
+            reservation.property.price, (reservation.end_date - reservation.start_date).days, percents)
         return ReservationInvoice.objects.create(reservation=reservation, amount=amount)
 
+    @staticmethod
+    def generate_invoices(chunk_size=2000, until=None):
+        """
+        Faktury dla wszystkich zakończonych pobytów bez faktury, paczkami po
+        chunk_size: jedno zapytanie o rezerwacje (z property), jedno o rabaty
+        i bulk_create na paczkę. Każda paczka to osobna transakcja, a
+        kolejna zaczyna się za ostatnim pk — po awarii wystarczy uruchomić
+        ponownie, zafakturowane rezerwacje odpadają w filtrze.
+        Generator: zwraca liczbę faktur faktycznie wystawionych w każdej paczce
+        (bez tych, które w międzyczasie wystawił równoległy przebieg).
+        """
+        from .models import ReservationDiscount, ReservationInvoice
+
+        eligible = Reservation.objects.filter(status='completed', reservationinvoice__isnull=True)
+        if until is not None:
+            eligible = eligible.filter(end_date__lte=until)
+        eligible = eligible.select_related('property').only(
+            'start_date', 'end_date', 'property__price').order_by('pk')
+
+        last_pk = 0
+        while True:
+            chunk = list(eligible.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                return
+            last_pk = chunk[-1].pk
+
+            percents = {}
+            for reservation_id, percent in ReservationDiscount.objects.filter(
+                    reservation_id__in=[r.pk for r in chunk]).values_list('reservation_id', 'offer__discount_percent'):
+                percents.setdefault(reservation_id, []).append(percent)
+
+            with transaction.atomic():
+                # Blokada rezerwacji paczki: równolegle uruchomiony proces czeka na commit
+                # drugiego, a osobne zapytanie o faktury widzi już to, co tamten wystawił
+                ids = [r.pk for r in chunk]
+                list(Reservation.objects.select_for_update().filter(pk__in=ids).values_list('pk', flat=True))
+                invoiced = set(ReservationInvoice.objects.filter(reservation_id__in=ids)
+                               .values_list('reservation_id', flat=True))
+                new = [
+                    ReservationInvoice(reservation_id=r.pk, amount=InvoiceService.invoice_amount(
+                        r.property.price, (r.end_date - r.start_date).days, percents.get(r.pk, ())))
+                    for r in chunk if r.pk not in invoiced
+                ]
+                ReservationInvoice.objects.bulk_create(new, batch_size=1000, ignore_conflicts=True)
+            yield len(new)
+
 class ReportingService:
     @staticmethod
     def occupancy_report(property_id, date):
         from .models import ReservationOccupancy
         return ReservationOccupancy.objects.filter(property_id=property_id, date=date).first()
 
+    @staticmethod
+    def occupancy_series(property_id, start_date, end_date):
+        """
+        Obłożenie dzień po dniu w [start_date, end_date) — jedno zapytanie
+        po (property, date), dni bez wiersza mają 0.
+        """
+        from .models import ReservationOccupancy
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        counts = dict(ReservationOccupancy.objects.filter(
+            property_id=property_id, date__gte=start_date, date__lt=end_date
+        ).values_list('date', 'occupancy_count'))
+        days = (end_date - start_date).days
+        return [(start_date + timedelta(days=i), counts.get(start_date + timedelta(days=i), 0))
+                for i in range(days)]
+
 class AnalyticsService:
     @staticmethod
     def revenue_summary(property_id, start_date, end_date):
-        from .models import RevenueReport
-        return RevenueReport.objects.filter(property_id=property_id,
-            period_start__gte=start_date, period_end__lte=end_date)
+        """
+        Przychód w [start_date, end_date] (włącznie) złożony z gotowych
+        kubełków RevenueReport. property_id=None — cały portfel.
+        """
+        from .revenue import RevenueRollup
+        return RevenueRollup.total(_as_date(start_date), _as_date(end_date), property_id)
 
 class ReminderScheduler:
+    SUBJECT = 'Przypomnienie o rezerwacji'
+    FROM_EMAIL = 'no-reply@example.com'
+    MAX_ATTEMPTS = 5
+    LEASE = 5 * 60  # s
+
     @staticmethod
-    def schedule_reminders():
+    def schedule_reminders(batch_size=100):
+        """
+        Wysyła wszystkie zaległe przypomnienia, paczka po paczce.
+        Zwraca liczbę wysłanych.
+        """
+        total = 0
+        while True:
+            claimed, sent = ReminderScheduler.send_batch(batch_size)
+            total += sent
+            # sent == 0 przy niepustej paczce = SMTP nie działa, nie kręcimy się w kółko
+            if claimed < batch_size or sent == 0:
+                return total
+
+    @staticmethod
+    def claim(batch_size):
+        """
+        Zajmuje paczkę zaległych przypomnień krótką transakcją: FOR UPDATE SKIP
+        LOCKED i przesunięcie remind_at o LEASE (jak OutboxDispatcher.claim).
+        Przypomnienia martwego workera wracają do kolejki po LEASE.
+        """
         now = timezone.now()
-        due = ReservationReminder.objects.filter(remind_at__lte=now, sent=False)
-        for reminder in due:
-            NotificationService.send_reservation_email(
-                reminder.reservation,
-                'Przypomnienie o rezerwacji',
-                f'Przypominamy o rezerwacji {reminder.reservation.id}.'
+        with transaction.atomic():
+            reminders = list(
+                ReservationReminder.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('reservation__user')
+                .filter(remind_at__lte=now, sent=False, attempts__lt=ReminderScheduler.MAX_ATTEMPTS)
+                .order_by('remind_at')[:batch_size]
             )
-            reminder.sent = True
-            reminder.save()
\ No newline at end of file
+            ReservationReminder.objects.filter(pk__in=[reminder.pk for reminder in reminders]).update(
+                remind_at=now + timedelta(seconds=ReminderScheduler.LEASE))
+        return reminders
+
+    @staticmethod
+    def send_batch(batch_size=100):
+        """
+        Wysyła zajętą paczkę jednym połączeniem SMTP poza transakcją i zapisuje
+        wynik drugą krótką transakcją (bulk_create powiadomień + bulk_update
+        przypomnień). Zwraca (zajęte, wysłane).
+        """
+        from .models import ReservationNotification
+
+        reminders = ReminderScheduler.claim(batch_size)
+        if not reminders:
+            return 0, 0
+
+        sent = {}
+        try:
+            with get_connection() as mail:
+                for reminder in reminders:
+                    body = f'Przypominamy o rezerwacji {reminder.reservation_id}.'
+                    message = EmailMessage(ReminderScheduler.SUBJECT, body, ReminderScheduler.FROM_EMAIL,
+                                           [reminder.reservation.user.email], connection=mail)
+                    try:
+                        message.send()
+                    except (SMTPException, OSError):
+                        continue
+                    sent[reminder.pk] = body
+        except (SMTPException, OSError):
+            # Połączenie nie otworzyło się (albo padło) — reszta paczki to nieudana próba
+            pass
+
+        # bulk_update zapisuje też remind_at sprzed zajęcia (obiekty go pamiętają):
+        # nieudane są od razu znów zaległe, do MAX_ATTEMPTS prób
+        for reminder in reminders:
+            if reminder.pk in sent:
+                reminder.sent = True
+            else:
+                reminder.attempts += 1
+        with transaction.atomic():
+            ReservationNotification.objects.bulk_create([
+                ReservationNotification(reservation_id=reminder.reservation_id, message=sent[reminder.pk])
+                for reminder in reminders if reminder.pk in sent
+            ])
+            ReservationReminder.objects.bulk_update(reminders, ['remind_at', 'sent', 'attempts'])
+        return len(reminders), len(sent)
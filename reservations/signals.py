@@ -0,0 +1,78 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .availability import AvailabilityIndex
+from .models import Property, Reservation, SpecialOffer
+from .occupancy import OccupancyMaintainer, stay_deltas
+from .pricing import PricingEngine
+from .services import _as_date
+
+STATE_FIELDS = ('property_id', 'status', 'start_date', 'end_date')
+
+
+def _state(instance):
+    # Daty mogą przyjść z formularza jako string
+    start_date, end_date = _as_date(instance.start_date), _as_date(instance.end_date)
+    return instance.property_id, instance.status, start_date, end_date
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_previous_state(sender, instance, **kwargs):
+    # Stan sprzed zapisu: przeniesienie rezerwacji na inną nieruchomość unieważnia
+    # obie, a zmiana statusu / dat daje delty obłożenia
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = (
+            Reservation.objects.filter(pk=instance.pk).values_list(*STATE_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Reservation)
+def invalidate_availability_on_save(sender, instance, **kwargs):
+    AvailabilityIndex.invalidate(instance.property_id)
+    previous = getattr(instance, '_previous_state', None)
+    if previous and previous[0] != instance.property_id:
+        AvailabilityIndex.invalidate(previous[0])
+
+
+@receiver(post_save, sender=Reservation)
+def update_occupancy_on_save(sender, instance, **kwargs):
+    OccupancyMaintainer.apply(stay_deltas(getattr(instance, '_previous_state', None), _state(instance)))
+
+
+@receiver(post_delete, sender=Reservation)
+def invalidate_availability_on_delete(sender, instance, **kwargs):
+    AvailabilityIndex.invalidate(instance.property_id)
+
+
+@receiver(post_delete, sender=Reservation)
+def update_occupancy_on_delete(sender, instance, **kwargs):
+    OccupancyMaintainer.apply(stay_deltas(_state(instance), None))
+
+
+@receiver(pre_save, sender=SpecialOffer)
+def remember_previous_offer_property(sender, instance, **kwargs):
+    instance._previous_property_id = None
+    if instance.pk:
+        instance._previous_property_id = (
+            SpecialOffer.objects.filter(pk=instance.pk).values_list('property_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=SpecialOffer)
+def invalidate_prices_on_offer_save(sender, instance, **kwargs):
+    PricingEngine.invalidate(instance.property_id)
+    previous = getattr(instance, '_previous_property_id', None)
+    if previous and previous != instance.property_id:
+        PricingEngine.invalidate(previous)
+
+
+@receiver(post_delete, sender=SpecialOffer)
+def invalidate_prices_on_offer_delete(sender, instance, **kwargs):
+    PricingEngine.invalidate(instance.property_id)
+
+
+@receiver(post_save, sender=Property)
+def invalidate_prices_on_property_save(sender, instance, **kwargs):
+    # Zmiana ceny bazowej zmienia cały cennik
+    PricingEngine.invalidate(instance.pk)
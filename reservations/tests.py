@@ -3,7 +3,28 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from .models import Property, Reservation
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
+from .models import (EmailOutbox, Property, Reservation, ReservationDiscount, ReservationInvoice,
+                     ReservationNotification, ReservationReminder, RevenueReport, SpecialOffer)
+from .management.commands.send_reminders import drain
+from .occupancy import OccupancyMaintainer
+from .outbox import MAX_ATTEMPTS, OutboxDispatcher
+from .pricing import MAX_NIGHTS, PricingEngine
+from .revenue import RevenueRollup, cover
+from .services import (AnalyticsService, AvailabilityChecker, InvoiceService, NotificationService,
+                       ReminderScheduler, ReportingService)
 
 User = get_user_model()
 
@@ -57,14 +78,533 @@ class ReservationAPITest(APITestCase):
         resp = self.client.get(f"{url}?user_id={self.user.id}")
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         # Check that both reservations are returned
-        self.assertEqual(len(resp.data), 2)
+        self.assertEqual(len(resp.data['results']), 2)
         
         # Test property history
         resp = self.client.get(f"{url}?property_id={self.prop.id}")
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         # Check that both reservations are returned
-        self.assertEqual(len(resp.data), 2)
+        self.assertEqual(len(resp.data['results']), 2)
         
         # Test invalid request (no parameters)
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReservationHistoryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='kasia', password='pass')
+        self.prop = Property.objects.create(title='Dworek', address='Lublin', price=150.00)
+        self.reservations = [
+            Reservation.objects.create(user=self.user, property=self.prop,
+                                       start_date=date(2025, 8, 1), end_date=date(2025, 8, 3))
+            for _ in range(5)
+        ]
+        # Dwie rezerwacje z tym samym created_at — kolejność rozstrzyga id
+        Reservation.objects.filter(pk__in=[r.pk for r in self.reservations[1:3]]).update(
+            created_at=self.reservations[1].created_at)
+        self.url = reverse('reservation-history')
+
+    def test_keyset_pages_cover_history_newest_first(self):
+        seen, url, params = [], self.url, {'property_id': self.prop.pk, 'page_size': 2}
+        while url:
+            resp = self.client.get(url, params)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            seen += [row['id'] for row in resp.data['results']]
+            url, params = resp.data['next'], None
+        self.assertEqual(seen, [r.pk for r in reversed(self.reservations)])
+
+    def test_fields_projection_reads_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(self.url, {'user_id': self.user.pk, 'fields': 'status,start_date'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['results'][0], {'status': 'pending', 'start_date': '2025-08-01'})
+        select = queries.captured_queries[-1]['sql']
+        self.assertNotIn('end_date', select)
+        self.assertNotIn('property_id"', select.split('WHERE')[0])
+
+        resp = self.client.get(self.url, {'user_id': self.user.pk, 'fields': 'status,password'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_integer_ids_are_rejected(self):
+        for params in ({'user_id': 'abc'}, {'property_id': '1.5'}):
+            resp = self.client.get(self.url, params)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertEqual(resp.data, {'error': f'{next(iter(params))} must be an integer'})
+
+    def test_history_queries_use_composite_indexes(self):
+        for lookup, index in [('user_id', 'reservation_user_history_idx'),
+                              ('property_id', 'reservation_prop_history_idx')]:
+            queryset = Reservation.objects.filter(**{lookup: 1}).order_by('-created_at', '-id')
+            plan = queryset.explain()
+            self.assertIn(index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class AvailabilityTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='guest', password='pass')
+        self.prop = Property.objects.create(title='Domek', address='Zakopane', price=300.00)
+        self.res = Reservation.objects.create(
+            user=self.user, property=self.prop,
+            start_date='2025-08-10', end_date='2025-08-15', status='confirmed'
+        )
+
+    def check(self, start, end):
+        url = reverse('check-availability')
+        resp = self.client.get(url, {'property_id': self.prop.pk, 'start_date': start, 'end_date': end})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp.data['is_available']
+
+    def test_overlap_detection(self):
+        self.assertFalse(self.check('2025-08-12', '2025-08-20'))
+        self.assertFalse(self.check('2025-08-01', '2025-08-11'))
+        self.assertTrue(self.check('2025-08-15', '2025-08-18'))  # wyjazd = przyjazd
+        self.assertTrue(self.check('2025-08-01', '2025-08-10'))
+
+    def test_cached_answer_needs_no_queries(self):
+        AvailabilityChecker.is_available(self.prop.pk, '2025-08-12', '2025-08-13')
+        with self.assertNumQueries(0):
+            self.assertFalse(AvailabilityChecker.is_available(self.prop.pk, '2025-08-12', '2025-08-13'))
+
+    def test_cancel_and_delete_invalidate_cache(self):
+        self.assertFalse(self.check('2025-08-12', '2025-08-13'))
+        self.client.patch(reverse('reservation-cancel', kwargs={'pk': self.res.pk}), {}, format='json')
+        self.assertTrue(self.check('2025-08-12', '2025-08-13'))
+
+        other = Reservation.objects.create(
+            user=self.user, property=self.prop,
+            start_date='2025-09-01', end_date='2025-09-05', status='confirmed'
+        )
+        self.assertFalse(self.check('2025-09-02', '2025-09-03'))
+        other.delete()
+        self.assertTrue(self.check('2025-09-02', '2025-09-03'))
+
+    def test_invalid_date(self):
+        url = reverse('check-availability')
+        resp = self.client.get(url, {'property_id': self.prop.pk, 'start_date': 'jutro', 'end_date': '2025-08-20'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_property_id_is_normalized(self):
+        url = reverse('check-availability')
+        params = {'start_date': '2025-08-12', 'end_date': '2025-08-14'}
+        self.assertFalse(self.client.get(url, {'property_id': f'0{self.prop.pk} ', **params}).data['is_available'])
+        # Jeden wpis w cache dla wszystkich zapisów tego samego id
+        with self.assertNumQueries(0):
+            self.assertFalse(self.client.get(url, {'property_id': self.prop.pk, **params}).data['is_available'])
+
+        resp = self.client.get(url, {'property_id': 'abc', **params})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data, {'error': 'property_id must be an integer'})
+
+    def test_bulk_availability_single_query(self):
+        free = Property.objects.create(title='Wolny', address='Sopot', price=200.00)
+        url = reverse('bulk-availability')
+        params = {'property_ids': f'{self.prop.pk},{free.pk}', 'start_date': '2025-08-12', 'end_date': '2025-08-14'}
+        with self.assertNumQueries(1):
+            resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['availability'], {str(self.prop.pk): False, str(free.pk): True})
+
+        resp = self.client.get(url, {'property_ids': 'x', 'start_date': '2025-08-12', 'end_date': '2025-08-14'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookingServiceTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jan', password='pass')
+        self.prop = Property.objects.create(title='Loft', address='Poznań', price=250.00)
+        Reservation.objects.create(
+            user=self.user, property=self.prop,
+            start_date='2025-10-01', end_date='2025-10-05', status='confirmed'
+        )
+        self.client.force_authenticate(self.user)
+
+    def book(self, start, end, **extra):
+        data = {'user': self.user.pk, 'property': self.prop.pk, 'start_date': start, 'end_date': end}
+        data.update(extra)
+        return self.client.post(reverse('reservation-list-create'), data, format='json')
+
+    def test_overlapping_booking_is_rejected(self):
+        self.assertEqual(self.book('2025-10-03', '2025-10-07').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.book('2025-10-05', '2025-10-07').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_second_confirmation_of_overlap_fails(self):
+        first = Reservation.objects.create(user=self.user, property=self.prop,
+                                           start_date='2025-11-01', end_date='2025-11-04')
+        second = Reservation.objects.create(user=self.user, property=self.prop,
+                                            start_date='2025-11-03', end_date='2025-11-06')
+        url = reverse('reservation-confirm', kwargs={'pk': first.pk})
+
+        resp = self.client.post(url, {'reservation_id': first.pk, 'user_id': self.user.pk}, format='json')
+        self.assertTrue(resp.data['is_confirmed'])
+        resp = self.client.post(url, {'reservation_id': second.pk, 'user_id': self.user.pk}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'pending')
+
+    def test_confirmation_rejects_non_integer_ids(self):
+        reservation = Reservation.objects.create(user=self.user, property=self.prop,
+                                                 start_date='2025-11-10', end_date='2025-11-12')
+        url = reverse('reservation-confirm', kwargs={'pk': reservation.pk})
+
+        for payload in ({'reservation_id': reservation.pk, 'user_id': 'abc'},
+                        {'reservation_id': 'abc', 'user_id': self.user.pk},
+                        {'reservation_id': reservation.pk, 'user_id': [1]}):
+            resp = self.client.post(url, payload, format='json')
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'pending')
+
+
+class ReminderSchedulerTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='ola', email='ola@example.com', password='pass')
+        prop = Property.objects.create(title='Dom', address='Gdynia', price=120.00)
+        now = timezone.now()
+        for i in range(7):
+            reservation = Reservation.objects.create(user=user, property=prop,
+                                                     start_date='2025-12-01', end_date='2025-12-03')
+            ReservationReminder.objects.create(reservation=reservation, remind_at=now - timedelta(hours=i))
+        self.future = ReservationReminder.objects.create(reservation=reservation,
+                                                         remind_at=now + timedelta(days=1))
+
+    def test_due_reminders_sent_once(self):
+        self.assertEqual(ReminderScheduler.schedule_reminders(batch_size=3), 7)
+        self.assertEqual(len(mail.outbox), 7)
+        self.assertEqual(mail.outbox[0].to, ['ola@example.com'])
+        self.assertEqual(ReservationNotification.objects.count(), 7)
+        self.assertEqual(ReservationReminder.objects.filter(sent=False).get(), self.future)
+
+        self.assertEqual(ReminderScheduler.schedule_reminders(batch_size=3), 0)
+        self.assertEqual(len(mail.outbox), 7)
+
+    def test_failing_recipient_gives_up_after_max_attempts(self):
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=SMTPException('550')):
+            for _ in range(ReminderScheduler.MAX_ATTEMPTS + 2):
+                ReminderScheduler.schedule_reminders(batch_size=10)
+        self.assertEqual(set(ReservationReminder.objects.filter(sent=False).values_list('attempts', flat=True)),
+                         {ReminderScheduler.MAX_ATTEMPTS, 0})
+        self.assertEqual(ReminderScheduler.send_batch(batch_size=10), (0, 0))
+
+    def test_drain_retries_locked_database_with_limit(self):
+        locked = OperationalError('database is locked')
+        with mock.patch.object(ReminderScheduler, 'send_batch', side_effect=[locked, (7, 7)]), \
+                mock.patch('time.sleep') as sleep:
+            self.assertEqual(drain(batch_size=10), 7)
+        sleep.assert_called_once()
+        with mock.patch.object(ReminderScheduler, 'send_batch', side_effect=locked) as send_batch, \
+                mock.patch('time.sleep'):
+            with self.assertRaises(OperationalError):
+                drain(batch_size=10, attempts=3)
+        self.assertEqual(send_batch.call_count, 3)
+
+    def test_failed_connection_counts_as_attempt(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('refused')):
+            self.assertEqual(ReminderScheduler.send_batch(batch_size=10), (7, 0))
+        due = ReservationReminder.objects.exclude(pk=self.future.pk)
+        self.assertEqual(set(due.values_list('attempts', flat=True)), {1})
+        # remind_at wrócił sprzed zajęcia — następny przebieg spróbuje ponownie
+        self.assertEqual(ReminderScheduler.send_batch(batch_size=10), (7, 7))
+
+    def test_claimed_batch_is_leased_while_sending(self):
+        due = ReservationReminder.objects.filter(remind_at__lte=timezone.now(), sent=False)
+        remind_at = dict(due.values_list('pk', 'remind_at'))
+        seen = []
+        original_send = EmailMessage.send
+
+        def send(message, *args, **kwargs):
+            seen.append(due.filter(remind_at__lte=timezone.now()).count())
+            return original_send(message, *args, **kwargs)
+
+        with mock.patch.object(EmailMessage, 'send', send):
+            ReminderScheduler.send_batch(batch_size=10)
+        self.assertEqual(seen, [0] * 7)
+        self.assertEqual(dict(ReservationReminder.objects.filter(pk__in=remind_at).values_list('pk', 'remind_at')),
+                         remind_at)
+
+    def test_batch_query_count_is_constant(self):
+        # zajęcie (savepoint, SELECT z JOIN-em, UPDATE) i zapis (savepoint, 2 zapisy zbiorcze)
+        with self.assertNumQueries(8):
+            self.assertEqual(ReminderScheduler.send_batch(batch_size=7), (7, 7))
+
+
+class EmailOutboxTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='ewa', email='ewa@Example.com', password='pass')
+        prop = Property.objects.create(title='Chata', address='Zakopane', price=300.00)
+        self.reservation = Reservation.objects.create(user=user, property=prop,
+                                                      start_date='2025-12-01', end_date='2025-12-03')
+
+    def test_send_only_enqueues(self):
+        NotificationService.send_reservation_email(self.reservation, 'Potwierdzenie', 'Treść')
+        self.assertEqual(len(mail.outbox), 0)
+        row = EmailOutbox.objects.get()
+        self.assertEqual((row.status, row.domain), ('pending', 'example.com'))
+
+    def test_dispatcher_sends_and_records(self):
+        for i in range(5):
+            NotificationService.send_reservation_email(self.reservation, f'Temat {i}', 'Treść')
+        self.assertEqual(OutboxDispatcher(workers=3, per_domain=2).drain(batch_size=2), 5)
+        self.assertEqual(sorted(m.subject for m in mail.outbox), [f'Temat {i}' for i in range(5)])
+        self.assertFalse(EmailOutbox.objects.exclude(status='sent').exists())
+        self.assertEqual(ReservationNotification.objects.count(), 5)
+        self.assertEqual(OutboxDispatcher().drain(), 0)
+
+    def test_failure_backs_off_then_gives_up(self):
+        NotificationService.send_reservation_email(self.reservation, 'Temat', 'Treść')
+        dispatcher = OutboxDispatcher()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=SMTPException('421 try later')):
+            self.assertEqual(dispatcher.dispatch_batch(), (1, 0))
+            row = EmailOutbox.objects.get()
+            self.assertEqual((row.status, row.attempts, row.last_error), ('pending', 1, '421 try later'))
+            self.assertGreater(row.next_attempt_at, timezone.now())
+            # przed upływem backoffu nic do wysłania
+            self.assertEqual(dispatcher.dispatch_batch(), (0, 0))
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                EmailOutbox.objects.update(next_attempt_at=timezone.now())
+                dispatcher.dispatch_batch()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ('failed', MAX_ATTEMPTS))
+        self.assertEqual(ReservationNotification.objects.count(), 0)
+
+
+class OccupancyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='piotr', password='pass')
+        self.prop = Property.objects.create(title='Willa', address='Sopot', price=500.00)
+
+    def series(self):
+        return [count for _, count in
+                ReportingService.occupancy_series(self.prop.pk, '2025-07-01', '2025-07-08')]
+
+    def test_deltas_follow_reservation_changes(self):
+        first = Reservation.objects.create(user=self.user, property=self.prop, status='confirmed',
+                                           start_date='2025-07-01', end_date='2025-07-04')
+        second = Reservation.objects.create(user=self.user, property=self.prop,
+                                            start_date='2025-07-03', end_date='2025-07-06')
+        self.assertEqual(self.series(), [1, 1, 1, 0, 0, 0, 0])
+
+        second.status = 'confirmed'
+        second.save()
+        self.assertEqual(self.series(), [1, 1, 2, 1, 1, 0, 0])
+
+        second.start_date, second.end_date = date(2025, 7, 5), date(2025, 7, 8)
+        second.save()
+        self.assertEqual(self.series(), [1, 1, 1, 0, 1, 1, 1])
+
+        first.status = 'cancelled'
+        first.save()
+        second.delete()
+        self.assertEqual(self.series(), [0] * 7)
+
+    def test_rebuild_repairs_drift_from_bulk_updates(self):
+        for start, end, status in [('2025-06-28', '2025-07-02', 'confirmed'),
+                                   ('2025-07-01', '2025-07-03', 'completed'),
+                                   ('2025-07-02', '2025-07-09', 'pending')]:
+            Reservation.objects.create(user=self.user, property=self.prop, status=status,
+                                       start_date=start, end_date=end)
+        self.assertEqual(self.series(), [2, 1, 0, 0, 0, 0, 0])
+        self.assertEqual(OccupancyMaintainer.drift(date(2025, 7, 1), days=31), [])
+
+        Reservation.objects.filter(status='pending').update(status='confirmed')  # bez sygnałów
+        self.assertEqual(self.series(), [2, 1, 0, 0, 0, 0, 0])
+        self.assertEqual(len(OccupancyMaintainer.drift(date(2025, 7, 1), days=31)), 7)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_occupancy', start=date(2025, 7, 1), days=31, check=True, stdout=StringIO())
+
+        OccupancyMaintainer.rebuild(date(2025, 7, 1), days=31)
+        self.assertEqual(self.series(), [2, 2, 1, 1, 1, 1, 1])
+        self.assertEqual(OccupancyMaintainer.drift(date(2025, 7, 1), days=31), [])
+
+    def test_decrement_below_zero_is_reported(self):
+        self.assertEqual(OccupancyMaintainer.apply({(self.prop.pk, date(2025, 7, 1)): 1}), 0)
+        # Noc 1 lipca policzona, 2 lipca nie — zmniejszenie obu to rozjazd tylko dla drugiej
+        deltas = {(self.prop.pk, date(2025, 7, 1)): -1, (self.prop.pk, date(2025, 7, 2)): -1}
+        with self.assertLogs('reservations.occupancy', 'WARNING') as logs:
+            self.assertEqual(OccupancyMaintainer.apply(deltas), 1)
+        self.assertIn('1 of 2 days', logs.output[0])
+        self.assertEqual(self.series(), [0] * 7)
+
+
+class RevenueRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='anna', password='pass')
+        self.props = [Property.objects.create(title=f'Dom {i}', address='Łódź', price=100.00) for i in range(2)]
+
+    def invoice(self, prop, amount, issued, hour=12):
+        reservation = Reservation.objects.create(user=self.user, property=prop,
+                                                 start_date='2025-01-01', end_date='2025-01-02')
+        invoice = ReservationInvoice.objects.create(reservation=reservation, amount=amount)
+        ReservationInvoice.objects.filter(pk=invoice.pk).update(
+            issued_at=datetime(*issued, hour, tzinfo=dt_timezone.utc))
+
+    def brute_force(self, start, end, prop=None):
+        invoices = ReservationInvoice.objects.filter(issued_at__date__range=(start, end))
+        if prop:
+            invoices = invoices.filter(reservation__property=prop)
+        return sum((i.amount for i in invoices), Decimal('0'))
+
+    def test_cover_uses_largest_buckets(self):
+        days = lambda month, *numbers: [('day', date(2025, month, n)) for n in numbers]
+        self.assertEqual(cover(date(2025, 3, 30), date(2025, 7, 8)),
+                         days(3, 30, 31) + [('quarter', date(2025, 4, 1))] + days(7, *range(1, 9)))
+        self.assertEqual(cover(date(2025, 2, 26), date(2025, 3, 20)),
+                         days(2, 26, 27, 28) + days(3, 1, 2)
+                         + [('week', date(2025, 3, 3)), ('week', date(2025, 3, 10))] + days(3, 17, 18, 19, 20))
+        self.assertEqual(cover(date(2025, 1, 1), date(2025, 12, 31)),
+                         [('quarter', date(2025, m, 1)) for m in (1, 4, 7, 10)])
+        self.assertEqual(cover(date(2025, 7, 7), date(2025, 7, 13)), [('week', date(2025, 7, 7))])
+
+    def test_summary_matches_invoices_and_refresh_is_incremental(self):
+        for i, (month, day) in enumerate([(1, 3), (1, 31), (2, 14), (3, 31), (5, 5), (5, 6)]):
+            self.invoice(self.props[i % 2], Decimal('100.50') * (i + 1), (2025, month, day))
+        self.assertEqual(RevenueRollup.refresh(upto=datetime(2025, 12, 31, tzinfo=dt_timezone.utc)), 6)
+
+        ranges = [(date(2025, 1, 1), date(2025, 12, 31)), (date(2025, 1, 3), date(2025, 3, 30)),
+                  (date(2025, 2, 1), date(2025, 5, 5)), (date(2025, 5, 6), date(2025, 5, 6))]
+        for start, end in ranges:
+            self.assertEqual(AnalyticsService.revenue_summary(None, start, end), self.brute_force(start, end))
+            self.assertEqual(AnalyticsService.revenue_summary(self.props[0].pk, start, end),
+                             self.brute_force(start, end, self.props[0]))
+
+        # Druga faktura tego samego dnia po znaczniku: doliczona tylko nowa kwota
+        self.invoice(self.props[0], Decimal('10.00'), (2026, 1, 3), hour=8)
+        RevenueRollup.refresh(upto=datetime(2026, 1, 3, 10, tzinfo=dt_timezone.utc))
+        self.invoice(self.props[0], Decimal('5.25'), (2026, 1, 3), hour=14)
+        self.assertEqual(RevenueRollup.refresh(upto=datetime(2026, 1, 3, 16, tzinfo=dt_timezone.utc)), 1)
+        self.assertEqual(RevenueRollup.refresh(upto=datetime(2026, 1, 3, 16, tzinfo=dt_timezone.utc)), 0)
+        day = RevenueReport.objects.get(property=self.props[0], period='day', period_start=date(2026, 1, 3))
+        self.assertEqual(day.total_revenue, Decimal('15.25'))
+        quarter = RevenueReport.objects.get(property=self.props[0], period='quarter', period_start=date(2025, 1, 1))
+        self.assertEqual(quarter.total_revenue, self.brute_force(date(2025, 1, 1), date(2025, 3, 31), self.props[0]))
+        self.assertEqual(AnalyticsService.revenue_summary(None, '2025-01-01', '2026-01-31'),
+                         self.brute_force(date(2025, 1, 1), date(2026, 1, 31)))
+
+    def test_late_committed_invoice_is_still_counted(self):
+        self.invoice(self.props[0], Decimal('10.00'), (2025, 6, 1))
+        RevenueRollup.refresh()
+        # issued_at sprzed poprzedniego odświeżenia, commit dopiero teraz (długa transakcja)
+        self.invoice(self.props[0], Decimal('7.00'), (2025, 6, 1), hour=6)
+        self.assertEqual(RevenueRollup.refresh(), 1)
+        self.assertEqual(RevenueRollup.refresh(), 0)
+        self.assertEqual(AnalyticsService.revenue_summary(self.props[0].pk, date(2025, 6, 1), date(2025, 6, 30)),
+                         Decimal('17.00'))
+
+        RevenueRollup.rebuild()
+        self.assertEqual(AnalyticsService.revenue_summary(None, date(2025, 1, 1), date(2025, 12, 31)),
+                         Decimal('17.00'))
+
+    def test_summary_endpoint(self):
+        self.invoice(self.props[1], Decimal('250.00'), (2025, 4, 2))
+        RevenueRollup.refresh()
+        resp = self.client.get(reverse('revenue-summary'),
+                               {'start_date': '2025-04-01', 'end_date': '2025-06-30'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()['total_revenue'], '250.00')
+        resp = self.client.get(reverse('revenue-summary'), {'start_date': '2025-04-01', 'end_date': 'x'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkInvoiceTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='marek', password='pass')
+        prop = Property.objects.create(title='Apartament', address='Wrocław', price=Decimal('99.99'))
+        offers = [SpecialOffer.objects.create(property=prop, name=f'Rabat {p}', discount_percent=p,
+                                              start_date='2025-01-01', end_date='2025-12-31')
+                  for p in (Decimal('10'), Decimal('5'))]
+        self.stays = [Reservation.objects.create(user=user, property=prop, status=status,
+                                                 start_date=date(2025, 3, 1), end_date=date(2025, 3, nights + 1))
+                      for nights, status in [(3, 'completed'), (2, 'completed'), (1, 'completed'),
+                                             (4, 'confirmed'), (5, 'completed')]]
+        ReservationDiscount.objects.create(reservation=self.stays[1], offer=offers[0])
+        ReservationDiscount.objects.create(reservation=self.stays[2], offer=offers[0])
+        ReservationDiscount.objects.create(reservation=self.stays[2], offer=offers[1])
+        InvoiceService.generate_invoice(self.stays[4])
+
+    def test_bulk_invoicing_is_chunked_and_resumable(self):
+        # paczka: rezerwacje + rabaty + blokada + wystawione + insert + savepoint/release; na końcu pusta paczka
+        with self.assertNumQueries(3 * 7 + 1):
+            self.assertEqual(list(InvoiceService.generate_invoices(chunk_size=1)), [1, 1, 1])
+
+        amounts = dict(ReservationInvoice.objects.values_list('reservation_id', 'amount'))
+        self.assertEqual(amounts, {
+            self.stays[0].pk: Decimal('299.97'),
+            self.stays[1].pk: Decimal('179.98'),  # 199.98 - 10%
+            self.stays[2].pk: Decimal('85.49'),   # 99.99 - 10% - 5%
+            self.stays[4].pk: Decimal('499.95'),
+        })
+        self.assertEqual(list(InvoiceService.generate_invoices()), [])
+
+    def test_overlapping_run_counts_only_own_invoices(self):
+        discounts = ReservationDiscount.objects.filter
+
+        def concurrent_invoice(*args, **kwargs):
+            # Równoległy przebieg fakturuje rezerwację z już pobranej paczki
+            ReservationInvoice.objects.get_or_create(reservation=self.stays[2], defaults={'amount': Decimal('1')})
+            return discounts(*args, **kwargs)
+
+        with mock.patch.object(ReservationDiscount.objects, 'filter', side_effect=concurrent_invoice):
+            self.assertEqual(list(InvoiceService.generate_invoices()), [2])
+        self.assertEqual(ReservationInvoice.objects.get(reservation=self.stays[2]).amount, Decimal('1'))
+        self.assertEqual(ReservationInvoice.objects.count(), 4)
+
+
+class PricingEngineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.prop = Property.objects.create(title='Kamienica', address='Toruń', price=Decimal('200.00'))
+        self.other = Property.objects.create(title='Domek', address='Hel', price=Decimal('80.00'))
+        self.offer = SpecialOffer.objects.create(property=self.prop, name='Zima', discount_percent=Decimal('25'),
+                                                 start_date=date(2025, 12, 30), end_date=date(2026, 1, 2))
+        SpecialOffer.objects.create(property=self.prop, name='Sylwester', discount_percent=Decimal('10'),
+                                    start_date=date(2025, 12, 31), end_date=date(2025, 12, 31))
+
+    def test_quote_applies_overlapping_offers_across_years(self):
+        # 29.12: 200, 30.12: 150, 31.12: 135 (25% i 10%), 1.01: 150, 2.01: 150, 3.01: 200
+        self.assertEqual(PricingEngine.quote(self.prop.pk, date(2025, 12, 29), date(2026, 1, 4)), Decimal('985'))
+        self.assertEqual(PricingEngine.quote_many([self.prop.pk, self.other.pk, 999],
+                                                  date(2025, 12, 31), date(2026, 1, 1)),
+                         {self.prop.pk: Decimal('135'), self.other.pk: Decimal('80')})
+
+    def test_cached_quote_needs_no_queries_and_offer_change_invalidates(self):
+        PricingEngine.quote_many([self.prop.pk, self.other.pk], date(2025, 12, 30), date(2025, 12, 31))
+        with self.assertNumQueries(0):
+            self.assertEqual(PricingEngine.quote(self.prop.pk, date(2025, 12, 30), date(2025, 12, 31)),
+                             Decimal('150'))
+
+        self.offer.discount_percent = Decimal('50')
+        self.offer.save()
+        self.assertEqual(PricingEngine.quote(self.prop.pk, date(2025, 12, 30), date(2025, 12, 31)), Decimal('100'))
+        self.offer.delete()
+        self.assertEqual(PricingEngine.quote(self.prop.pk, date(2025, 12, 30), date(2025, 12, 31)), Decimal('200'))
+
+        self.other.price = Decimal('90.00')
+        self.other.save()
+        self.assertEqual(PricingEngine.quote(self.other.pk, date(2025, 12, 30), date(2025, 12, 31)), Decimal('90'))
+
+    def test_quote_endpoint(self):
+        resp = self.client.get(reverse('quote'), {'property_ids': f'{self.prop.pk},{self.other.pk}',
+                                                  'start_date': '2025-12-29', 'end_date': '2025-12-31'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()['quotes'], {str(self.prop.pk): '350.00', str(self.other.pk): '160.00'})
+
+    def test_stay_length_and_date_range_are_bounded(self):
+        for url in (reverse('quote'), reverse('bulk-availability')):
+            for start, end in [('9999-12-30', '9999-12-31'), ('2025-01-01', 'x')]:
+                resp = self.client.get(url, {'property_ids': self.prop.pk, 'start_date': start, 'end_date': end})
+                self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.get(reverse('quote'), {'property_ids': self.prop.pk,
+                                                  'start_date': '0001-01-01', 'end_date': '9998-12-31'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.json(), {'error': f'At most {MAX_NIGHTS} nights per request'})
+
+        with self.assertRaises(ValueError):
+            PricingEngine.quote(self.prop.pk, date(2025, 1, 1), date(2025, 1, 1) + timedelta(days=MAX_NIGHTS + 1))
+        self.assertEqual(PricingEngine.quote(self.other.pk, date(2025, 1, 1), date(2025, 1, 1)
+                                             + timedelta(days=MAX_NIGHTS)), Decimal(80 * MAX_NIGHTS))
@@ -5,7 +5,7 @@ from .views import (
     ReservationListCreateAPIView, ReservationDetailAPIView, CancelReservationAPIView,
     ReservationConfirmationAPIView, ReservationHistoryAPIView,
 )
-from .views import CheckAvailabilityAPIView
+from .views import CheckAvailabilityAPIView, BulkAvailabilityAPIView, QuoteAPIView, RevenueSummaryAPIView
 
 urlpatterns = [
     path('properties/', PropertyListCreateAPIView.as_view(), name='property-list-create'),
@@ -20,4 +20,7 @@ urlpatterns = [
     path('<int:pk>/confirm/', ReservationConfirmationAPIView.as_view(), name='reservation-confirm'),
     path('history/', ReservationHistoryAPIView.as_view(), name='reservation-history'),
     path('availability/', CheckAvailabilityAPIView.as_view(), name='check-availability'),
+    path('availability/bulk/', BulkAvailabilityAPIView.as_view(), name='bulk-availability'),
+    path('quote/', QuoteAPIView.as_view(), name='quote'),
+    path('revenue/summary/', RevenueSummaryAPIView.as_view(), name='revenue-summary'),
 ]
@@ -1,8 +1,14 @@
+from datetime import date
 from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .services import AvailabilityChecker, ReservationConfirmationService, ReservationHistoryService
+from dreambook.pagination import KeysetPagination
+from dreambook.read_serializers import ValuesSerializer
+from dreambook.streaming import StreamingListMixin
+from .pricing import MAX_NIGHTS, PricingEngine
+from .services import (AnalyticsService, AvailabilityChecker, BookingService,
+                       ReservationConfirmationService, ReservationHistoryService)
 
 from .models import (
     Property, CancellationPolicy, SpecialOffer, GroupReservation, Reservation,
@@ -27,12 +33,103 @@ class CheckAvailabilityAPIView(APIView):
 
         if not property_id or not start_date or not end_date:
             return Response({'error': 'Missing required parameters'}, status=status.HTTP_400_BAD_REQUEST)
-
-        is_available = AvailabilityChecker.is_available(property_id, start_date, end_date)
+        try:
+            # Klucz cache to int — '05' i '5 ' nie mogą tworzyć osobnych, nieunieważnianych wpisów
+            property_id = int(property_id)
+        except ValueError:
+            return Response({'error': 'property_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            is_available = AvailabilityChecker.is_available(property_id, start_date, end_date)
+        except ValueError:
+            return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'is_available': is_available}, status=status.HTTP_200_OK)
 
+def parse_property_range(query_params, max_properties, max_nights=None):
+    """
+    ?property_ids=1,2,3 (albo property_ids=1&property_ids=2)&start_date=&end_date=
+    wspólnie dla zapytań zbiorczych. Zwraca ((property_ids, start, end), None)
+    albo (None, komunikat błędu dla odpowiedzi 400).
+    """
+    start_date = query_params.get('start_date')
+    end_date = query_params.get('end_date')
+    raw_ids = [part for value in query_params.getlist('property_ids') for part in value.split(',')]
+
+    if not raw_ids or not start_date or not end_date:
+        return None, 'Missing required parameters'
+    try:
+        property_ids = list(dict.fromkeys(int(part) for part in raw_ids if part.strip()))
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    except ValueError:
+        return None, 'Invalid property_ids or dates'
+    if end <= start:
+        return None, 'end_date must be after start_date'
+    # Rok 9999 nie ma następnego 1 stycznia — na nim kończą się kalendarze cen
+    if end.year >= date.max.year:
+        return None, f'Dates must be before {date.max.year}-01-01'
+    if max_nights is not None and (end - start).days > max_nights:
+        return None, f'At most {max_nights} nights per request'
+    if len(property_ids) > max_properties:
+        return None, f'At most {max_properties} properties per request'
+    return (property_ids, start, end), None
+
+
+class BulkAvailabilityAPIView(APIView):
+    max_properties = 500
+
+    def get(self, request, *args, **kwargs):
+        params, error = parse_property_range(request.query_params, self.max_properties)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        property_ids, start, end = params
+
+        availability = AvailabilityChecker.availability_for(property_ids, start, end)
+        return Response({
+            'start_date': start,
+            'end_date': end,
+            'availability': {str(pid): available for pid, available in availability.items()},
+        }, status=status.HTTP_200_OK)
+
+class QuoteAPIView(APIView):
+    max_properties = 500
+    max_nights = MAX_NIGHTS
+
+    def get(self, request, *args, **kwargs):
+        params, error = parse_property_range(request.query_params, self.max_properties, self.max_nights)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        property_ids, start, end = params
+
+        quotes = PricingEngine.quote_many(property_ids, start, end)
+        return Response({
+            'start_date': start,
+            'end_date': end,
+            'nights': (end - start).days,
+            'quotes': {str(pid): f'{total:.2f}' for pid, total in quotes.items()},
+        }, status=status.HTTP_200_OK)
+
+class RevenueSummaryAPIView(APIView):
+    def get(self, request, *args, **kwargs):
+        property_id = request.query_params.get('property_id')
+        try:
+            start = date.fromisoformat(request.query_params.get('start_date', ''))
+            end = date.fromisoformat(request.query_params.get('end_date', ''))
+            property_id = int(property_id) if property_id else None
+        except ValueError:
+            return Response({'error': 'Invalid property_id or dates'}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start:
+            return Response({'error': 'end_date must not be before start_date'}, status=status.HTTP_400_BAD_REQUEST)
+
+        total = AnalyticsService.revenue_summary(property_id, start, end)
+        return Response({
+            'property_id': property_id,
+            'start_date': start,
+            'end_date': end,
+            'total_revenue': f'{total:.2f}',
+        }, status=status.HTTP_200_OK)
+
 # CRUD dla Property
-class PropertyListCreateAPIView(generics.ListCreateAPIView):
+class PropertyListCreateAPIView(StreamingListMixin, generics.ListCreateAPIView):
     queryset = Property.objects.all()
     serializer_class = PropertySerializer
 
@@ -41,7 +138,7 @@ class PropertyDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PropertySerializer
 
 # CRUD dla SpecialOffer
-class SpecialOfferListCreateAPIView(generics.ListCreateAPIView):
+class SpecialOfferListCreateAPIView(StreamingListMixin, generics.ListCreateAPIView):
     queryset = SpecialOffer.objects.all()
     serializer_class = SpecialOfferSerializer
 
@@ -50,14 +147,20 @@ class SpecialOfferDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = SpecialOfferSerializer
 
 # CRUD dla Reservation
-class ReservationListCreateAPIView(generics.ListCreateAPIView):
+class ReservationListCreateAPIView(StreamingListMixin, generics.ListCreateAPIView):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
 
+    def perform_create(self, serializer):
+        BookingService.save(serializer)
+
 class ReservationDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
 
+    def perform_update(self, serializer):
+        BookingService.save(serializer)
+
 class CancelReservationAPIView(generics.UpdateAPIView):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
@@ -72,27 +175,59 @@ class ReservationConfirmationAPIView(APIView):
 
         if not reservation_id or not user_id:
             return Response({'error': 'Missing required parameters'}, status=status.HTTP_400_BAD_REQUEST)
-
-        is_confirmed = ReservationConfirmationService.confirm(reservation_id, user_id)
+        try:
+            reservation_id, user_id = int(reservation_id), int(user_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'reservation_id and user_id must be integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            is_confirmed = ReservationConfirmationService.confirm(reservation_id, user_id)
+        except Reservation.DoesNotExist:
+            return Response({'error': 'Reservation not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'is_confirmed': is_confirmed}, status=status.HTTP_200_OK)
 
 class ReservationHistoryAPIView(APIView):
+    """
+    Historia rezerwacji użytkownika albo nieruchomości, od najnowszych.
+    Paginacja kursorem po (created_at, id); ?fields=id,status,... ogranicza
+    odczytywane kolumny.
+    """
+    pagination_class = KeysetPagination
+
     def get(self, request):
         user_id = request.query_params.get('user_id')
         property_id = request.query_params.get('property_id')
         
         if user_id:
+            try:
+                user_id = int(user_id)
+            except ValueError:
+                return Response({'error': 'user_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
             reservations = ReservationHistoryService.get_user_reservation_history(user_id)
         elif property_id:
+            try:
+                property_id = int(property_id)
+            except ValueError:
+                return Response({'error': 'property_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
             reservations = ReservationHistoryService.get_property_reservation_history(property_id)
         else:
             return Response(
                 {"error": "Please provide either user_id or property_id"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        serializer = ReservationSerializer(reservations, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        reader = ValuesSerializer.for_serializer(ReservationSerializer)
+        fields = request.query_params.get('fields')
+        if fields:
+            try:
+                reader = reader.only(fields.split(','))
+            except ValueError as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(reader.values(reservations), request, view=self)
+        return paginator.get_paginated_response(reader.to_representation(page))
 
 # Inne endpointy analogicznie... (rozszerz, remind, modify, support)
 
@@ -1,13 +1,14 @@
 # views.py
 from rest_framework import generics
+from dreambook.prefetch import AutoPrefetchMixin
 from .models import Review, ReviewResponse
 from .serializers import ReviewSerializer, ReviewResponseSerializer
 
-class ReviewListCreateAPIView(generics.ListCreateAPIView):
+class ReviewListCreateAPIView(AutoPrefetchMixin, generics.ListCreateAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
 
-class ReviewDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ReviewDetailAPIView(AutoPrefetchMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
 